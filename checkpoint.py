@@ -0,0 +1,41 @@
+"""Replay checkpoints for trade runs.
+
+A checkpoint records how far a run has replayed (last ft), the market state
+held in memory (last prices, virtual clock) and a snapshot of open orders and
+positions. Checkpoints live in Redis under ``checkpoint:{database}``, outside
+the ``ticks:{database}:*`` keys flushed when a run starts fresh, so a resumed
+run continues from the checkpoint instead of replaying the whole day.
+"""
+import json
+from datetime import datetime
+from typing import Optional
+
+from database import redis_client
+
+# Checkpoints outlive the run for a week so a restarted server can still resume
+CHECKPOINT_TTL_SECONDS = 7 * 24 * 3600
+
+
+def checkpoint_key(database_name: str) -> str:
+    return f"checkpoint:{database_name}"
+
+
+async def save_checkpoint(database_name: str, state: dict):
+    """Store the checkpoint of a run, replacing the previous one"""
+    state = dict(state, database_name=database_name, saved_at=datetime.utcnow().isoformat())
+    await redis_client.set(checkpoint_key(database_name), json.dumps(state, default=str),
+                           ex=CHECKPOINT_TTL_SECONDS)
+
+
+async def load_checkpoint(database_name: str) -> Optional[dict]:
+    """Return the latest checkpoint of a run, or None"""
+    try:
+        data = await redis_client.get(checkpoint_key(database_name))
+        return json.loads(data) if data else None
+    except Exception as e:
+        print(f"Error loading checkpoint for database {database_name}: {e}")
+        return None
+
+
+async def clear_checkpoint(database_name: str):
+    await redis_client.delete(checkpoint_key(database_name))
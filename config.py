@@ -24,6 +24,33 @@ class Settings:
             # Redis configuration
             self.redis_url: str = env.get("REDIS_URL", "redis://localhost:6379")
             self.redis_db: int = int(env.get("REDIS_DB", 0))
+            # Tick pipeline configuration
+            self.pipeline_queue_size: int = int(env.get("PIPELINE_QUEUE_SIZE", 1000))
+            self.pipeline_batch_size: int = int(env.get("PIPELINE_BATCH_SIZE", 200))
+            self.pipeline_matching_workers: int = int(env.get("PIPELINE_MATCHING_WORKERS", 8))
+            self.pipeline_persist_policy: str = env.get("PIPELINE_PERSIST_POLICY", "block")
+            self.pipeline_fanout_policy: str = env.get("PIPELINE_FANOUT_POLICY", "drop_oldest")
+            self.websocket_send_timeout: float = float(env.get("WEBSOCKET_SEND_TIMEOUT", 2.0))
+            self.redis_tick_transaction: bool = env.get("REDIS_TICK_TRANSACTION", "false").lower() == "true"
+            # Tick storage: "list" (LPUSH/LTRIM) or "stream" (XADD with MAXLEN)
+            self.redis_tick_backend: str = env.get("REDIS_TICK_BACKEND", "list")
+            # Tick values: "json" or "binary" (fixed-width records with a symbol table)
+            self.redis_tick_encoding: str = env.get("REDIS_TICK_ENCODING", "json")
+            # Per-option-token indicators: comma-separated EMA periods and the rolling window length
+            self.token_indicator_ema_periods: str = env.get("TOKEN_INDICATOR_EMA_PERIODS", "9,21")
+            self.token_indicator_window: int = int(env.get("TOKEN_INDICATOR_WINDOW", 20))
+            self.parameter_cache_ttl_seconds: float = float(env.get("PARAMETER_CACHE_TTL_SECONDS", 60.0))
+            # Append every order fill to the fill_events collection
+            self.fill_journal_enabled: bool = env.get("FILL_JOURNAL_ENABLED", "false").lower() == "true"
+            # Seconds between checks of the positions ledger against the orders aggregation (0 disables)
+            self.positions_reconcile_seconds: float = float(env.get("POSITIONS_RECONCILE_SECONDS", 300.0))
+            # Shortest time between two /ws/positions updates; changes in between are sent together
+            self.positions_broadcast_interval_ms: int = int(env.get("POSITIONS_BROADCAST_INTERVAL_MS", 250))
+            # Run session configuration
+            self.max_run_sessions: int = int(env.get("MAX_RUN_SESSIONS", 8))
+            self.run_session_processes: bool = env.get("RUN_SESSION_PROCESSES", "false").lower() == "true"
+            # Seconds between replay checkpoints (0 disables checkpoints)
+            self.checkpoint_interval_seconds: float = float(env.get("CHECKPOINT_INTERVAL_SECONDS", 5.0))
         else:
             # Production: use environment variables if set, fallback to .env
             self.mongodb_url: str = config("MONGODB_URL", default="mongodb://localhost:27017")
@@ -40,5 +67,32 @@ class Settings:
             # Redis configuration
             self.redis_url: str = config("REDIS_URL", default="redis://localhost:6379")
             self.redis_db: int = config("REDIS_DB", default=0, cast=int)
+            # Tick pipeline configuration
+            self.pipeline_queue_size: int = config("PIPELINE_QUEUE_SIZE", default=1000, cast=int)
+            self.pipeline_batch_size: int = config("PIPELINE_BATCH_SIZE", default=200, cast=int)
+            self.pipeline_matching_workers: int = config("PIPELINE_MATCHING_WORKERS", default=8, cast=int)
+            self.pipeline_persist_policy: str = config("PIPELINE_PERSIST_POLICY", default="block")
+            self.pipeline_fanout_policy: str = config("PIPELINE_FANOUT_POLICY", default="drop_oldest")
+            self.websocket_send_timeout: float = config("WEBSOCKET_SEND_TIMEOUT", default=2.0, cast=float)
+            self.redis_tick_transaction: bool = config("REDIS_TICK_TRANSACTION", default=False, cast=bool)
+            # Tick storage: "list" (LPUSH/LTRIM) or "stream" (XADD with MAXLEN)
+            self.redis_tick_backend: str = config("REDIS_TICK_BACKEND", default="list")
+            # Tick values: "json" or "binary" (fixed-width records with a symbol table)
+            self.redis_tick_encoding: str = config("REDIS_TICK_ENCODING", default="json")
+            # Per-option-token indicators: comma-separated EMA periods and the rolling window length
+            self.token_indicator_ema_periods: str = config("TOKEN_INDICATOR_EMA_PERIODS", default="9,21")
+            self.token_indicator_window: int = config("TOKEN_INDICATOR_WINDOW", default=20, cast=int)
+            self.parameter_cache_ttl_seconds: float = config("PARAMETER_CACHE_TTL_SECONDS", default=60.0, cast=float)
+            # Append every order fill to the fill_events collection
+            self.fill_journal_enabled: bool = config("FILL_JOURNAL_ENABLED", default=False, cast=bool)
+            # Seconds between checks of the positions ledger against the orders aggregation (0 disables)
+            self.positions_reconcile_seconds: float = config("POSITIONS_RECONCILE_SECONDS", default=300.0, cast=float)
+            # Shortest time between two /ws/positions updates; changes in between are sent together
+            self.positions_broadcast_interval_ms: int = config("POSITIONS_BROADCAST_INTERVAL_MS", default=250, cast=int)
+            # Run session configuration
+            self.max_run_sessions: int = config("MAX_RUN_SESSIONS", default=8, cast=int)
+            self.run_session_processes: bool = config("RUN_SESSION_PROCESSES", default=False, cast=bool)
+            # Seconds between replay checkpoints (0 disables checkpoints)
+            self.checkpoint_interval_seconds: float = config("CHECKPOINT_INTERVAL_SECONDS", default=5.0, cast=float)
 
 settings = Settings() 
\ No newline at end of file
@@ -141,6 +141,7 @@ async def create_order(order: OrderCreate) -> Order:
         "price": order.price,
         "trigger_price": order.trigger_price,
         "user_id": order.user_id,
+        "run_database": order.run_database,
         "status": OrderStatus.PENDING,
         "filled_quantity": 0,
         "average_price": None,
@@ -8,6 +8,8 @@ db = client[settings.database_name]
 
 # Redis connection
 redis_client = redis.from_url(settings.redis_url, db=settings.redis_db, decode_responses=True)
+# Raw bytes connection for binary-encoded ticks (REDIS_TICK_ENCODING=binary)
+redis_binary_client = redis.from_url(settings.redis_url, db=settings.redis_db, decode_responses=False)
 
 async def connect_to_mongo():
     """Connect to MongoDB"""
@@ -33,6 +35,7 @@ async def close_mongo_connection():
 async def close_redis_connection():
     """Close Redis connection"""
     await redis_client.close()
+    await redis_binary_client.close()
     print("Redis connection closed")
 
 async def get_database():
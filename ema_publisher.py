@@ -0,0 +1,153 @@
+"""Shared publisher of index EMA updates to /ws/ema-data subscribers.
+
+One task per database computes the EMAs (and the union of the indicator specs
+its subscribers asked for) once per interval and fans the result out to every
+subscriber; the cost of a database does not grow with its client count. When
+a version function tells that the database has no new ticks since the last
+publish, the computation and the sends are skipped. The task ends, and is
+cancelled, with the last unsubscribe.
+"""
+import asyncio
+import json
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+# Shortest publish interval a subscriber may ask for
+MIN_INTERVAL_SECONDS = 0.1
+
+
+class EmaSubscription:
+    __slots__ = ("websocket", "database_name", "interval_seconds", "specs")
+
+    def __init__(self, websocket, database_name: str, interval_seconds: float, specs: Tuple[str, ...]):
+        self.websocket = websocket
+        self.database_name = database_name
+        self.interval_seconds = interval_seconds
+        self.specs = specs
+
+
+class EmaTopic:
+    """Subscribers of one database and the state of its publisher task"""
+
+    def __init__(self, database_name: str):
+        self.database_name = database_name
+        self.subscribers: Dict[int, EmaSubscription] = {}
+        self.wake = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        # Version of the last publish, and whether the next publish must happen regardless
+        self.version = None
+        self.force = True
+        self.publishes = 0
+        self.skipped = 0
+
+    @property
+    def interval_seconds(self) -> float:
+        return max(MIN_INTERVAL_SECONDS, min(s.interval_seconds for s in self.subscribers.values()))
+
+    @property
+    def specs(self) -> Tuple[str, ...]:
+        return tuple(sorted({spec for s in self.subscribers.values() for spec in s.specs}))
+
+
+class EmaPublisher:
+    def __init__(self, compute: Callable[[str, Tuple[str, ...]], Awaitable[Optional[dict]]],
+                 version: Optional[Callable[[str], Optional[int]]] = None, send_timeout: float = 2.0):
+        # compute(database, specs) -> EMA message fields with an "indicators" dict keyed by spec, or None
+        self.compute = compute
+        self.version = version
+        self.send_timeout = send_timeout
+        self.topics: Dict[str, EmaTopic] = {}
+        self._subscriptions: Dict[int, EmaSubscription] = {}
+
+    def subscribe(self, websocket, database_name: str, interval_seconds: float = 1.0, specs=()):
+        """Subscribe a WebSocket to a database's updates, replacing its previous subscription"""
+        self.unsubscribe(websocket)
+        subscription = EmaSubscription(websocket, database_name, float(interval_seconds), tuple(specs))
+        topic = self.topics.get(database_name)
+        if topic is None:
+            topic = self.topics[database_name] = EmaTopic(database_name)
+            topic.task = asyncio.create_task(self._run(topic))
+        topic.subscribers[id(websocket)] = subscription
+        self._subscriptions[id(websocket)] = subscription
+        # Publish right away so the new subscriber does not wait for the next change
+        topic.force = True
+        topic.wake.set()
+
+    def unsubscribe(self, websocket) -> bool:
+        """Drop a WebSocket's subscription; the last subscriber of a database stops its task"""
+        subscription = self._subscriptions.pop(id(websocket), None)
+        if subscription is None:
+            return False
+        topic = self.topics.get(subscription.database_name)
+        if topic is not None:
+            topic.subscribers.pop(id(websocket), None)
+            if not topic.subscribers:
+                del self.topics[subscription.database_name]
+                if topic.task and topic.task is not asyncio.current_task():
+                    topic.task.cancel()
+        return True
+
+    async def close(self):
+        tasks = [topic.task for topic in self.topics.values() if topic.task]
+        self.topics.clear()
+        self._subscriptions.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, topic: EmaTopic):
+        try:
+            while topic.subscribers:
+                try:
+                    await asyncio.wait_for(topic.wake.wait(), topic.interval_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                topic.wake.clear()
+                try:
+                    await self.publish(topic)
+                except Exception as e:
+                    print(f"Error publishing EMAs for {topic.database_name}: {e}")
+        except asyncio.CancelledError:
+            pass
+
+    async def publish(self, topic: EmaTopic):
+        """Compute once and send to every subscriber, unless nothing changed since the last publish"""
+        version = self.version(topic.database_name) if self.version else None
+        if not topic.force and version is not None and version == topic.version:
+            topic.skipped += 1
+            return
+        topic.force = False
+        subscribers = list(topic.subscribers.values())
+        data = await self.compute(topic.database_name, topic.specs)
+        if data is None:
+            return
+        topic.version = version
+        topic.publishes += 1
+
+        indicators = data.get("indicators") or {}
+        base = {key: value for key, value in data.items() if key != "indicators"}
+        base["timestamp"] = datetime.now().isoformat()
+        # Encode once per distinct set of specs, not once per subscriber
+        messages: Dict[Tuple[str, ...], str] = {}
+        sends = []
+        for subscription in subscribers:
+            message = messages.get(subscription.specs)
+            if message is None:
+                payload = dict(base)
+                if subscription.specs:
+                    payload["indicators"] = {spec: indicators.get(spec) for spec in subscription.specs}
+                message = messages[subscription.specs] = json.dumps(payload)
+            sends.append(self._send_or_drop(subscription, message))
+        await asyncio.gather(*sends)
+
+    async def _send_or_drop(self, subscription: EmaSubscription, message: str):
+        try:
+            await asyncio.wait_for(subscription.websocket.send_text(message), self.send_timeout)
+        except Exception:
+            # Disconnected or stalled subscribers are dropped
+            self.unsubscribe(subscription.websocket)
+
+    def stats(self) -> dict:
+        return {name: {"subscribers": len(topic.subscribers), "interval_seconds": topic.interval_seconds,
+                       "publishes": topic.publishes, "skipped": topic.skipped}
+                for name, topic in self.topics.items()}
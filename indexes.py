@@ -0,0 +1,165 @@
+"""Index provisioning for run databases and the application database.
+
+Replay, the analysis views and order matching all query by fields that have
+no index in a restored backup. ``IndexManager`` creates the indexes those
+paths rely on, records per-collection build status (with progress from
+``currentOp`` while a build runs) and explains the affected queries so the
+chosen plans can be checked.
+"""
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+# Indexes of every prefixed run database (e.g. N_20250718)
+RUN_DATABASE_INDEXES: Dict[str, List[IndexModel]] = {
+    # Replay cursors sort IndexTick by ft
+    "IndexTick": [IndexModel([("ft", ASCENDING)], name="ft_1")],
+    # Replay sorts by ft; v_option_pair_base looks up OptionTick by (ft, token)
+    "OptionTick": [IndexModel([("ft", ASCENDING), ("token", ASCENDING)], name="ft_1_token_1")],
+    # v_option_pair_base looks up strikes by (strprc, optt); start-run resolves tokens
+    "Option": [IndexModel([("strprc", ASCENDING), ("optt", ASCENDING)], name="strprc_1_optt_1"),
+               IndexModel([("token", ASCENDING)], name="token_1")],
+    "Index": [IndexModel([("token", ASCENDING)], name="token_1")],
+    "FyersSymbolMaster": [IndexModel([("token", ASCENDING)], name="token_1")],
+}
+
+# Indexes of the application database
+APP_DATABASE_INDEXES: Dict[str, List[IndexModel]] = {
+    # Order matching scans open orders by status and symbol
+    "orders": [IndexModel([("status", ASCENDING), ("symbol", ASCENDING)], name="status_1_symbol_1"),
+               IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_id_1_created_at_-1")],
+}
+
+# Seconds between currentOp polls while builds are running
+PROGRESS_POLL_SECONDS = 1.0
+
+
+def summarize_plan(explain: dict) -> dict:
+    """Reduce an explain() result to the stages and indexes of its winning plan"""
+    planner = explain.get("queryPlanner", {})
+    winning = planner.get("winningPlan", {})
+    # Slot-based engine wraps the classic plan under queryPlan
+    winning = winning.get("queryPlan", winning)
+    stages, indexes = [], []
+
+    def walk(node: dict):
+        stages.append(node.get("stage"))
+        if node.get("indexName"):
+            indexes.append(node["indexName"])
+        if "inputStage" in node:
+            walk(node["inputStage"])
+        for child in node.get("inputStages", []):
+            walk(child)
+
+    walk(winning)
+    return {
+        "namespace": planner.get("namespace"),
+        "stages": stages,
+        "indexes": indexes,
+        "uses_index": "IXSCAN" in stages,
+    }
+
+
+class IndexManager:
+    def __init__(self, client, app_database_name: str, database_prefix: str):
+        self.client = client
+        self.app_database_name = app_database_name
+        self.database_prefix = database_prefix
+        # "database.collection" -> build status
+        self.status: Dict[str, dict] = {}
+        self._lock = asyncio.Lock()
+
+    async def run_databases(self) -> List[str]:
+        names = await self.client.list_database_names()
+        return sorted(name for name in names if name.startswith(f"{self.database_prefix}_"))
+
+    async def ensure_collection(self, database_name: str, collection_name: str, models: List[IndexModel]):
+        key = f"{database_name}.{collection_name}"
+        entry = self.status.setdefault(key, {})
+        entry.update(state="building", indexes=[m.document["name"] for m in models], error=None,
+                     started_at=time.time(), progress=None)
+        started = time.perf_counter()
+        try:
+            await self.client[database_name][collection_name].create_indexes(models)
+            entry.update(state="ready", seconds=round(time.perf_counter() - started, 3), progress=None)
+        except Exception as e:
+            entry.update(state="error", error=str(e))
+            print(f"Index build failed for {key}: {e}")
+
+    async def ensure_run_database(self, database_name: str):
+        """Create the replay/view indexes of one run database"""
+        collections = set(await self.client[database_name].list_collection_names())
+        for collection_name, models in RUN_DATABASE_INDEXES.items():
+            if collection_name in collections:
+                await self.ensure_collection(database_name, collection_name, models)
+
+    async def ensure_app_database(self):
+        for collection_name, models in APP_DATABASE_INDEXES.items():
+            await self.ensure_collection(self.app_database_name, collection_name, models)
+
+    async def ensure_all(self):
+        """Create indexes in the application database and every prefixed run database"""
+        async with self._lock:
+            started = time.perf_counter()
+            progress_task = asyncio.create_task(self._track_progress())
+            try:
+                await self.ensure_app_database()
+                for database_name in await self.run_databases():
+                    await self.ensure_run_database(database_name)
+            finally:
+                progress_task.cancel()
+            print(f"Index provisioning finished in {time.perf_counter() - started:.1f}s")
+
+    async def ensure_for_run(self, database_name: str):
+        """Create the indexes of one run database, reporting progress while building"""
+        progress_task = asyncio.create_task(self._track_progress())
+        try:
+            await self.ensure_run_database(database_name)
+        finally:
+            progress_task.cancel()
+
+    async def _track_progress(self):
+        """Copy createIndexes progress from currentOp into the status of building collections"""
+        while True:
+            await asyncio.sleep(PROGRESS_POLL_SECONDS)
+            try:
+                result = await self.client.admin.command(
+                    "currentOp", {"command.createIndexes": {"$exists": True}})
+            except Exception as e:
+                print(f"Could not read index build progress: {e}")
+                return
+            for op in result.get("inprog", []):
+                key = op.get("ns") or f"{op.get('command', {}).get('$db')}.{op.get('command', {}).get('createIndexes')}"
+                entry = self.status.get(key)
+                if entry and entry.get("state") == "building":
+                    progress = op.get("progress") or {}
+                    entry["progress"] = {"done": progress.get("done"), "total": progress.get("total"),
+                                         "message": op.get("msg")}
+
+    async def explain_plans(self, database_name: Optional[str] = None) -> List[dict]:
+        """Explain the hot queries of replay, the option views and order matching"""
+        plans = []
+        queries = [
+            (self.app_database_name, "orders", {"status": {"$in": ["pending", "partially_filled"]}, "symbol": "NIFTY"}, None),
+        ]
+        if database_name:
+            queries += [
+                (database_name, "IndexTick", {}, ("ft", ASCENDING)),
+                (database_name, "OptionTick", {"ft": {"$gt": 0}}, ("ft", ASCENDING)),
+                (database_name, "OptionTick", {"ft": 0, "token": 0}, None),
+                (database_name, "Option", {"strprc": 0, "optt": "CE"}, None),
+                (database_name, "FyersSymbolMaster", {"token": 0}, None),
+            ]
+        for db_name, collection_name, query, sort in queries:
+            try:
+                cursor = self.client[db_name][collection_name].find(query)
+                if sort:
+                    cursor = cursor.sort(*sort)
+                plan = summarize_plan(await cursor.limit(1).explain())
+                plan.update(query=str(query), sort=str(sort) if sort else None)
+            except Exception as e:
+                plan = {"namespace": f"{db_name}.{collection_name}", "query": str(query), "error": str(e)}
+            plans.append(plan)
+        return plans
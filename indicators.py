@@ -0,0 +1,481 @@
+"""Streaming technical indicators updated once per tick.
+
+Every indicator keeps a fixed-size running state, so a new price is folded in
+O(1) (amortized for rolling min/max) and the current value is read without
+touching the stored ticks. Indicators are registered by spec, a name with
+optional comma-separated parameters (``ema:20``, ``macd:12,26,9``,
+``bollinger:20,2``). An ``IndicatorEngine`` holds one instance per spec of a
+price series, so every consumer asking for the same spec shares it.
+
+Ticks carry a single last price and no traded volume: ATR uses the tick-to-tick
+true range ``|price - previous price|`` and VWAP weights every tick equally
+unless a volume is passed.
+
+``EMA`` keeps the progressive period of ``calculate_index_emas``: until
+``period`` prices were seen its value is the mean of every price so far; the
+mean of the first ``period`` prices then seeds
+``ema = alpha * price + (1 - alpha) * ema``.
+
+An engine holds at most ``max_indicators`` specs. When a new spec does not fit,
+the least recently read spec that is not pinned is dropped, so specs asked for
+once by a request do not keep the slots of the ones still in use.
+"""
+import math
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Largest window an indicator may keep, bounding the memory of a spec
+MAX_PERIOD = 10000
+
+
+class Indicator(ABC):
+    name = ""
+    defaults: Tuple = ()
+
+    def __init__(self, *params):
+        self.params = params
+        self.count = 0
+
+    @property
+    def spec(self) -> str:
+        return format_spec(self.name, self.params)
+
+    @abstractmethod
+    def update(self, price: float, volume: float = 1.0):
+        pass
+
+    @property
+    @abstractmethod
+    def value(self):
+        pass
+
+    def state(self) -> dict:
+        """JSON-serializable running state (used by run checkpoints)"""
+        state = {}
+        for field, value in vars(self).items():
+            if isinstance(value, deque):
+                value = {"deque": list(value), "maxlen": value.maxlen}
+            elif isinstance(value, Indicator):
+                value = {"indicator": value.state()}
+            elif isinstance(value, tuple):
+                value = list(value)
+            state[field] = value
+        return state
+
+    def load_state(self, state: dict):
+        for field, value in state.items():
+            if isinstance(value, dict) and "deque" in value:
+                value = deque(value["deque"], maxlen=value["maxlen"])
+            elif isinstance(value, dict) and "indicator" in value:
+                getattr(self, field).load_state(value["indicator"])
+                continue
+            elif field == "params":
+                value = tuple(value)
+            setattr(self, field, value)
+
+
+class SMA(Indicator):
+    name = "sma"
+    defaults = (20,)
+
+    def __init__(self, period: int = 20):
+        super().__init__(period)
+        self.period = period
+        self.window = deque(maxlen=period)
+        self.total = 0.0
+
+    def update(self, price: float, volume: float = 1.0):
+        self.count += 1
+        if len(self.window) == self.period:
+            self.total -= self.window[0]
+        self.window.append(price)
+        self.total += price
+
+    @property
+    def value(self) -> Optional[float]:
+        # Progressive: mean of the prices seen until the window is full
+        return self.total / len(self.window) if self.window else None
+
+
+class EMA(Indicator):
+    name = "ema"
+    defaults = (20,)
+
+    def __init__(self, period: int = 20):
+        super().__init__(period)
+        self.period = period
+        self.alpha = 2 / (period + 1)
+        self.total = 0.0
+        self.ema: Optional[float] = None
+
+    def update(self, price: float, volume: float = 1.0):
+        self.count += 1
+        if self.count <= self.period:
+            # Progressive period: SMA of the prices seen, the seed once period prices arrived
+            self.total += price
+            self.ema = self.total / self.count
+        else:
+            self.ema = self.alpha * price + (1 - self.alpha) * self.ema
+
+    @property
+    def value(self) -> Optional[float]:
+        return self.ema
+
+    @property
+    def period_used(self) -> int:
+        return min(self.count, self.period)
+
+
+class WMA(Indicator):
+    """Linearly weighted moving average, the newest price weighted highest"""
+
+    name = "wma"
+    defaults = (20,)
+
+    def __init__(self, period: int = 20):
+        super().__init__(period)
+        self.period = period
+        self.window = deque(maxlen=period)
+        self.total = 0.0
+        self.weighted = 0.0
+
+    def update(self, price: float, volume: float = 1.0):
+        self.count += 1
+        size = len(self.window)
+        if size == self.period:
+            # Every price loses one weight step and the oldest drops out
+            self.weighted += self.period * price - self.total
+            self.total += price - self.window[0]
+        else:
+            self.weighted += (size + 1) * price
+            self.total += price
+        self.window.append(price)
+
+    @property
+    def value(self) -> Optional[float]:
+        size = len(self.window)
+        return self.weighted / (size * (size + 1) / 2) if size else None
+
+
+class RSI(Indicator):
+    """Wilder's RSI; averages of the first period changes seed the smoothing"""
+
+    name = "rsi"
+    defaults = (14,)
+
+    def __init__(self, period: int = 14):
+        super().__init__(period)
+        self.period = period
+        self.previous: Optional[float] = None
+        self.changes = 0
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+
+    def update(self, price: float, volume: float = 1.0):
+        self.count += 1
+        if self.previous is not None:
+            change = price - self.previous
+            gain, loss = max(change, 0.0), max(-change, 0.0)
+            self.changes += 1
+            weight = min(self.changes, self.period)
+            self.avg_gain += (gain - self.avg_gain) / weight
+            self.avg_loss += (loss - self.avg_loss) / weight
+        self.previous = price
+
+    @property
+    def value(self) -> Optional[float]:
+        if not self.changes:
+            return None
+        if self.avg_loss == 0:
+            return 100.0 if self.avg_gain > 0 else 50.0
+        return 100 - 100 / (1 + self.avg_gain / self.avg_loss)
+
+
+class MACD(Indicator):
+    name = "macd"
+    defaults = (12, 26, 9)
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        super().__init__(fast, slow, signal)
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+
+    def update(self, price: float, volume: float = 1.0):
+        self.count += 1
+        self.fast.update(price)
+        self.slow.update(price)
+        self.signal.update(self.fast.value - self.slow.value)
+
+    @property
+    def value(self) -> Optional[dict]:
+        if not self.count:
+            return None
+        macd = self.fast.value - self.slow.value
+        return {"macd": macd, "signal": self.signal.value, "histogram": macd - self.signal.value}
+
+
+class Bollinger(Indicator):
+    name = "bollinger"
+    defaults = (20, 2.0)
+
+    def __init__(self, period: int = 20, width: float = 2.0):
+        super().__init__(period, width)
+        self.period = period
+        self.width = width
+        self.window = deque(maxlen=period)
+        self.total = 0.0
+        self.squares = 0.0
+
+    def update(self, price: float, volume: float = 1.0):
+        self.count += 1
+        if len(self.window) == self.period:
+            oldest = self.window[0]
+            self.total -= oldest
+            self.squares -= oldest * oldest
+        self.window.append(price)
+        self.total += price
+        self.squares += price * price
+
+    @property
+    def value(self) -> Optional[dict]:
+        size = len(self.window)
+        if not size:
+            return None
+        middle = self.total / size
+        deviation = math.sqrt(max(self.squares / size - middle * middle, 0.0))
+        return {"middle": middle, "upper": middle + self.width * deviation,
+                "lower": middle - self.width * deviation}
+
+
+class ATR(Indicator):
+    """Wilder's average of the tick-to-tick true range"""
+
+    name = "atr"
+    defaults = (14,)
+
+    def __init__(self, period: int = 14):
+        super().__init__(period)
+        self.period = period
+        self.previous: Optional[float] = None
+        self.ranges = 0
+        self.atr = 0.0
+
+    def update(self, price: float, volume: float = 1.0):
+        self.count += 1
+        if self.previous is not None:
+            self.ranges += 1
+            self.atr += (abs(price - self.previous) - self.atr) / min(self.ranges, self.period)
+        self.previous = price
+
+    @property
+    def value(self) -> Optional[float]:
+        return self.atr if self.ranges else None
+
+
+class VWAP(Indicator):
+    """Volume-weighted average price since the start of the run"""
+
+    name = "vwap"
+
+    def __init__(self):
+        super().__init__()
+        self.turnover = 0.0
+        self.volume = 0.0
+
+    def update(self, price: float, volume: float = 1.0):
+        self.count += 1
+        self.turnover += price * volume
+        self.volume += volume
+
+    @property
+    def value(self) -> Optional[float]:
+        return self.turnover / self.volume if self.volume else None
+
+
+class RollingMin(Indicator):
+    """Minimum of the last period prices using a monotonic deque of (index, price)"""
+
+    name = "min"
+    defaults = (20,)
+
+    def __init__(self, period: int = 20):
+        super().__init__(period)
+        self.period = period
+        self.candidates = deque()
+
+    def _dominates(self, new: float, old: float) -> bool:
+        return new <= old
+
+    def update(self, price: float, volume: float = 1.0):
+        self.count += 1
+        while self.candidates and self._dominates(price, self.candidates[-1][1]):
+            self.candidates.pop()
+        self.candidates.append((self.count, price))
+        if self.candidates[0][0] <= self.count - self.period:
+            self.candidates.popleft()
+
+    @property
+    def value(self) -> Optional[float]:
+        return self.candidates[0][1] if self.candidates else None
+
+    def load_state(self, state: dict):
+        super().load_state(state)
+        self.candidates = deque(tuple(c) for c in self.candidates)
+
+
+class RollingMax(RollingMin):
+    name = "max"
+
+    def _dominates(self, new: float, old: float) -> bool:
+        return new >= old
+
+
+INDICATORS: Dict[str, type] = {cls.name: cls for cls in (SMA, EMA, WMA, RSI, MACD, Bollinger, ATR, VWAP,
+                                                         RollingMin, RollingMax)}
+
+
+def format_spec(name: str, params: Iterable) -> str:
+    params = [f"{p:g}" if isinstance(p, float) else str(p) for p in params]
+    return f"{name}:{','.join(params)}" if params else name
+
+
+def parse_spec(spec: str) -> Tuple[str, tuple]:
+    """Split "macd:12,26,9" into its name and parameters, filling defaults and validating"""
+    name, _, raw = spec.strip().lower().partition(":")
+    cls = INDICATORS.get(name)
+    if cls is None:
+        raise ValueError(f"Unknown indicator '{name}', expected one of {sorted(INDICATORS)}")
+    values = [v for v in raw.split(",") if v.strip()] if raw else []
+    if len(values) > len(cls.defaults):
+        raise ValueError(f"Indicator '{name}' takes at most {len(cls.defaults)} parameters")
+    params = []
+    for default, value in zip(cls.defaults, values + [None] * len(cls.defaults)):
+        if value is None:
+            params.append(default)
+            continue
+        try:
+            param = float(value)
+        except ValueError:
+            raise ValueError(f"Invalid parameter '{value}' for indicator '{name}'")
+        if isinstance(default, int):
+            if not param.is_integer():
+                raise ValueError(f"Parameter '{value.strip()}' of '{name}' must be a whole number")
+            param = int(param)
+        if param <= 0 or (isinstance(default, int) and param > MAX_PERIOD):
+            raise ValueError(f"Parameters of '{name}' must be between 1 and {MAX_PERIOD}")
+        params.append(param)
+    return name, tuple(params)
+
+
+def create_indicator(spec: str) -> Indicator:
+    name, params = parse_spec(spec)
+    return INDICATORS[name](*params)
+
+
+class IndicatorEngine:
+    """Indicators of one price series, one shared instance per spec
+
+    The specs the engine is created with are pinned and never evicted.
+    """
+
+    def __init__(self, specs: Iterable[str] = (), max_indicators: int = 32):
+        self.indicators: Dict[str, Indicator] = {}
+        self.max_indicators = max_indicators
+        self.count = 0
+        self.last_ft: Optional[int] = None
+        self.pinned = set()
+        # Read sequence number of each spec, for evicting the least recently read one
+        self._reads = 0
+        self._last_read: Dict[str, int] = {}
+        self.evicted = 0
+        specs = tuple(specs)
+        for spec in specs:
+            self.add(spec)
+        self.pin(*specs)
+
+    def pin(self, *specs: str):
+        """Keep exactly these specs from being evicted"""
+        self.pinned = {self.key(spec) for spec in specs}
+
+    def has(self, *specs: str) -> bool:
+        return all(self.key(spec) in self.indicators for spec in specs)
+
+    @staticmethod
+    def key(spec: str) -> str:
+        name, params = parse_spec(spec)
+        return format_spec(name, params)
+
+    def add(self, spec: str, history: Iterable[float] = ()) -> Indicator:
+        """Indicator of a spec, created and seeded with history prices (oldest first) if new"""
+        key = self.key(spec)
+        indicator = self.indicators.get(key)
+        if indicator is None:
+            if len(self.indicators) >= self.max_indicators:
+                self._evict()
+            indicator = create_indicator(key)
+            for price in history:
+                indicator.update(price)
+            self.indicators[key] = indicator
+        self._touch(key)
+        return indicator
+
+    def _touch(self, key: str):
+        self._reads += 1
+        self._last_read[key] = self._reads
+
+    def _evict(self):
+        unpinned = [key for key in self.indicators if key not in self.pinned]
+        if not unpinned:
+            raise ValueError(f"At most {self.max_indicators} indicators per series")
+        key = min(unpinned, key=lambda k: self._last_read.get(k, 0))
+        del self.indicators[key]
+        self._last_read.pop(key, None)
+        self.evicted += 1
+
+    def get(self, spec: str) -> Optional[Indicator]:
+        key = self.key(spec)
+        if key in self.indicators:
+            self._touch(key)
+        return self.indicators.get(key)
+
+    def update(self, price: float, ft: Optional[int] = None, volume: float = 1.0):
+        self.count += 1
+        self.last_ft = ft
+        for indicator in self.indicators.values():
+            indicator.update(price, volume)
+
+    def rebuild(self, prices: List[float], specs: Iterable[str]):
+        """Replace the indicators with the given specs computed over prices (oldest first)"""
+        self.indicators = {}
+        self._last_read = {}
+        self.count = len(prices)
+        for spec in specs:
+            self.add(spec, prices)
+
+    def values(self, specs: Optional[Iterable[str]] = None) -> dict:
+        """Current value per spec (every registered spec when None, which does not count as a read)"""
+        keys = list(self.indicators) if specs is None else [self.key(spec) for spec in specs]
+        if specs is not None:
+            for key in keys:
+                if key in self.indicators:
+                    self._touch(key)
+        return {key: self.indicators[key].value if key in self.indicators else None for key in keys}
+
+    def state(self) -> dict:
+        return {"count": self.count, "last_ft": self.last_ft, "pinned": sorted(self.pinned),
+                "indicators": {key: indicator.state() for key, indicator in self.indicators.items()}}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "IndicatorEngine":
+        engine = cls()
+        engine.count = int(state.get("count", 0))
+        engine.last_ft = state.get("last_ft")
+        for key, indicator_state in state.get("indicators", {}).items():
+            indicator = create_indicator(key)
+            indicator.load_state(indicator_state)
+            engine.indicators[key] = indicator
+            engine._touch(key)
+        engine.pinned = set(state.get("pinned", ()))
+        return engine
@@ -1,21 +1,24 @@
-from fastapi import FastAPI, Request, HTTPException, Depends, status, Form, WebSocket, WebSocketDisconnect, UploadFile, File
-from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse
+from fastapi import FastAPI, Request, HTTPException, Depends, status, Form, WebSocket, WebSocketDisconnect, UploadFile, File, Query
+from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.security import HTTPBearer
 from datetime import timedelta, datetime
 import os
+import sys
 import subprocess
 import json
 import asyncio
 import math
+import time
+from itertools import groupby
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from zoneinfo import ZoneInfo
 
-from database import connect_to_mongo, connect_to_redis, close_mongo_connection, close_redis_connection, db, get_database, redis_client
+from database import connect_to_mongo, connect_to_redis, close_mongo_connection, close_redis_connection, db, get_database, redis_client, redis_binary_client
 from models import (UserCreate, UserUpdate, LoginRequest, Token, User, UserInDB, ProfileUpdate, PasswordChange, 
-                   TickData, OptionTickData, TickDataResponse, StartRunRequest, StartRunResponse,
+                   TickData, OptionTickData, TickDataResponse, StartRunRequest, StartRunResponse, ReplayMode,
                    OrderCreate, OrderUpdate, Order, OrderStatus, OrderType, PositionSummary, PositionResponse,
                    ParameterCreate, ParameterUpdate, Parameter, StrategyCreate, StrategyUpdate, Strategy, 
                    StrategyResponse, StrategyExecutionCreate, StrategyExecutionUpdate, StrategyExecution, 
@@ -28,140 +31,191 @@ from crud import (create_user, get_users, update_user, delete_user, authenticate
                  create_strategy, get_strategies, get_strategy_by_id, update_strategy, delete_strategy, get_strategies_by_symbol,
                  create_strategy_execution, get_strategy_executions, get_strategy_execution_by_id, update_strategy_execution, add_execution_log, update_execution_stats)
 from config import settings
+from replay import (LiveWatchStats, ReplayPacer, VirtualClock, iter_tick_frames, watch_tick_frames,
+                    first_tick_ft, ft_at_time_of_day, read_warmup_ticks)
+from pipeline import Pipeline, QueuePolicy, Stage
+from checkpoint import save_checkpoint, load_checkpoint, clear_checkpoint
+from indexes import IndexManager
+from ticks import TickRecord
+from tick_store import create_tick_writer, index_key, option_key, tick_key
+from tick_codec import create_tick_codec
+from tick_cache import TickCache
+from ema_publisher import EmaPublisher
+from order_book import OrderBook, SymbolLocks
+from fills import Fill, FillStats, persist_fills
+from positions_ledger import PositionLedger
+from positions_broadcaster import PositionsBroadcaster
+from token_indicators import TokenIndicatorBank
+from indicators import IndicatorEngine
+from param_cache import ParameterCache, validate_parameter_value
 
 # Store the currently selected database
 selected_database_store = {}
 
-# Latest last prices per symbol (index & option) updated from tick streams
-last_prices: dict[str, float] = {}
-
-# Lock to prevent concurrent order evaluation overlaps
-_order_eval_lock = asyncio.Lock()
-
-async def evaluate_and_execute_orders(symbol: str, last_price: float):
-    """Evaluate open orders and execute those whose conditions are met using the correct tick source.
+# Per-symbol locks: evaluation of one symbol is strictly ordered, different symbols run in parallel
+_order_eval_locks = SymbolLocks()
+
+# Open orders indexed by symbol and trigger price; hydrated from MongoDB at startup
+order_book = OrderBook(redis_client)
+order_listener_task: asyncio.Task | None = None
+
+async def get_orders_collection():
+    return (await get_database()).orders
+
+# Positions per user and symbol, updated on every order change instead of aggregating all orders
+positions_ledger = PositionLedger()
+positions_reconcile_task: asyncio.Task | None = None
+
+async def load_positions_ledger():
+    """Rebuild the positions ledger from every order in MongoDB"""
+    orders = await (await get_orders_collection()).find(
+        {}, {"symbol": 1, "user_id": 1, "side": 1, "status": 1, "quantity": 1, "filled_quantity": 1,
+             "average_price": 1, "price": 1}
+    ).to_list(length=None)
+    positions_ledger.rebuild(orders)
+
+def apply_order_change(order_id: Optional[str], doc: Optional[dict]):
+    """Follow orders changed in another process (see OrderBook.add_listener)"""
+    if order_id is None:
+        asyncio.create_task(load_positions_ledger())
+    elif doc is None:
+        positions_ledger.remove(order_id)
+    else:
+        positions_ledger.apply(doc)
+    positions_broadcaster.mark_dirty(orders=True)
+
+order_book.add_listener(apply_order_change)
+
+async def reconcile_positions_ledger() -> dict:
+    """Compare the ledger with the orders aggregation and rebuild it when they disagree"""
+    differences = positions_ledger.differences(await aggregate_positions(user_id=None, raw=True))
+    if differences:
+        print(f"Positions ledger out of sync ({len(differences)} differences), rebuilding: {differences[:5]}")
+        await load_positions_ledger()
+    return {"differences": len(differences), "details": differences[:50], "rebuilt": bool(differences)}
+
+async def _positions_reconciler():
+    while True:
+        await asyncio.sleep(settings.positions_reconcile_seconds)
+        try:
+            await reconcile_positions_ledger()
+        except Exception as e:
+            print(f"Positions reconciliation failed: {e}")
 
-    All orders require a symbol match (case-insensitive). Option orders therefore fill only
-    on their own option ticks, not on index ticks. Market orders execute when a tick for
-    their symbol arrives. This assumes stored order.symbol matches incoming tick ts.
-    """
-    try:
-        async with _order_eval_lock:
-            database = await get_database()
-            cursor = database.orders.find({
-                "status": {"$in": [OrderStatus.PENDING, OrderStatus.PARTIALLY_FILLED]}
-            }).limit(500)
-            orders_to_fill = []
-            async for doc in cursor:
-                doc_symbol = doc.get("symbol")
-                side = doc.get("side")
-                otype = doc.get("order_type")
-                price = doc.get("price")
-                trigger_price = doc.get("trigger_price")
-                quantity = doc.get("quantity", 0)
-                filled_quantity = doc.get("filled_quantity", 0)
-
-                if filled_quantity >= quantity:
-                    continue
+# Lock hold time and MongoDB round-trips of fill writes
+fill_stats = FillStats()
 
-                if not symbol or not doc_symbol or doc_symbol.upper() != symbol.upper():
-                    continue
+def match_orders(symbol: str, last_price: float, ft: Optional[int] = None,
+                 run_database: Optional[str] = None) -> List[Fill]:
+    """Take the orders a tick fills out of the order book; fills are stamped with market time when ft is given"""
+    filled_at = datetime.utcfromtimestamp(ft) if ft else None
+    return [Fill(order, order.quantity, last_price, ft, filled_at)
+            for order in order_book.match(symbol, last_price, run_database)]
 
-                should_fill = False
-                exec_price = last_price
-
-                if otype == OrderType.MARKET.value:
-                    should_fill = True
-                elif otype == "limit":
-                    if side == "buy" and price is not None and last_price <= price:
-                        should_fill = True
-                    elif side == "sell" and price is not None and last_price >= price:
-                        should_fill = True
-                elif otype in ("sl", "slm"):
-                    if side == "buy" and trigger_price is not None and last_price >= trigger_price:
-                        should_fill = True
-                    elif side == "sell" and trigger_price is not None and last_price <= trigger_price:
-                        should_fill = True
-
-                if should_fill:
-                    orders_to_fill.append({
-                        "_id": doc.get("_id"),
-                        "new_filled_quantity": quantity,
-                        "exec_price": exec_price
-                    })
-
-            for od in orders_to_fill:
-                try:
-                    await update_order(str(od["_id"]), OrderUpdate(
-                        status=OrderStatus.FILLED,
-                        filled_quantity=od["new_filled_quantity"],
-                        average_price=od["exec_price"]
-                    ))
-                except Exception as e:
-                    print(f"Error updating order {od['_id']}: {e}")
+async def execute_fills(fills: List[Fill]) -> int:
+    """Persist fills in one bulk write; fills that could not be written go back into the book.
 
-        if orders_to_fill:
-            await broadcast_positions_update()
+    Fills of orders closed while the write was in flight (e.g. cancelled) are dropped.
+    """
+    if not fills:
+        return 0
+    database = await get_database()
+    failed, unmatched = await persist_fills(database, fills, fill_stats, settings.fill_journal_enabled)
+    for fill in failed:
+        # Still open in MongoDB; retry on a later tick
+        order_book.add(fill.order)
+    skipped_ids = {fill.order.id for fill in failed + unmatched}
+    filled_ids = []
+    for fill in fills:
+        if fill.order.id not in skipped_ids:
+            positions_ledger.apply_fill(fill.order, fill.quantity, fill.price)
+            filled_ids.append(fill.order.id)
+    if filled_ids:
+        positions_broadcaster.mark_dirty(orders=True)
+    await order_book.publish_changes(filled_ids)
+    return len(filled_ids)
+
+async def evaluate_and_execute_frame(prices: List[Tuple[str, float]], ft: Optional[int] = None,
+                                     run_database: Optional[str] = None) -> int:
+    """Match the (symbol, last price) ticks of one ft frame and persist all their fills with one bulk write.
+
+    Only the locks of the frame's symbols are held, so frames of other symbols proceed concurrently.
+    The end of the frame marks positions dirty for the coalescing broadcaster (prices moved).
+    """
+    filled = 0
+    try:
+        async with _order_eval_locks.hold(symbol for symbol, _ in prices):
+            started = time.perf_counter()
+            fills = []
+            for symbol, last_price in prices:
+                fills += match_orders(symbol, last_price, ft, run_database)
+            filled = await execute_fills(fills)
+            fill_stats.lock_held(time.perf_counter() - started)
     except Exception as e:
         print(f"Order evaluation error: {e}")
+    positions_broadcaster.mark_dirty()
+    return filled
+
+# Parsed parameters cached in memory; invalidated by the parameter APIs and over Redis
+parameter_cache = ParameterCache(get_parameter_by_name, redis_client, settings.parameter_cache_ttl_seconds)
+parameter_listener_task: asyncio.Task | None = None
 
 # Redis tick storage functions
 async def get_redis_tick_length() -> int:
-    """Get the REDIS_LONG_TICK_LENGTH parameter from the database"""
-    try:
-        parameter = await get_parameter_by_name("REDIS_LONG_TICK_LENGTH")
-        if parameter and parameter.is_active:
-            return int(parameter.value)
-        else:
-            # Default value if parameter not found or inactive
-            return 1000
-    except (ValueError, TypeError):
-        # Default value if parameter value is not a valid integer
-        return 1000
+    """Get the REDIS_LONG_TICK_LENGTH parameter (cached), defaulting to 1000"""
+    return await parameter_cache.get("REDIS_LONG_TICK_LENGTH", 1000, int)
 
 async def get_redis_short_tick_length() -> int:
-    """Get the REDIS_SHORT_TICK_LENGTH parameter from the database"""
-    try:
-        parameter = await get_parameter_by_name("REDIS_SHORT_TICK_LENGTH")
-        if parameter and parameter.is_active:
-            return int(parameter.value)
-        else:
-            # Default value if parameter not found or inactive
-            return 50
-    except (ValueError, TypeError):
-        # Default value if parameter value is not a valid integer
-        return 50
-
-def calculate_ema(prices: list, period: int) -> float:
-    """
-    Calculate Exponential Moving Average (EMA)
-    
-    Args:
-        prices: List of prices in chronological order (oldest first)
-        period: EMA period
-    
-    Returns:
-        EMA value
-    """
-    if not prices or len(prices) < period:
-        return None
-    
-    # Use Simple Moving Average (SMA) as the initial EMA value
-    sma = sum(prices[:period]) / period
-    
-    # Multiplier for EMA calculation
-    multiplier = 2 / (period + 1)
-    
-    # Calculate EMA
-    ema = sma
-    for price in prices[period:]:
-        ema = (price * multiplier) + (ema * (1 - multiplier))
-    
-    return round(ema, 2)
+    """Get the REDIS_SHORT_TICK_LENGTH parameter (cached), defaulting to 50"""
+    return await parameter_cache.get("REDIS_SHORT_TICK_LENGTH", 50, int)
+
+# Batched writer/reader shared by every run; caches REDIS_LONG_TICK_LENGTH between writes
+tick_codec = create_tick_codec(settings.redis_tick_encoding)
+tick_writer = create_tick_writer(settings.redis_tick_backend,
+                                 redis_binary_client if tick_codec.binary else redis_client,
+                                 get_redis_tick_length, settings.redis_tick_transaction, tick_codec)
+parameter_cache.add_listener(lambda name: tick_writer.invalidate())
+
+# Latest ticks of the runs replayed in this process, read before going to Redis
+tick_cache = TickCache()
+
+# Incremental index indicators (EMAs and any requested spec) of the runs replayed in this process
+index_indicators: Dict[str, IndicatorEngine] = {}
+
+# Indicators of every option token of the runs replayed in this process
+option_indicators: Dict[str, TokenIndicatorBank] = {}
+
+def create_option_indicator_bank() -> TokenIndicatorBank:
+    periods = [int(p) for p in settings.token_indicator_ema_periods.split(",") if p.strip()]
+    return TokenIndicatorBank(periods, settings.token_indicator_window)
+
+async def track_stored_ticks(ticks: List[TickRecord], database_name: str, max_ticks: Optional[int] = None):
+    """Add stored ticks (oldest first) to the in-process tick cache and index indicators"""
+    capacity = max_ticks or await tick_writer.max_ticks()
+    tick_cache.append(database_name, ((tick_key(database_name, tick), tick) for tick in ticks), capacity)
+    engine = index_indicators.get(database_name)
+    if engine is not None:
+        for tick in ticks:
+            if tick.data_type == "indextick":
+                engine.update(tick.lp, tick.ft)
+    bank = option_indicators.get(database_name)
+    if bank is not None:
+        bank.update(ticks)
+
+async def get_recent_index_prices(database_name: str, limit: int) -> list:
+    """Prices of the latest index ticks (up to limit), oldest first, from the tick cache or Redis"""
+    index_ticks = tick_cache.latest_values(database_name, index_key(database_name), limit)
+    if index_ticks is None:
+        # Redis returns ticks newest first
+        index_ticks = (await tick_writer.read_array(database_name, index_key(database_name), limit))[::-1]
+    return index_ticks["lp"].tolist()
 
 async def calculate_index_emas(database_name: str) -> dict:
     """
-    Calculate long and short EMAs for index ticks from Redis with progressive calculation
+    Calculate long and short EMAs for index ticks with progressive calculation
+    
+    Runs replayed in this process keep incremental EMAs that are read in O(1);
+    for other runs an IndicatorEngine is seeded from the stored ticks.
     
     Args:
         database_name: Name of the database
@@ -174,44 +228,32 @@ async def calculate_index_emas(database_name: str) -> dict:
         long_length = await get_redis_tick_length()
         short_length = await get_redis_short_tick_length()
         
-        # Get all available index ticks from Redis (up to long_length)
-        index_ticks = await get_ticks_from_redis(database_name, "indextick", long_length)
-        
-        if not index_ticks:
+        long_spec, short_spec = f"ema:{long_length}", f"ema:{short_length}"
+        engine = index_indicators.get(database_name)
+        if engine is not None:
+            if not engine.has(long_spec, short_spec):
+                # Periods changed: seed the new EMAs from the stored ticks once and keep them
+                # from eviction instead of the old ones
+                prices = await get_recent_index_prices(database_name, long_length)
+                engine.pin(long_spec, short_spec)
+                engine.add(long_spec, prices)
+                engine.add(short_spec, prices)
+            total_ticks = min(engine.count, long_length)
+        else:
+            # Seed a throwaway engine from the stored ticks (up to long_length, oldest first),
+            # so the values match the ones of a run replayed in this process
+            prices = await get_recent_index_prices(database_name, long_length)
+            engine = IndicatorEngine()
+            engine.rebuild(prices, (long_spec, short_spec))
+            total_ticks = len(prices)
+        if not total_ticks:
             return {"long_ema": None, "short_ema": None}
-        
-        # Sort ticks by feed time (ft) in ascending order (oldest first)
-        index_ticks.sort(key=lambda x: x.get("ft", 0))
-        
-        # Extract prices
-        prices = [tick.get("lp", 0) for tick in index_ticks if tick.get("lp") is not None]
-        total_ticks = len(prices)
-        
-        # Calculate short EMA if we have enough ticks
-        short_ema = None
-        short_period_used = 0
-        if total_ticks >= short_length:
-            short_ema = calculate_ema(prices, short_length)
-            short_period_used = short_length
-        elif total_ticks > 0:
-            # If we have some ticks but not enough for short EMA, use all available
-            short_ema = calculate_ema(prices, total_ticks)
-            short_period_used = total_ticks
-        
-        # Calculate long EMA using all available ticks (progressive)
-        long_ema = None
-        long_period_used = 0
-        if total_ticks > 0:
-            # Use all available ticks for long EMA (up to long_length)
-            actual_long_period = min(total_ticks, long_length)
-            long_ema = calculate_ema(prices, actual_long_period)
-            long_period_used = actual_long_period
-        
+        long_ema, short_ema = engine.get(long_spec), engine.get(short_spec)
         return {
-            "long_ema": long_ema,
-            "short_ema": short_ema,
-            "long_period": long_period_used,
-            "short_period": short_period_used,
+            "long_ema": round(long_ema.value, 2),
+            "short_ema": round(short_ema.value, 2),
+            "long_period": long_ema.period_used,
+            "short_period": short_ema.period_used,
             "total_ticks": total_ticks
         }
         
@@ -219,110 +261,140 @@ async def calculate_index_emas(database_name: str) -> dict:
         print(f"Error calculating index EMAs: {e}")
         return {"long_ema": None, "short_ema": None}
 
+async def get_index_indicators(database_name: str, specs: List[str]) -> dict:
+    """
+    Current values of index indicators by spec (e.g. "rsi:14", "macd:12,26,9")
+    
+    Runs replayed in this process register each new spec once, seeded from the
+    stored ticks, and share it with every later request; other runs are computed
+    from the stored ticks. Raises ValueError for unknown or invalid specs.
+    """
+    engine = index_indicators.get(database_name)
+    missing = [spec for spec in specs if engine is None or not engine.has(spec)]
+    if missing:
+        prices = await get_recent_index_prices(database_name, await get_redis_tick_length())
+        if engine is None:
+            engine = IndicatorEngine()
+        for spec in missing:
+            engine.add(spec, prices)
+    return engine.values(specs)
+
+async def get_option_indicators(database_name: str, tokens: Optional[List[str]] = None) -> dict:
+    """
+    Indicators of option tokens (every token seen when tokens is None)
+    
+    Runs replayed in this process read the per-token arrays kept by the tick
+    pipeline; other runs are computed from the stored ticks of each token.
+    """
+    bank = option_indicators.get(database_name)
+    if bank is not None:
+        return bank.values(tokens)
+    bank = create_option_indicator_bank()
+    tokens = tokens if tokens is not None else await get_option_tokens_from_redis(database_name)
+    limit = await get_redis_tick_length()
+    value_lists = await tick_writer.read_many([option_key(database_name, token) for token in tokens], limit)
+    arrays = [await tick_writer.codec.to_array(tick_writer.redis, database_name, values) for values in value_lists]
+    if arrays:
+        bank.update_array(arrays)
+    return bank.values(tokens)
+
+async def compute_ema_update(database_name: str, specs: Tuple[str, ...]) -> Optional[dict]:
+    """EMA message fields of a database for the EMA publisher, None while no EMA is available"""
+    ema_data = await calculate_index_emas(database_name)
+    if ema_data["long_ema"] is None and ema_data["short_ema"] is None:
+        return None
+    return {
+        "data_type": "ema_data",
+        "long_ema": ema_data["long_ema"],
+        "short_ema": ema_data["short_ema"],
+        "long_period": ema_data["long_period"],
+        "short_period": ema_data["short_period"],
+        "total_ticks": ema_data["total_ticks"],
+        "indicators": await get_index_indicators(database_name, list(specs)) if specs else {}
+    }
+
+def index_tick_version(database_name: str) -> Optional[int]:
+    """Index ticks seen by a run replayed in this process, None when unknown"""
+    engine = index_indicators.get(database_name)
+    return engine.count if engine is not None else None
+
+# One EMA publisher task per database, shared by every /ws/ema-data subscriber
+ema_publisher = EmaPublisher(compute_ema_update, index_tick_version, settings.websocket_send_timeout)
+
 async def flush_redis_for_database(database_name: str):
     """Flush Redis data for a specific database when trade run starts"""
     try:
-        # Get all keys for this database
-        pattern = f"ticks:{database_name}:*"
-        keys = await redis_client.keys(pattern)
+        # Walk this database's keys with SCAN and UNLINK them, without blocking other tenants
+        removed = await tick_writer.flush(database_name)
+        tick_cache.reset(database_name)
+        index_indicators.pop(database_name, None)
+        option_indicators.pop(database_name, None)
         
-        if keys:
-            # Delete all keys for this database
-            await redis_client.delete(*keys)
-            print(f"Flushed Redis data for database {database_name}: {len(keys)} keys deleted")
+        if removed:
+            print(f"Flushed Redis data for database {database_name}: {removed} keys deleted")
         else:
             print(f"No existing Redis data found for database {database_name}")
     except Exception as e:
         print(f"Error flushing Redis for database {database_name}: {e}")
 
-async def store_tick_in_redis(tick_data: dict, tick_type: str, database_name: str):
-    """Store tick data in Redis with FIFO behavior and proper sorting"""
+async def store_tick_in_redis(tick_data, tick_type: str, database_name: str):
+    """Store tick data (a dict or TickRecord) in Redis with FIFO behavior and proper sorting"""
     try:
-        # Get the maximum number of ticks to store
-        max_ticks = await get_redis_tick_length()
-        
-        if tick_type == "indextick":
-            # For index ticks, use a single key
-            redis_key = f"ticks:{database_name}:{tick_type}"
-            
-            # Add the tick data to the list
-            tick_json = json.dumps(tick_data)
-            await redis_client.lpush(redis_key, tick_json)
-            
-            # Trim the list to keep only the latest max_ticks
-            await redis_client.ltrim(redis_key, 0, max_ticks - 1)
-            
-        elif tick_type == "optiontick":
-            # For option ticks, store per token
-            token = tick_data.get("token", "unknown")
-            redis_key = f"ticks:{database_name}:{tick_type}:{token}"
-            
-            # Add the tick data to the list
-            tick_json = json.dumps(tick_data)
-            await redis_client.lpush(redis_key, tick_json)
-            
-            # Trim the list to keep only the latest max_ticks per token
-            await redis_client.ltrim(redis_key, 0, max_ticks - 1)
-        
-        print(f"Stored {tick_type} tick in Redis for database {database_name}")
+        tick = tick_data if isinstance(tick_data, TickRecord) else TickRecord.from_doc(tick_data, tick_type)
+        await tick_writer.write([tick], database_name)
+        await track_stored_ticks([tick], database_name)
     except Exception as e:
         print(f"Error storing tick in Redis: {e}")
 
-async def get_ticks_from_redis(database_name: str, tick_type: str, limit: int = None, token: str = None) -> list:
-    """Get ticks from Redis for a specific database and tick type"""
-    try:
-        if tick_type == "indextick":
-            redis_key = f"ticks:{database_name}:{tick_type}"
-        elif tick_type == "optiontick":
-            if token:
-                # Get ticks for specific token
-                redis_key = f"ticks:{database_name}:{tick_type}:{token}"
-            else:
-                # Get all option ticks (all tokens)
-                pattern = f"ticks:{database_name}:{tick_type}:*"
-                keys = await redis_client.keys(pattern)
-                all_ticks = []
-                
-                for key in keys:
-                    if limit:
-                        tick_jsons = await redis_client.lrange(key, 0, limit - 1)
-                    else:
-                        tick_jsons = await redis_client.lrange(key, 0, -1)
-                    
-                    for tick_json in tick_jsons:
-                        try:
-                            tick_data = json.loads(tick_json)
-                            all_ticks.append(tick_data)
-                        except json.JSONDecodeError:
-                            continue
-                
-                # Sort by feed time (ft) in descending order (latest first)
-                all_ticks.sort(key=lambda x: x.get("ft", 0), reverse=True)
-                
-                # Apply limit if specified
-                if limit:
-                    all_ticks = all_ticks[:limit]
-                
-                return all_ticks
+async def store_ticks_in_redis_bulk(ticks: List[TickRecord], database_name: str, max_ticks: Optional[int] = None):
+    """Store many ticks (oldest first) with one LPUSH and one LTRIM per key in a single round-trip"""
+    await tick_writer.write(ticks, database_name, max_ticks)
+    await track_stored_ticks(ticks, database_name, max_ticks)
+
+async def read_tick_values_from_redis(database_name: str, tick_type: str, limit: int = None, token: str = None,
+                                     start_ft: Optional[int] = None, end_ft: Optional[int] = None) -> list:
+    """Encoded ticks (newest first) of a database and tick type, read in one pipelined round-trip"""
+    if tick_type == "indextick":
+        redis_keys = [index_key(database_name)]
+    elif tick_type == "optiontick":
+        if token:
+            # Get ticks for specific token
+            redis_keys = [option_key(database_name, token)]
         else:
-            return []
-        
-        # For index ticks or specific token option ticks
-        if limit:
-            tick_jsons = await redis_client.lrange(redis_key, 0, limit - 1)
-        else:
-            tick_jsons = await redis_client.lrange(redis_key, 0, -1)
-        
-        # Parse JSON strings back to dictionaries
-        ticks = []
-        for tick_json in tick_jsons:
-            try:
-                tick_data = json.loads(tick_json)
-                ticks.append(tick_data)
-            except json.JSONDecodeError:
-                continue
-        
-        return ticks
+            # Get all option ticks (all registered tokens)
+            redis_keys = [option_key(database_name, t) for t in await tick_writer.option_tokens(database_name)]
+    else:
+        return []
+
+    value_lists = await tick_writer.read_many(redis_keys, limit, start_ft, end_ft)
+    if len(value_lists) == 1:
+        return value_lists[0]
+    # Each key is newest first; merge the tokens by feed time (ft), latest first
+    return tick_writer.merge_newest(value_lists, limit)
+
+def get_cached_ticks(database_name: str, tick_type: str, limit: int = None, token: str = None,
+                     start_ft: Optional[int] = None, end_ft: Optional[int] = None) -> Optional[List[TickRecord]]:
+    """TickRecords (newest first) from the in-process tick cache, or None when Redis must be read"""
+    if tick_type == "indextick":
+        redis_keys = [index_key(database_name)]
+    elif tick_type == "optiontick":
+        redis_keys = [option_key(database_name, token)] if token else tick_cache.keys(database_name, option_key(database_name, ""))
+        if redis_keys is None:
+            return None
+    else:
+        return None
+    return tick_cache.latest_records(database_name, redis_keys, limit, start_ft, end_ft)
+
+async def get_ticks_from_redis(database_name: str, tick_type: str, limit: int = None, token: str = None,
+                               start_ft: Optional[int] = None, end_ft: Optional[int] = None) -> list:
+    """Get ticks (newest first) from Redis for a specific database and tick type, optionally within an ft window"""
+    try:
+        cached = get_cached_ticks(database_name, tick_type, limit, token, start_ft, end_ft)
+        if cached is not None:
+            return [tick.to_dict() for tick in cached]
+        tick_values = await read_tick_values_from_redis(database_name, tick_type, limit, token, start_ft, end_ft)
+        # Decode stored values back to dictionaries
+        return await tick_writer.decode(database_name, tick_values, tick_type)
     except Exception as e:
         print(f"Error getting ticks from Redis: {e}")
         return []
@@ -330,50 +402,12 @@ async def get_ticks_from_redis(database_name: str, tick_type: str, limit: int =
 async def get_option_tokens_from_redis(database_name: str) -> list:
     """Get list of option tokens that have data in Redis"""
     try:
-        pattern = f"ticks:{database_name}:optiontick:*"
-        keys = await redis_client.keys(pattern)
-        
-        # Extract token numbers from keys
-        tokens = []
-        for key in keys:
-            # Key format: ticks:database:optiontick:token
-            parts = key.split(":")
-            if len(parts) >= 4:
-                token = parts[3]
-                tokens.append(token)
-        
-        return tokens
+        # Tokens are registered in ticks:{database}:tokens as their ticks are written
+        return await tick_writer.option_tokens(database_name)
     except Exception as e:
         print(f"Error getting option tokens from Redis: {e}")
         return []
 
-def validate_parameter_value(value: str, datatype: str):
-    """Validate that a parameter value matches its specified datatype"""
-    try:
-        if datatype == 'int':
-            int(value)
-        elif datatype == 'double':
-            float(value)
-        elif datatype == 'boolean':
-            if value.lower() not in ['true', 'false', '1', '0', 'yes', 'no']:
-                raise ValueError(f"Value '{value}' is not a valid boolean")
-        elif datatype == 'date':
-            # Basic date format validation (YYYY-MM-DD)
-            import re
-            if not re.match(r'^\d{4}-\d{2}-\d{2}$', value):
-                raise ValueError(f"Value '{value}' is not a valid date format (YYYY-MM-DD)")
-        elif datatype == 'datetime':
-            # Basic datetime format validation (YYYY-MM-DD HH:MM:SS)
-            import re
-            if not re.match(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$', value):
-                raise ValueError(f"Value '{value}' is not a valid datetime format (YYYY-MM-DD HH:MM:SS)")
-        elif datatype == 'json':
-            import json
-            json.loads(value)
-        # string type doesn't need validation
-    except (ValueError, json.JSONDecodeError) as e:
-        raise ValueError(f"Value '{value}' does not match datatype '{datatype}': {str(e)}")
-
 async def execute_mongo_views_script(database_name: str):
     """Execute the MongoDB analysis views script on the selected database"""
     try:
@@ -750,17 +784,45 @@ db.createView(
         return False
 
 # WebSocket connection manager
+def session_channel(database_name: str) -> str:
+    """Redis pub/sub channel a worker-process session publishes its WebSocket messages on"""
+    return f"run:{database_name}:messages"
+
+def session_status_key(database_name: str) -> str:
+    """Redis key a worker-process session keeps its status under"""
+    return f"run:{database_name}:status"
+
+# Seconds a stopping stream waits for its pipeline to drain before the final checkpoint
+FINAL_CHECKPOINT_TIMEOUT_SECONDS = 5.0
+
 class ConnectionManager:
-    def __init__(self):
+    def __init__(self, publish_channel: Optional[str] = None):
         self.active_connections: List[WebSocket] = []
         self.tick_stream_task = None
         self.current_database = None
         self.is_streaming = False
+        self.interval_seconds = 1.0
+        self.pipeline: Optional[Pipeline] = None
+        self.pacer: Optional[ReplayPacer] = None
+        # Market time of the replay, shared with the strategy engine
+        self.clock = VirtualClock()
+        # Late ticks dropped while following live inserts
+        self.live_stats = LiveWatchStats()
+        # Last prices seen by this stream only
+        self.last_prices: dict[str, float] = {}
+        # When set, fan-out publishes to Redis instead of local WebSocket clients
+        self.publish_channel = publish_channel
+        self._last_checkpoint = 0.0
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
         self.active_connections.append(websocket)
 
+    def subscribe(self, websocket: WebSocket):
+        """Add an already accepted WebSocket to this manager's clients"""
+        if websocket not in self.active_connections:
+            self.active_connections.append(websocket)
+
     def disconnect(self, websocket: WebSocket):
         if websocket in self.active_connections:
             self.active_connections.remove(websocket)
@@ -768,28 +830,61 @@ class ConnectionManager:
     async def send_personal_message(self, message: str, websocket: WebSocket):
         await websocket.send_text(message)
 
+    async def _send_or_drop(self, connection: WebSocket, message: str):
+        try:
+            await asyncio.wait_for(connection.send_text(message), settings.websocket_send_timeout)
+        except Exception:
+            # Remove disconnected or stalled clients
+            self.disconnect(connection)
+
     async def broadcast(self, message: str):
         if self.active_connections:
-            # Send to all connected clients
-            for connection in self.active_connections:
-                try:
-                    await connection.send_text(message)
-                except:
-                    # Remove disconnected clients
-                    self.active_connections.remove(connection)
+            # Send to all connected clients concurrently so one slow client cannot stall the rest
+            await asyncio.gather(*(self._send_or_drop(connection, message)
+                                   for connection in list(self.active_connections)))
 
     def is_stream_running(self) -> bool:
         """Check if the tick stream is currently running"""
         return self.is_streaming and self.tick_stream_task and not self.tick_stream_task.done()
 
-    async def start_tick_stream(self, database_name: str, interval_seconds: float = 1.0):
-        """Start streaming tick data from the specified database"""
+    async def start_tick_stream(self, database_name: str, interval_seconds: float = 1.0,
+                                mode: ReplayMode = ReplayMode.INTERVAL, speed: float = 1.0,
+                                checkpoint: Optional[dict] = None,
+                                start_ft: Optional[int] = None, end_ft: Optional[int] = None):
+        """Start streaming tick data from the specified database.
+
+        The replay resumes from a checkpoint when given, otherwise it seeks to
+        start_ft; it stops after end_ft instead of following live inserts.
+        """
         if self.tick_stream_task and not self.tick_stream_task.done():
             self.tick_stream_task.cancel()
         
         self.current_database = database_name
         self.is_streaming = True
-        self.tick_stream_task = asyncio.create_task(self._stream_ticks(database_name, interval_seconds))
+        self.interval_seconds = interval_seconds
+        self.pacer = ReplayPacer(mode, speed, interval_seconds)
+        self.clock.reset()
+        self.live_stats = LiveWatchStats()
+        self.last_prices = {}
+        # A fresh replay starts from flushed Redis keys, so the tick cache sees every tick of the run
+        tick_cache.reset(database_name, complete=checkpoint is None)
+        # Index indicators continue from the checkpoint, or start with the run; without either
+        # they are computed from the stored ticks
+        if checkpoint is None:
+            index_indicators[database_name] = IndicatorEngine((f"ema:{await get_redis_tick_length()}",
+                                                               f"ema:{await get_redis_short_tick_length()}"))
+        elif checkpoint.get("index_indicators"):
+            index_indicators[database_name] = IndicatorEngine.from_state(checkpoint["index_indicators"])
+        else:
+            index_indicators.pop(database_name, None)
+        if checkpoint is None:
+            option_indicators[database_name] = create_option_indicator_bank()
+        elif checkpoint.get("option_indicators"):
+            option_indicators[database_name] = TokenIndicatorBank.from_state(checkpoint["option_indicators"])
+        else:
+            option_indicators.pop(database_name, None)
+        self.tick_stream_task = asyncio.create_task(
+            self._stream_ticks(database_name, interval_seconds, checkpoint, start_ft, end_ft))
 
     async def stop_tick_stream(self):
         """Stop the tick data stream"""
@@ -806,308 +901,474 @@ class ConnectionManager:
         self.is_streaming = False
         print("Tick stream stopped")
 
-    async def _stream_ticks(self, database_name: str, interval_seconds: float = 1.0):
-        """Stream tick data from MongoDB with proper interval control"""
+    async def _ema_message(self, database_name: str) -> Optional[str]:
+        """Calculate EMAs for the database and build the broadcast message if available"""
+        try:
+            ema_data = await calculate_index_emas(database_name)
+            engine = index_indicators.get(database_name)
+            if ema_data["long_ema"] is not None or ema_data["short_ema"] is not None:
+                return json.dumps({
+                    "data_type": "ema_data",
+                    "long_ema": ema_data["long_ema"],
+                    "short_ema": ema_data["short_ema"],
+                    "long_period": ema_data["long_period"],
+                    "short_period": ema_data["short_period"],
+                    "total_ticks": ema_data["total_ticks"],
+                    "indicators": engine.values() if engine else {},
+                    "timestamp": datetime.now().isoformat()
+                })
+        except Exception as e:
+            print(f"Error calculating EMAs: {e}")
+        return None
+
+    def _build_pipeline(self, database_name: str) -> Pipeline:
+        """Wire the tick stages: market state -> (Redis persist, order matching, fan-out)"""
+        queue_size = settings.pipeline_queue_size
+        batch_size = settings.pipeline_batch_size
+
+        fanout = Stage("fanout", self._fanout_batch, maxsize=queue_size,
+                       policy=settings.pipeline_fanout_policy, batch_size=batch_size)
+        async def match_batch(batch: list):
+            await self._match_batch(batch, database_name)
+
+        matching = Stage("matching", match_batch, maxsize=queue_size,
+                         policy=QueuePolicy.BLOCK, concurrency=settings.pipeline_matching_workers,
+                         batch_size=batch_size, partition_key=lambda tick: (tick.ts or "").upper())
+
+        async def persist_batch(batch: list):
+            await self._persist_batch(batch, database_name, fanout)
+
+        persist = Stage("persist", persist_batch, maxsize=queue_size,
+                        policy=settings.pipeline_persist_policy, batch_size=batch_size)
+
+        async def update_market_state(frames: list):
+            await self._update_market_state(frames, persist, matching, fanout)
+
+        market = Stage("market", update_market_state, maxsize=queue_size, policy=QueuePolicy.BLOCK)
+        return Pipeline([market, persist, matching, fanout])
+
+    async def _update_market_state(self, frames: list, persist: Stage, matching: Stage, fanout: Stage):
+        """Turn frames into tick records, update last prices and hand ticks to the downstream stages"""
+        for frame in frames:
+            self.clock.advance(frame.ft)
+            ticks = [TickRecord.from_doc(doc, "indextick") for doc in frame.index_docs]
+            ticks += [TickRecord.from_doc(doc, "optiontick") for doc in frame.option_docs]
+            for tick in ticks:
+                if tick.ts:
+                    self.last_prices[tick.ts] = tick.lp
+
+                # One encoding of the tick is shared by fan-out and Redis
+                await fanout.put(tick.json)
+                await persist.put(tick)
+                await matching.put(tick)
+
+            if frame.option_docs:
+                print(f"IndexTick {frame.ft}: sent {len(frame.option_docs)} matching OptionTicks")
+
+    async def _persist_batch(self, ticks: list, database_name: str, fanout: Stage):
+        """Store a batch of ticks in Redis in one round-trip, then publish EMAs if index ticks were stored"""
+        try:
+            await tick_writer.write(ticks, database_name)
+        except Exception as e:
+            print(f"Error storing {len(ticks)} ticks in Redis: {e}")
+        else:
+            # Only ticks that reached Redis go to the tick cache and the indicator engines
+            await track_stored_ticks(ticks, database_name)
+        if any(tick.data_type == "indextick" for tick in ticks):
+            ema_message = await self._ema_message(database_name)
+            if ema_message:
+                await fanout.put(ema_message)
+
+    async def _match_batch(self, ticks: list, database_name: str):
+        """Evaluate orders frame by frame, one fill write per frame; every tick of one symbol goes through the same worker"""
+        for ft, frame in groupby(ticks, key=lambda tick: tick.ft):
+            await evaluate_and_execute_frame([(tick.ts, tick.lp) for tick in frame], ft, database_name)
+
+    async def _fanout_batch(self, messages: list):
+        if self.publish_channel:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for message in messages:
+                    pipe.publish(self.publish_channel, message)
+                await pipe.execute()
+            return
+        for message in messages:
+            await self.broadcast(message)
+
+    def _stream_stopped(self) -> bool:
+        return not self.is_streaming or (self.tick_stream_task and self.tick_stream_task.done())
+
+    def pipeline_stats(self) -> dict:
+        return self.pipeline.stats() if self.pipeline else {}
+
+    def replay_stats(self) -> dict:
+        stats = self.pacer.stats() if self.pacer else {}
+        market_time = self.clock.now_datetime()
+        stats["market_time"] = market_time.isoformat() if market_time else None
+        stats["late_ticks"] = self.live_stats.late_ticks
+        if self.pipeline and stats.get("ticks"):
+            # CPU spent building and routing tick records in the market stage
+            busy = self.pipeline["market"].busy_seconds
+            stats["market_us_per_tick"] = round(busy / stats["ticks"] * 1e6, 2)
+        return stats
+
+    def session_status(self) -> dict:
+        return {
+            "database_name": self.current_database,
+            "is_stream_running": bool(self.is_stream_running()),
+            "interval_seconds": self.interval_seconds,
+            "clients": len(self.active_connections),
+            "replay": self.replay_stats(),
+            "pipeline": self.pipeline_stats()
+        }
+
+    async def _checkpoint_state(self, database_name: str, last_ft: Optional[int]) -> dict:
+        """Replay cursor, in-memory market state and an order/position snapshot of this run"""
+        state = {
+            "last_ft": last_ft,
+            "clock_ft": self.clock.now(),
+            "interval_seconds": self.interval_seconds,
+            "mode": self.pacer.mode.value if self.pacer else ReplayMode.INTERVAL.value,
+            "speed": self.pacer.speed if self.pacer else 1.0,
+            "last_prices": dict(self.last_prices),
+        }
+        engine = index_indicators.get(database_name)
+        if engine is not None:
+            state["index_indicators"] = engine.state()
+        bank = option_indicators.get(database_name)
+        if bank is not None:
+            state["option_indicators"] = bank.state()
+        database = await get_database()
+        open_orders = await database.orders.find({
+            "status": {"$in": [OrderStatus.PENDING, OrderStatus.PARTIALLY_FILLED]},
+            "run_database": {"$in": [database_name, None]}
+        }, {"_id": 1}).to_list(length=None)
+        state["open_orders"] = [str(doc["_id"]) for doc in open_orders]
+        state["positions"] = positions_ledger.positions()
+        return state
+
+    async def _maybe_checkpoint(self, pipeline: Pipeline, database_name: str, last_ft: Optional[int]):
+        """Save a checkpoint every CHECKPOINT_INTERVAL_SECONDS of wall-clock time"""
+        if settings.checkpoint_interval_seconds <= 0 or last_ft is None:
+            return
+        now = time.monotonic()
+        if now - self._last_checkpoint < settings.checkpoint_interval_seconds:
+            return
+        self._last_checkpoint = now
+        try:
+            # Drain the stages so every tick up to last_ft is stored and matched
+            await pipeline.join()
+            await save_checkpoint(database_name, await self._checkpoint_state(database_name, last_ft))
+        except Exception as e:
+            print(f"Error saving checkpoint for database {database_name}: {e}")
+
+    async def _final_checkpoint(self, pipeline: Pipeline, database_name: str, last_ft: Optional[int]):
+        """Save a checkpoint when the stream stops or ends, so a resume starts at the last replayed ft"""
+        if settings.checkpoint_interval_seconds <= 0 or last_ft is None:
+            return
+        try:
+            # Only checkpoint once every replayed tick is stored and matched
+            await asyncio.wait_for(pipeline.join(), FINAL_CHECKPOINT_TIMEOUT_SECONDS)
+            await save_checkpoint(database_name, await self._checkpoint_state(database_name, last_ft))
+            print(f"Saved final checkpoint for database {database_name} at ft {last_ft}")
+        except Exception as e:
+            print(f"Error saving final checkpoint for database {database_name}: {e}")
+
+    async def _warm_up(self, database, database_name: str, start_ft: int):
+        """Load the ticks preceding start_ft into Redis in one bulk read so EMAs are ready at the seek point"""
+        started = time.perf_counter()
+        max_ticks = await get_redis_tick_length()
+        index_docs, option_docs = await read_warmup_ticks(database, start_ft, max_ticks)
+        ticks = [TickRecord.from_doc(doc, "indextick") for doc in index_docs]
+        ticks += [TickRecord.from_doc(doc, "optiontick") for doc in option_docs]
+        await store_ticks_in_redis_bulk(ticks, database_name, max_ticks)
+        for tick in sorted(ticks, key=lambda tick: tick.ft):
+            if tick.ts:
+                self.last_prices[tick.ts] = tick.lp
+        print(f"Warmed {len(index_docs)} IndexTicks and {len(option_docs)} OptionTicks before ft {start_ft} "
+              f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    async def _stream_ticks(self, database_name: str, interval_seconds: float = 1.0,
+                            checkpoint: Optional[dict] = None,
+                            start_ft: Optional[int] = None, end_ft: Optional[int] = None):
+        """Ingest tick frames from MongoDB into the tick pipeline with proper interval control"""
+        pipeline = self._build_pipeline(database_name)
+        self.pipeline = pipeline
+        pipeline.start()
+        market = pipeline["market"]
+        pacer = self.pacer or ReplayPacer(interval_seconds=interval_seconds)
+        last_ft = None
         try:
             # Connect to the specific database
             database = db.client[database_name]
-            indextick_collection = database["IndexTick"]
-            
-            # Check if OptionTick collection exists
-            try:
-                optiontick_collection = database["OptionTick"]  # Exact collection name
-                optiontick_exists = True
-                print(f"OptionTick collection found in database {database_name}")
-            except Exception as e:
-                print(f"OptionTick collection not found in database {database_name}: {e}")
-                optiontick_exists = False
-            
-            print(f"Starting tick stream from database {database_name} with {interval_seconds}s interval")
-            
-            # Stream IndexTick data and find matching OptionTick data for each
+
+            print(f"Starting tick stream from database {database_name} in {pacer.mode.value} mode "
+                  f"(interval {interval_seconds}s, speed {pacer.speed}x)")
+
+            self._last_checkpoint = time.monotonic()
+            if checkpoint:
+                # Restore market state and continue right after the checkpointed ft
+                last_ft = checkpoint.get("last_ft")
+                if last_ft is not None:
+                    # Ticks stored after the checkpoint are replayed again; drop them so they are not stored twice
+                    removed = await tick_writer.trim_after(database_name, last_ft)
+                    if removed:
+                        print(f"Removed {removed} Redis ticks stored after checkpoint ft {last_ft}")
+                self.last_prices.update(checkpoint.get("last_prices") or {})
+                if checkpoint.get("clock_ft"):
+                    self.clock.advance(checkpoint["clock_ft"])
+                print(f"Resuming tick stream from checkpoint after ft {last_ft}")
+            elif start_ft is not None:
+                # Seek straight to the window start through the ft index
+                await self._warm_up(database, database_name, start_ft)
+                last_ft = start_ft - 1
+                print(f"Seeking tick stream to ft {start_ft}")
+
+            # Replay IndexTick and OptionTick through one merged ft-sorted reader
             print("Starting synchronized IndexTick and OptionTick streaming...")
-            cursor = indextick_collection.find({}).sort("ft", 1)  # Oldest first
-            
             initial_count = 0
-            async for doc in cursor:
+            async for frame in iter_tick_frames(database, after_ft=last_ft, until_ft=end_ft):
                 # Check if stream was stopped
-                if not self.is_streaming or (self.tick_stream_task and self.tick_stream_task.done()):
+                if self._stream_stopped():
                     print("DEBUG: Tick stream was stopped during streaming")
                     return
-                
-                # Get the feed time for this IndexTick
-                current_ft = doc.get("ft", 0)
-                
-                # Send IndexTick data
-                tick_data = TickData(
-                    ft=doc.get("ft", 0),
-                    token=doc.get("token", 0),
-                    e=doc.get("e", ""),
-                    lp=doc.get("lp", 0.0),
-                    pc=doc.get("pc", 0.0),
-                    rt=doc.get("rt", ""),
-                    ts=doc.get("ts", ""),
-                    _id=str(doc.get("_id", ""))
-                )
-                
-                tick_dict = tick_data.dict()
-                tick_dict["data_type"] = "indextick"
-                await self.broadcast(json.dumps(tick_dict))
-                
-                # Store index tick in Redis
-                await store_tick_in_redis(tick_dict, "indextick", database_name)
 
-                # Evaluate orders for this symbol
-                try:
-                    await evaluate_and_execute_orders(tick_dict.get("ts"), tick_dict.get("lp", 0.0))
-                except Exception as e:
-                    print(f"Order evaluation failed (initial stream) for {tick_dict.get('ts')}: {e}")
-                # Update last price and broadcast positions
-                sym_idx = tick_dict.get("ts")
-                if sym_idx:
-                    last_prices[sym_idx] = tick_dict.get("lp", 0.0)
-                try:
-                    await broadcast_positions_update()
-                except Exception as e:
-                    print(f"Positions broadcast error (initial index): {e}")
-                
-                # Calculate and broadcast EMA data
-                try:
-                    ema_data = await calculate_index_emas(database_name)
-                    if ema_data["long_ema"] is not None or ema_data["short_ema"] is not None:
-                        ema_message = {
-                            "data_type": "ema_data",
-                            "long_ema": ema_data["long_ema"],
-                            "short_ema": ema_data["short_ema"],
-                            "long_period": ema_data["long_period"],
-                            "short_period": ema_data["short_period"],
-                            "total_ticks": ema_data["total_ticks"],
-                            "timestamp": datetime.now().isoformat()
-                        }
-                        await self.broadcast(json.dumps(ema_message))
-                except Exception as e:
-                    print(f"Error calculating EMAs: {e}")
-                
-                # Find and send all OptionTick data with the same feed time
-                if optiontick_exists:
-                    option_cursor = optiontick_collection.find({"ft": current_ft})
-                    option_count = 0
-                    async for option_doc in option_cursor:
-                        option_tick_data = OptionTickData(
-                            ft=option_doc.get("ft", 0),
-                            token=option_doc.get("token", 0),
-                            e=option_doc.get("e", ""),
-                            lp=option_doc.get("lp", 0.0),
-                            pc=option_doc.get("pc", 0.0),
-                            rt=option_doc.get("rt", ""),
-                            ts=option_doc.get("ts", ""),
-                            _id=str(option_doc.get("_id", ""))
-                        )
-                        
-                        option_tick_dict = option_tick_data.dict()
-                        option_tick_dict["data_type"] = "optiontick"
-                        await self.broadcast(json.dumps(option_tick_dict))
-                        
-                        # Store option tick in Redis
-                        await store_tick_in_redis(option_tick_dict, "optiontick", database_name)
-                        # Evaluate orders for option symbol
-                        try:
-                            await evaluate_and_execute_orders(option_tick_dict.get("ts"), option_tick_dict.get("lp", 0.0))
-                        except Exception as e:
-                            print(f"Order evaluation failed (option initial) for {option_tick_dict.get('ts')}: {e}")
-                        # Update last option price and broadcast
-                        sym_opt = option_tick_dict.get("ts")
-                        if sym_opt:
-                            last_prices[sym_opt] = option_tick_dict.get("lp", 0.0)
-                        try:
-                            await broadcast_positions_update()
-                        except Exception as e:
-                            print(f"Positions broadcast error (option initial): {e}")
-                        option_count += 1
-                    
-                    if option_count > 0:
-                        print(f"IndexTick {current_ft}: sent {option_count} matching OptionTicks")
-                
-                initial_count += 1
-                
-                # Apply interval between each IndexTick
-                await asyncio.sleep(interval_seconds)
-                
+                await market.put(frame)
+                last_ft = frame.ft
+                initial_count += len(frame.index_docs)
+
+                # Wait according to the replay mode (fixed interval, scaled ft gaps or none)
+                await pacer.pace(frame)
+
                 # Progress update every 100 ticks
                 if initial_count % 100 == 0:
                     print(f"Processed {initial_count} IndexTicks...")
-            
-            print(f"Completed streaming {initial_count} IndexTicks with matching OptionTicks")
-            
-            # Get the latest timestamp to start monitoring for new data
-            latest_doc = await indextick_collection.find_one({}, sort=[("ft", -1)])
-            last_ft = latest_doc.get("ft", 0) if latest_doc else 0
-            
+
+                await self._maybe_checkpoint(pipeline, database_name, last_ft)
+
+            replay_stats = pacer.stats()
+            print(f"Completed streaming {initial_count} IndexTicks with matching OptionTicks "
+                  f"({replay_stats['ticks_per_second']} ticks/s)")
+
+            if end_ft is not None:
+                # A bounded window ends here instead of following live inserts
+                await pipeline.join()
+                print(f"Reached end of replay window at ft {end_ft}")
+                return
+
+            # Start monitoring for new data after the last replayed timestamp
+            if last_ft is None:
+                last_ft = 0
             print(f"Monitoring for new ticks after timestamp: {last_ft}")
-            
-            # Now monitor for new ticks with configurable interval
-            while self.is_streaming:
+
+            # Follow live inserts (change stream, or polling every interval); ticks now arrive in real
+            # time and may pause, so strategy waits run on the wall clock
+            self.clock.release()
+            new_tick_count = 0
+            async for frame in watch_tick_frames(database, after_ft=last_ft, poll_interval=interval_seconds,
+                                                 stats=self.live_stats):
                 # Check if stream was stopped
-                if self.tick_stream_task and self.tick_stream_task.done():
-                    print("Tick stream was stopped during monitoring")
-                    break
-                
-                # Check for new ticks
-                new_ticks = indextick_collection.find({"ft": {"$gt": last_ft}}).sort("ft", 1)
-                new_tick_count = 0
-                
-                async for new_doc in new_ticks:
-                    # Check if stream was stopped
-                    if not self.is_streaming or (self.tick_stream_task and self.tick_stream_task.done()):
-                        print("DEBUG: Tick stream was stopped during new tick monitoring")
-                        return
-                    
-                    # Get the feed time for this IndexTick
-                    current_ft = new_doc.get("ft", 0)
-                    
-                    # Send IndexTick data
-                    tick_data = TickData(
-                        ft=new_doc.get("ft", 0),
-                        token=new_doc.get("token", 0),
-                        e=new_doc.get("e", ""),
-                        lp=new_doc.get("lp", 0.0),
-                        pc=new_doc.get("pc", 0.0),
-                        rt=new_doc.get("rt", ""),
-                        ts=new_doc.get("ts", ""),
-                        _id=str(new_doc.get("_id", ""))
-                    )
-                    
-                    tick_dict = tick_data.dict()
-                    tick_dict["data_type"] = "indextick"
-                    await self.broadcast(json.dumps(tick_dict))
-                    
-                    # Store index tick in Redis
-                    await store_tick_in_redis(tick_dict, "indextick", database_name)
-
-                    # Evaluate orders for this symbol
-                    try:
-                        await evaluate_and_execute_orders(tick_dict.get("ts"), tick_dict.get("lp", 0.0))
-                    except Exception as e:
-                        print(f"Order evaluation failed (monitoring) for {tick_dict.get('ts')}: {e}")
-                    # Update last price and broadcast
-                    sym_idx2 = tick_dict.get("ts")
-                    if sym_idx2:
-                        last_prices[sym_idx2] = tick_dict.get("lp", 0.0)
-                    try:
-                        await broadcast_positions_update()
-                    except Exception as e:
-                        print(f"Positions broadcast error (monitor index): {e}")
-                    
-                    # Calculate and broadcast EMA data
-                    try:
-                        ema_data = await calculate_index_emas(database_name)
-                        if ema_data["long_ema"] is not None or ema_data["short_ema"] is not None:
-                            ema_message = {
-                                "data_type": "ema_data",
-                                "long_ema": ema_data["long_ema"],
-                                "short_ema": ema_data["short_ema"],
-                                "long_period": ema_data["long_period"],
-                                "short_period": ema_data["short_period"],
-                                "total_ticks": ema_data["total_ticks"],
-                                "timestamp": datetime.now().isoformat()
-                            }
-                            await self.broadcast(json.dumps(ema_message))
-                    except Exception as e:
-                        print(f"Error calculating EMAs: {e}")
-                    
-                    # Find and send all OptionTick data with the same feed time
-                    if optiontick_exists:
-                        option_cursor = optiontick_collection.find({"ft": current_ft})
-                        option_count = 0
-                        async for option_doc in option_cursor:
-                            option_tick_data = OptionTickData(
-                                ft=option_doc.get("ft", 0),
-                                token=option_doc.get("token", 0),
-                                e=option_doc.get("e", ""),
-                                lp=option_doc.get("lp", 0.0),
-                                pc=option_doc.get("pc", 0.0),
-                                rt=option_doc.get("rt", ""),
-                                ts=option_doc.get("ts", ""),
-                                _id=str(option_doc.get("_id", ""))
-                            )
-                            
-                            option_tick_dict = option_tick_data.dict()
-                            option_tick_dict["data_type"] = "optiontick"
-                            await self.broadcast(json.dumps(option_tick_dict))
-                            
-                            # Store option tick in Redis
-                            await store_tick_in_redis(option_tick_dict, "optiontick", database_name)
-                            # Evaluate orders for option symbol
-                            try:
-                                await evaluate_and_execute_orders(option_tick_dict.get("ts"), option_tick_dict.get("lp", 0.0))
-                            except Exception as e:
-                                print(f"Order evaluation failed (option monitoring) for {option_tick_dict.get('ts')}: {e}")
-                            # Update last price and broadcast
-                            sym_opt2 = option_tick_dict.get("ts")
-                            if sym_opt2:
-                                last_prices[sym_opt2] = option_tick_dict.get("lp", 0.0)
-                            try:
-                                await broadcast_positions_update()
-                            except Exception as e:
-                                print(f"Positions broadcast error (option monitor): {e}")
-                            option_count += 1
-                        
-                        if option_count > 0:
-                            print(f"New IndexTick {current_ft}: sent {option_count} matching OptionTicks")
-                    
-                    new_tick_count += 1
-                    last_ft = current_ft
-                
-                if new_tick_count > 0:
+                if self._stream_stopped():
+                    print("DEBUG: Tick stream was stopped during new tick monitoring")
+                    return
+
+                await market.put(frame)
+                last_ft = frame.ft
+                new_tick_count += len(frame.index_docs)
+                if new_tick_count and new_tick_count % 100 == 0:
                     print(f"Processed {new_tick_count} new IndexTicks")
-                
-                # Calculate and broadcast EMA data periodically (even if no new ticks)
-                try:
-                    ema_data = await calculate_index_emas(database_name)
-                    if ema_data["long_ema"] is not None or ema_data["short_ema"] is not None:
-                        ema_message = {
-                            "data_type": "ema_data",
-                            "long_ema": ema_data["long_ema"],
-                            "short_ema": ema_data["short_ema"],
-                            "long_period": ema_data["long_period"],
-                            "short_period": ema_data["short_period"],
-                            "total_ticks": ema_data["total_ticks"],
-                            "timestamp": datetime.now().isoformat()
-                        }
-                        await self.broadcast(json.dumps(ema_message))
-                except Exception as e:
-                    print(f"Error calculating EMAs: {e}")
-                
-                # Apply interval between checks
-                await asyncio.sleep(interval_seconds)
-            
+
+                await self._maybe_checkpoint(pipeline, database_name, last_ft)
+
         except Exception as e:
             print(f"Error starting tick stream: {e}")
         finally:
+            # Strategy waits must not hang on a clock that no longer advances
+            self.clock.release()
+            await self._final_checkpoint(pipeline, database_name, last_ft)
+            await pipeline.stop()
             print("Tick stream ended")
 
-# Create connection manager instances
-manager = ConnectionManager()
-positions_manager = ConnectionManager()
-positions_broadcast_task: asyncio.Task | None = None
+class RunSessionRegistry:
+    """Concurrent trade-run sessions, one per run database.
 
-async def _positions_periodic_broadcaster():
-    """Periodically broadcast positions (with latest prices) while clients are connected."""
-    global positions_broadcast_task
-    try:
-        while positions_manager.active_connections:
+    Each session replays in its own task with its own pipeline, clock, last
+    prices and WebSocket subscribers; Redis keys and orders are scoped by the
+    database name. With RUN_SESSION_PROCESSES enabled the replay runs in a
+    child process (run_worker.py) instead, and its WebSocket messages are
+    relayed from a Redis pub/sub channel.
+    """
+
+    def __init__(self):
+        self.sessions: Dict[str, ConnectionManager] = {}
+        self.processes: Dict[str, asyncio.subprocess.Process] = {}
+        self.relay_tasks: Dict[str, asyncio.Task] = {}
+
+    def get(self, database_name: Optional[str]) -> Optional[ConnectionManager]:
+        return self.sessions.get(database_name) if database_name else None
+
+    def is_running(self, database_name: Optional[str]) -> bool:
+        if database_name in self.processes:
+            return self.processes[database_name].returncode is None
+        session = self.get(database_name)
+        return bool(session and session.is_stream_running())
+
+    def running(self) -> List[str]:
+        return [name for name in self.sessions if self.is_running(name)]
+
+    def last_price(self, symbol: str, database_name: Optional[str] = None) -> Optional[float]:
+        """Last price of a symbol in the given run's session, else in the first other session that has one"""
+        session = self.get(database_name)
+        if session and symbol in session.last_prices:
+            return session.last_prices[symbol]
+        for session in self.sessions.values():
+            if symbol in session.last_prices:
+                return session.last_prices[symbol]
+        return None
+
+    def clock_for(self, database_name: Optional[str]) -> VirtualClock:
+        """Market clock of a session; worker-process sessions have no local clock"""
+        session = self.get(database_name)
+        if session and database_name not in self.processes:
+            return session.clock
+        return VirtualClock()
+
+    async def start(self, database_name: str, interval_seconds: float = 1.0,
+                    mode: ReplayMode = ReplayMode.INTERVAL, speed: float = 1.0,
+                    resume: bool = False, start_ft: Optional[int] = None,
+                    end_ft: Optional[int] = None, fresh: bool = False) -> ConnectionManager:
+        """Start (or restart) the replay of one database, keeping its subscribers.
+
+        With resume the replay continues from the database's checkpoint. With fresh
+        the database's Redis ticks and checkpoint are removed once the previous
+        replay stopped, so the ticks and checkpoint it saves while stopping do not
+        leak into the new run.
+        """
+        if not self.is_running(database_name) and len(self.running()) >= settings.max_run_sessions:
+            raise ValueError(f"Maximum of {settings.max_run_sessions} concurrent runs reached")
+        await self.stop(database_name)
+        if fresh:
+            await flush_redis_for_database(database_name)
+            await clear_checkpoint(database_name)
+        session = self.sessions.setdefault(database_name, ConnectionManager())
+
+        if settings.run_session_processes:
+            args = [database_name, "--interval", str(interval_seconds),
+                    "--mode", ReplayMode(mode).value, "--speed", str(speed)]
+            if resume:
+                args.append("--resume")
+            if start_ft is not None:
+                args += ["--start-ft", str(start_ft)]
+            if end_ft is not None:
+                args += ["--end-ft", str(end_ft)]
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, "run_worker.py", *args,
+                cwd=os.path.dirname(os.path.abspath(__file__))
+            )
+            self.processes[database_name] = process
+            session.current_database = database_name
+            session.interval_seconds = interval_seconds
+            self.relay_tasks[database_name] = asyncio.create_task(self._relay(database_name, session))
+            print(f"Started run worker process {process.pid} for database {database_name}")
+        else:
+            checkpoint = await load_checkpoint(database_name) if resume else None
+            await session.start_tick_stream(database_name, interval_seconds, mode, speed, checkpoint,
+                                            start_ft, end_ft)
+        return session
+
+    async def stop(self, database_name: str):
+        process = self.processes.pop(database_name, None)
+        if process and process.returncode is None:
+            process.terminate()
             try:
-                await broadcast_positions_update()
-            except Exception as e:
-                print(f"Periodic positions broadcast failed: {e}")
-            await asyncio.sleep(1)
-    finally:
-        positions_broadcast_task = None
+                await asyncio.wait_for(process.wait(), 10)
+            except asyncio.TimeoutError:
+                process.kill()
+        relay_task = self.relay_tasks.pop(database_name, None)
+        if relay_task:
+            relay_task.cancel()
+        session = self.get(database_name)
+        if session:
+            await session.stop_tick_stream()
+            if not session.active_connections:
+                del self.sessions[database_name]
+
+    async def stop_all(self):
+        for database_name in list(self.sessions):
+            await self.stop(database_name)
+
+    def subscribe(self, websocket: WebSocket, database_name: str) -> ConnectionManager:
+        """Move a WebSocket client to the topic of one run database"""
+        self.unsubscribe(websocket)
+        session = self.sessions.setdefault(database_name, ConnectionManager())
+        session.subscribe(websocket)
+        return session
+
+    def unsubscribe(self, websocket: WebSocket):
+        for session in self.sessions.values():
+            session.disconnect(websocket)
+
+    async def _relay(self, database_name: str, session: ConnectionManager):
+        """Broadcast messages published by a worker process to the session's clients"""
+        pubsub = redis_client.pubsub()
+        await pubsub.subscribe(session_channel(database_name))
+        try:
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    await session.broadcast(message["data"])
+        except Exception as e:
+            print(f"Run session relay for {database_name} failed: {e}")
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.close()
+
+    async def status(self) -> List[dict]:
+        statuses = []
+        for database_name, session in self.sessions.items():
+            session_status = session.session_status()
+            if database_name in self.processes:
+                session_status["database_name"] = database_name
+                session_status["is_stream_running"] = self.is_running(database_name)
+                session_status["pid"] = self.processes[database_name].pid
+                try:
+                    worker_status = await redis_client.get(session_status_key(database_name))
+                    if worker_status:
+                        session_status.update(json.loads(worker_status))
+                except Exception as e:
+                    print(f"Could not read worker status for {database_name}: {e}")
+            statuses.append(session_status)
+        return statuses
 
-def _ensure_positions_broadcaster():
-    global positions_broadcast_task
-    if positions_broadcast_task is None or positions_broadcast_task.done():
-        positions_broadcast_task = asyncio.create_task(_positions_periodic_broadcaster())
+# Create connection manager instances
+manager = ConnectionManager()
+positions_manager = ConnectionManager()
+run_sessions = RunSessionRegistry()
+index_manager = IndexManager(db.client, settings.database_name, settings.database_prefix)
+index_provisioning_task: asyncio.Task | None = None
+
+def _start_index_provisioning():
+    """Ensure indexes of the app database and every run database in the background"""
+    global index_provisioning_task
+    if index_provisioning_task is None or index_provisioning_task.done():
+        index_provisioning_task = asyncio.create_task(index_manager.ensure_all())
+
+# Background index builds of single run databases, by database name
+run_index_tasks: Dict[str, asyncio.Task] = {}
+
+def _start_run_index_build(database_name: str):
+    """Ensure the indexes of one run database in the background; progress is in /api/indexes"""
+    task = run_index_tasks.get(database_name)
+    if task is not None and not task.done():
+        return
+    task = asyncio.create_task(index_manager.ensure_for_run(database_name))
+    run_index_tasks[database_name] = task
+
+    def _done(task: asyncio.Task):
+        if run_index_tasks.get(database_name) is task:
+            del run_index_tasks[database_name]
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Index build failed for database {database_name}: {task.exception()}")
+
+    task.add_done_callback(_done)
 
 app = FastAPI(title="SwSauda", version="1.0.0")
 
@@ -1128,9 +1389,26 @@ async def startup_event():
     await connect_to_mongo()
     await connect_to_redis()
     await create_super_admin()
+    _start_index_provisioning()
+    global parameter_listener_task, order_listener_task, positions_reconcile_task
+    parameter_listener_task = asyncio.create_task(parameter_cache.listen())
+    print(f"Order book hydrated with {await order_book.hydrate(await get_orders_collection())} open orders")
+    await load_positions_ledger()
+    order_listener_task = asyncio.create_task(order_book.listen(get_orders_collection))
+    if settings.positions_reconcile_seconds > 0:
+        positions_reconcile_task = asyncio.create_task(_positions_reconciler())
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    if parameter_listener_task:
+        parameter_listener_task.cancel()
+    if order_listener_task:
+        order_listener_task.cancel()
+    if positions_reconcile_task:
+        positions_reconcile_task.cancel()
+    await run_sessions.stop_all()
+    await ema_publisher.close()
+    await positions_broadcaster.close()
     await close_mongo_connection()
     await close_redis_connection()
 
@@ -1417,6 +1695,9 @@ async def restore_database(database_name: str, restore_request: RestoreRequest,
         if result.returncode != 0:
             raise HTTPException(status_code=500, detail=f"Restore failed: {result.stderr}")
         
+        # Build replay/view indexes of the restored database in the background
+        _start_run_index_build(prefixed_database_name)
+        
         return {"message": f"Database '{prefixed_database_name}' restored successfully"}
     except Exception as e:
         print(f"Exception during restore: {str(e)}")
@@ -1513,16 +1794,16 @@ async def trade_run_api(database_name: str = Form(...), current_user: User = Dep
         db_instance = await get_database()
         # Delete all orders
         delete_result = await db_instance.orders.delete_many({})
+        order_book.clear()
+        positions_ledger.clear()
+        await order_book.publish_changes()
         # Drop positions view if exists so it will be recreated on next access
         try:
             await db_instance.drop_collection("v_positions")
         except Exception:
             pass
-        # Optionally broadcast an empty update so UI clears immediately
-        try:
-            await broadcast_positions_update()
-        except Exception as e:
-            print(f"Broadcast after clearing failed: {e}")
+        # Broadcast the empty positions so the UI clears
+        positions_broadcaster.mark_dirty(orders=True)
         return {"message": f"Selected database set to {database_name}. Cleared {delete_result.deleted_count} orders and reset positions."}
     except Exception as e:
         return {"message": f"Selected database set to {database_name}, but failed to clear positions/orders: {e}"}
@@ -1693,6 +1974,10 @@ async def start_run(request: StartRunRequest, current_user: User = Depends(get_a
         # Get the specific database
         target_db = db.client[request.database_name]
         
+        # Build the replay, view and lookup indexes in the background; the run starts without
+        # waiting and its queries use each index once it is ready
+        _start_run_index_build(request.database_name)
+        
         # Initialize hours_for_expiry
         hours_for_expiry = None
         
@@ -1748,38 +2033,85 @@ async def start_run(request: StartRunRequest, current_user: User = Depends(get_a
         except Exception as e:
             print(f"Error during expiry calculation: {str(e)}")
         
-        # Store the selected database for the run
+        # Start the replay session for this database; other running sessions keep going
+        if not run_sessions.is_running(request.database_name) and \
+                len(run_sessions.running()) >= settings.max_run_sessions:
+            raise HTTPException(status_code=409, detail=f"Maximum of {settings.max_run_sessions} concurrent runs reached")
+
+        # Store the selected database as the active run
         selected_database_store["run_database"] = request.database_name
         selected_database_store["run_interval"] = request.interval_seconds
-        
-        # Flush Redis data for this database to ensure clean start
-        await flush_redis_for_database(request.database_name)
-        
-        # Start WebSocket tick stream with the provided interval
-        await manager.start_tick_stream(request.database_name, request.interval_seconds)
+        selected_database_store["run_mode"] = request.mode
+        selected_database_store["run_speed"] = request.speed
+        
+        # Resolve the replay window; times of day are market times on the run's trading day
+        start_ft, end_ft = request.start_ft, request.end_ft
+        if request.start_time or request.end_time:
+            day_ft = await first_tick_ft(target_db)
+            if day_ft is None:
+                raise HTTPException(status_code=400, detail="No IndexTick data to resolve start/end time")
+            try:
+                if request.start_time:
+                    start_ft = ft_at_time_of_day(day_ft, request.start_time)
+                if request.end_time:
+                    end_ft = ft_at_time_of_day(day_ft, request.end_time)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="start_time/end_time must be HH:MM or HH:MM:SS")
+        if start_ft is not None and end_ft is not None and end_ft < start_ft:
+            raise HTTPException(status_code=400, detail="end of the replay window is before its start")
+
+        if request.resume:
+            # A running replay saves its final checkpoint when stopped; resume from that one
+            await run_sessions.stop(request.database_name)
+        checkpoint = await load_checkpoint(request.database_name) if request.resume else None
+        if checkpoint:
+            # Keep the Redis ticks of the checkpointed run up to its last ft (newer ones are trimmed
+            # when the stream resumes); the replay continues after it
+            print(f"Resuming run {request.database_name} from checkpoint at ft {checkpoint.get('last_ft')}")
+        
+        # Start the session's tick stream with the provided interval / replay mode; without a
+        # checkpoint, Redis data and the checkpoint are flushed after the previous replay stopped
+        await run_sessions.start(request.database_name, request.interval_seconds,
+                                 request.mode, request.speed, resume=bool(checkpoint),
+                                 start_ft=start_ft, end_ft=end_ft, fresh=not checkpoint)
         
         return StartRunResponse(
             message=f"Trading run started with database '{request.database_name}'{' (views created)' if views_success else ' (views creation failed)'}",
             database_name=request.database_name,
             status="started",
             interval_seconds=request.interval_seconds,
+            mode=request.mode,
+            speed=request.speed,
+            resumed_from_ft=checkpoint.get("last_ft") if checkpoint else None,
+            start_ft=start_ft,
+            end_ft=end_ft,
             hours_for_expiry=hours_for_expiry
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error starting run: {str(e)}")
 
 @app.post("/api/stop-run")
-async def stop_run(current_user: User = Depends(get_admin_user)):
-    """Stop the current trading run"""
-    try:
-        if "run_database" in selected_database_store:
-            database_name = selected_database_store["run_database"]
-            del selected_database_store["run_database"]
-            if "run_interval" in selected_database_store:
-                del selected_database_store["run_interval"]
-            
-            # Stop WebSocket tick stream
-            await manager.stop_tick_stream()
+async def stop_run(database_name: Optional[str] = None, current_user: User = Depends(get_admin_user)):
+    """Stop a trading run (the active run unless database_name is given)"""
+    try:
+        database_name = database_name or selected_database_store.get("run_database")
+        if database_name and (database_name in run_sessions.sessions
+                              or database_name == selected_database_store.get("run_database")):
+            # Stop the session's tick stream
+            await run_sessions.stop(database_name)
+
+            if selected_database_store.get("run_database") == database_name:
+                del selected_database_store["run_database"]
+                for key in ("run_interval", "run_mode", "run_speed"):
+                    selected_database_store.pop(key, None)
+                # Another running session becomes the active run
+                remaining = run_sessions.running()
+                if remaining:
+                    session = run_sessions.get(remaining[0])
+                    selected_database_store["run_database"] = remaining[0]
+                    selected_database_store["run_interval"] = session.interval_seconds
             
             return {"message": f"Trading run stopped for database '{database_name}'"}
         else:
@@ -1835,17 +2167,23 @@ async def get_tick_data(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching tick data: {str(e)}")
 
+# Ticks decoded and serialized per chunk when streaming /api/redis-ticks
+REDIS_TICKS_STREAM_CHUNK = 500
+
 @app.get("/api/redis-ticks/{tick_type}")
 async def get_redis_ticks(
     tick_type: str,
     limit: int = 100,
     token: str = None,
+    database_name: Optional[str] = None,
+    start_ft: Optional[int] = None,
+    end_ft: Optional[int] = None,
     current_user: User = Depends(get_admin_user)
 ):
-    """Get tick data from Redis for a specific tick type"""
+    """Get tick data from Redis for a specific tick type, optionally within an ft window"""
     try:
-        # Get the database name from the run
-        database_name = selected_database_store.get("run_database")
+        # Get the database name from the query or the active run
+        database_name = database_name or selected_database_store.get("run_database")
         if not database_name:
             raise HTTPException(status_code=400, detail="No active run. Please start a run first.")
         
@@ -1853,25 +2191,45 @@ async def get_redis_ticks(
         if tick_type not in ["indextick", "optiontick"]:
             raise HTTPException(status_code=400, detail="Invalid tick type. Must be 'indextick' or 'optiontick'")
         
-        # Get ticks from Redis
-        ticks = await get_ticks_from_redis(database_name, tick_type, limit, token)
-        
-        return {
-            "ticks": ticks,
-            "total_count": len(ticks),
-            "database_name": database_name,
-            "tick_type": tick_type,
-            "token": token
-        }
+        # Serve the ticks from the in-process cache, or read them from Redis in one round-trip;
+        # either way stream them in chunks
+        cached = get_cached_ticks(database_name, tick_type, limit, token, start_ft, end_ft)
+        if cached is None:
+            tick_values = await read_tick_values_from_redis(database_name, tick_type, limit, token, start_ft, end_ft)
+        
+        async def stream_ticks():
+            yield '{"ticks": ['
+            total_count = 0
+            if cached is not None:
+                for offset in range(0, len(cached), REDIS_TICKS_STREAM_CHUNK):
+                    chunk = cached[offset:offset + REDIS_TICKS_STREAM_CHUNK]
+                    yield ("," if offset else "") + ",".join(tick.json for tick in chunk)
+                total_count = len(cached)
+            else:
+                for offset in range(0, len(tick_values), REDIS_TICKS_STREAM_CHUNK):
+                    chunk = await tick_writer.decode(database_name, tick_values[offset:offset + REDIS_TICKS_STREAM_CHUNK], tick_type)
+                    if chunk:
+                        yield ("," if total_count else "") + ",".join(json.dumps(tick) for tick in chunk)
+                        total_count += len(chunk)
+            yield "], " + json.dumps({
+                "total_count": total_count,
+                "database_name": database_name,
+                "tick_type": tick_type,
+                "token": token
+            })[1:]
+        
+        return StreamingResponse(stream_ticks(), media_type="application/json")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching Redis tick data: {str(e)}")
 
 @app.get("/api/redis-option-tokens")
-async def get_redis_option_tokens(current_user: User = Depends(get_admin_user)):
+async def get_redis_option_tokens(database_name: Optional[str] = None, current_user: User = Depends(get_admin_user)):
     """Get list of option tokens that have data in Redis"""
     try:
-        # Get the database name from the run
-        database_name = selected_database_store.get("run_database")
+        # Get the database name from the query or the active run
+        database_name = database_name or selected_database_store.get("run_database")
         if not database_name:
             raise HTTPException(status_code=400, detail="No active run. Please start a run first.")
         
@@ -1913,27 +2271,80 @@ async def get_run_status(current_user: User = Depends(get_admin_user)):
     """Get the current run status"""
     database_name = selected_database_store.get("run_database", "")
     interval_seconds = selected_database_store.get("run_interval", 1.0)
-    is_stream_running = manager.is_stream_running()
+    is_stream_running = run_sessions.is_running(database_name)
+    session = run_sessions.get(database_name) or ConnectionManager()
     return {
         "is_running": bool(database_name),
         "database_name": database_name,
         "interval_seconds": interval_seconds,
-        "is_stream_running": is_stream_running
+        "mode": selected_database_store.get("run_mode", ReplayMode.INTERVAL),
+        "speed": selected_database_store.get("run_speed", 1.0),
+        "is_stream_running": is_stream_running,
+        "replay": session.replay_stats(),
+        "pipeline": session.pipeline_stats(),
+        "redis_writes": tick_writer.stats(),
+        "tick_cache": tick_cache.stats(),
+        "ema_publisher": ema_publisher.stats(),
+        "order_book": order_book.stats(),
+        "order_fills": fill_stats.stats(),
+        "order_locks": _order_eval_locks.stats(),
+        "positions_ledger": positions_ledger.stats(),
+        "positions_broadcast": positions_broadcaster.stats(),
+        "parameter_cache": parameter_cache.stats(),
+        "sessions": await run_sessions.status()
     }
 
+@app.get("/api/indexes")
+async def get_index_status(current_user: User = Depends(get_admin_user)):
+    """Get the build status of managed indexes"""
+    return {
+        "is_provisioning": bool(index_provisioning_task and not index_provisioning_task.done()),
+        "collections": index_manager.status
+    }
+
+@app.post("/api/indexes/ensure")
+async def ensure_indexes(current_user: User = Depends(get_admin_user)):
+    """Create missing indexes in the app database and every run database"""
+    _start_index_provisioning()
+    return {"message": "Index provisioning started"}
+
+@app.get("/api/indexes/plans")
+async def get_index_plans(database_name: Optional[str] = None, current_user: User = Depends(get_admin_user)):
+    """Explain the replay, view lookup and order matching queries of a run database"""
+    database_name = database_name or selected_database_store.get("run_database")
+    try:
+        return {"database_name": database_name, "plans": await index_manager.explain_plans(database_name)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error explaining queries: {str(e)}")
+
+@app.get("/api/run-checkpoint")
+async def get_run_checkpoint(database_name: Optional[str] = None, current_user: User = Depends(get_admin_user)):
+    """Get the latest replay checkpoint of a run (the active run unless database_name is given)"""
+    database_name = database_name or selected_database_store.get("run_database")
+    if not database_name:
+        raise HTTPException(status_code=400, detail="No active run. Please start a run first.")
+    checkpoint = await load_checkpoint(database_name)
+    if not checkpoint:
+        raise HTTPException(status_code=404, detail=f"No checkpoint found for database '{database_name}'")
+    return checkpoint
+
 @app.get("/api/index-emas")
-async def get_index_emas(current_user: User = Depends(get_admin_user)):
-    """Get long and short EMA calculations for index ticks"""
+async def get_index_emas(
+    database_name: Optional[str] = None,
+    indicators: Optional[List[str]] = Query(None),
+    current_user: User = Depends(get_admin_user)
+):
+    """Get long and short EMA calculations, and any requested indicators (e.g. ?indicators=rsi:14&indicators=macd:12,26,9), for index ticks"""
     try:
-        # Get the database name from the run
-        database_name = selected_database_store.get("run_database")
+        # Get the database name from the query or the active run
+        database_name = database_name or selected_database_store.get("run_database")
         if not database_name:
             raise HTTPException(status_code=400, detail="No active run. Please start a run first.")
         
         # Calculate EMAs
         ema_data = await calculate_index_emas(database_name)
         
-        return {
+        response = {
             "database_name": database_name,
             "long_ema": ema_data["long_ema"],
             "short_ema": ema_data["short_ema"],
@@ -1941,9 +2352,43 @@ async def get_index_emas(current_user: User = Depends(get_admin_user)):
             "short_period": ema_data["short_period"],
             "total_ticks": ema_data["total_ticks"]
         }
+        if indicators:
+            try:
+                response["indicators"] = await get_index_indicators(database_name, indicators)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        return response
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error calculating EMAs: {str(e)}")
 
+@app.get("/api/option-indicators")
+async def get_option_indicators_api(
+    database_name: Optional[str] = None,
+    tokens: Optional[List[str]] = Query(None),
+    current_user: User = Depends(get_admin_user)
+):
+    """Get EMAs and rolling statistics of option tokens (?tokens=12345&tokens=12346, every token when omitted)"""
+    try:
+        # Get the database name from the query or the active run
+        database_name = database_name or selected_database_store.get("run_database")
+        if not database_name:
+            raise HTTPException(status_code=400, detail="No active run. Please start a run first.")
+        if tokens and not all(token.isdigit() for token in tokens):
+            raise HTTPException(status_code=400, detail="Tokens must be numeric")
+        
+        indicators = await get_option_indicators(database_name, tokens)
+        return {
+            "database_name": database_name,
+            "tokens": indicators,
+            "total_count": len(indicators)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error calculating option indicators: {str(e)}")
+
 # Orders API endpoints
 @app.post("/api/orders", response_model=Order)
 async def create_order_api(order: OrderCreate, current_user: User = Depends(get_current_active_user)):
@@ -1951,10 +2396,16 @@ async def create_order_api(order: OrderCreate, current_user: User = Depends(get_
     try:
         # Set the user_id from the current user
         order.user_id = current_user.id
+        # Orders belong to the active run unless the client names one
+        if not order.run_database:
+            order.run_database = selected_database_store.get("run_database")
         new_order = await create_order(order)
+        positions_ledger.apply(new_order.dict())
+        if order_book.add_doc(new_order.dict()):
+            await order_book.publish_changes([new_order.id])
         
         # Trigger WebSocket update
-        await broadcast_positions_update()
+        positions_broadcaster.mark_dirty(orders=True)
         
         return new_order
     except Exception as e:
@@ -2012,9 +2463,12 @@ async def update_order_api(
         updated_order = await update_order(order_id, order_update)
         if not updated_order:
             raise HTTPException(status_code=400, detail="Failed to update order")
+        order_book.add_doc(updated_order.dict())
+        positions_ledger.apply(updated_order.dict())
+        await order_book.publish_changes([order_id])
         
         # Trigger WebSocket update
-        await broadcast_positions_update()
+        positions_broadcaster.mark_dirty(orders=True)
         
         return updated_order
     except HTTPException:
@@ -2037,9 +2491,12 @@ async def delete_order_api(order_id: str, current_user: User = Depends(get_curre
         success = await delete_order(order_id)
         if not success:
             raise HTTPException(status_code=400, detail="Failed to delete order")
+        order_book.remove(order_id)
+        positions_ledger.remove(order_id)
+        await order_book.publish_changes([order_id])
         
         # Trigger WebSocket update
-        await broadcast_positions_update()
+        positions_broadcaster.mark_dirty(orders=True)
         
         return {"message": "Order deleted successfully"}
     except HTTPException:
@@ -2057,6 +2514,7 @@ async def create_parameter_api(parameter: ParameterCreate, current_user: User =
             validate_parameter_value(parameter.value, parameter.datatype)
         
         created_parameter = await create_parameter(parameter, current_user.id)
+        await parameter_cache.publish_invalidation(created_parameter.name)
         return created_parameter
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -2110,6 +2568,8 @@ async def update_parameter_api(
         updated_parameter = await update_parameter(parameter_id, parameter_update)
         if not updated_parameter:
             raise HTTPException(status_code=404, detail="Parameter not found")
+        # The name may have changed, so drop every cached parameter
+        await parameter_cache.publish_invalidation()
         return updated_parameter
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -2125,6 +2585,7 @@ async def delete_parameter_api(parameter_id: str, current_user: User = Depends(g
         success = await delete_parameter(parameter_id)
         if not success:
             raise HTTPException(status_code=404, detail="Parameter not found")
+        await parameter_cache.publish_invalidation()
         return {"message": "Parameter deleted successfully"}
     except HTTPException:
         raise
@@ -2198,6 +2659,9 @@ async def import_parameters_api(
             except Exception as e:
                 errors.append(f"Error importing row {row}: {str(e)}")
         
+        if imported_count:
+            await parameter_cache.publish_invalidation()
+        
         return {
             "message": f"Import completed. {imported_count} parameters imported successfully.",
             "imported_count": imported_count,
@@ -2293,13 +2757,24 @@ async def download_parameter_template(current_user: User = Depends(get_current_a
 async def get_positions_api(current_user: User = Depends(get_current_active_user)):
     """Get positions for the current user"""
     try:
-        positions = await aggregate_positions(user_id=current_user.id)
+        positions = [PositionSummary(**p) for p in positions_ledger.positions(user_id=current_user.id)]
         return PositionResponse(positions=positions, total_positions=len(positions))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching positions: {str(e)}")
 
+@app.post("/api/positions/reconcile")
+async def reconcile_positions_api(current_user: User = Depends(get_admin_user)):
+    """Check the positions ledger against the orders aggregation, rebuilding it on differences"""
+    try:
+        return await reconcile_positions_ledger()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reconciling positions: {str(e)}")
+
 async def aggregate_positions(user_id: str | None, raw: bool = False):
     """Aggregate positions directly from orders collection.
+
+    Reads and API responses use the positions ledger; this full aggregation
+    only reconciles it (reconcile_positions_ledger).
     Args:
         user_id: filter by user if provided
         raw: if True return list of dicts, else list of PositionSummary
@@ -2547,71 +3022,75 @@ async def execute_position_views_script():
     except Exception as e:
         print(f"Error creating positions view: {e}")
 
-async def broadcast_positions_update():
-    """Broadcast position updates to all connected WebSocket clients"""
-    try:
-        # Aggregate for all users
-        positions = await aggregate_positions(user_id=None, raw=True)
-        for p in positions:
-            sym = p.get("symbol")
-            lp = last_prices.get(sym)
-            if lp is not None:
-                p["current_price"] = lp
-                net = p.get("net_position", 0)
-                avg_buy = p.get("average_buy_price")
-                avg_sell = p.get("average_sell_price")
-                unreal = 0.0
-                if net > 0 and avg_buy is not None:
-                    unreal = (lp - avg_buy) * net
-                elif net < 0 and avg_sell is not None:
-                    unreal = (avg_sell - lp) * abs(net)
-                p["unrealized_pnl"] = round(unreal, 2)
-            else:
-                p.setdefault("current_price", None)
-                p.setdefault("unrealized_pnl", 0.0)
-            # Provide a convenience total P&L combining realized + unrealized
-            try:
-                p["total_pnl"] = round((p.get("realized_pnl") or 0) + (p.get("unrealized_pnl") or 0), 2)
-            except Exception:
-                p["total_pnl"] = p.get("realized_pnl", 0)
-
-        # Get recent orders
-        orders = await get_orders(limit=50)
-        orders_data = []
-        for order in orders:
-            orders_data.append({
-                "id": order.id,
-                "symbol": order.symbol,
-                "quantity": order.quantity,
-                "filled_quantity": order.filled_quantity,
-                "side": order.side,
-                "order_type": order.order_type,
-                "price": order.price,
-                "status": order.status,
-                "created_at": order.created_at.isoformat() if order.created_at else None,
-                "average_price": order.average_price
-            })
+def positions_with_prices() -> List[dict]:
+    """Positions of all users from the ledger, with unrealized P&L at the last prices.
 
-        # Broadcast to all connected clients
-        await positions_manager.broadcast(json.dumps({
-            "type": "positions_update",
-            "positions": positions
-        }))
-        await positions_manager.broadcast(json.dumps({
-            "type": "orders_update",
-            "orders": orders_data
-        }))
-    except Exception as exc:
-        print(f"Error broadcasting positions update: {exc}")
+    Prices come from the active run's session first; sessions of other runs keep their own prices.
+    """
+    positions = positions_ledger.positions()
+    run_database = selected_database_store.get("run_database")
+    for p in positions:
+        sym = p.get("symbol")
+        lp = run_sessions.last_price(sym, run_database)
+        if lp is not None:
+            p["current_price"] = lp
+            net = p.get("net_position", 0)
+            avg_buy = p.get("average_buy_price")
+            avg_sell = p.get("average_sell_price")
+            unreal = 0.0
+            if net > 0 and avg_buy is not None:
+                unreal = (lp - avg_buy) * net
+            elif net < 0 and avg_sell is not None:
+                unreal = (avg_sell - lp) * abs(net)
+            p["unrealized_pnl"] = round(unreal, 2)
+        else:
+            p.setdefault("current_price", None)
+            p.setdefault("unrealized_pnl", 0.0)
+        # Provide a convenience total P&L combining realized + unrealized
+        try:
+            p["total_pnl"] = round((p.get("realized_pnl") or 0) + (p.get("unrealized_pnl") or 0), 2)
+        except Exception:
+            p["total_pnl"] = p.get("realized_pnl", 0)
+    return positions
+
+async def recent_orders_data() -> List[dict]:
+    """The 50 most recent orders as sent to positions clients"""
+    orders = await get_orders(limit=50)
+    orders_data = []
+    for order in orders:
+        orders_data.append({
+            "id": order.id,
+            "symbol": order.symbol,
+            "quantity": order.quantity,
+            "filled_quantity": order.filled_quantity,
+            "side": order.side,
+            "order_type": order.order_type,
+            "price": order.price,
+            "status": order.status,
+            "created_at": order.created_at.isoformat() if order.created_at else None,
+            "average_price": order.average_price
+        })
+    return orders_data
+
+# Positions updates coalesced and rate limited across ticks, order changes and clients
+positions_broadcaster = PositionsBroadcaster(positions_manager, positions_with_prices, recent_orders_data,
+                                             interval_seconds=settings.positions_broadcast_interval_ms / 1000)
 
 @app.websocket("/ws/tick-data")
 async def websocket_tick_data(websocket: WebSocket):
-    """WebSocket endpoint for real-time tick data streaming"""
-    await manager.connect(websocket)
+    """WebSocket endpoint for real-time tick data streaming.
+
+    Clients receive the ticks of one run database (topic), chosen with the
+    ``database_name`` query parameter or a ``start_stream`` message.
+    """
+    await websocket.accept()
+    topic = websocket.query_params.get("database_name")
+    if topic:
+        run_sessions.subscribe(websocket, topic)
     try:
         # Send initial connection message
         await manager.send_personal_message(
-            json.dumps({"type": "connection", "message": "Connected to tick data stream"}),
+            json.dumps({"type": "connection", "message": "Connected to tick data stream", "database": topic}),
             websocket
         )
         
@@ -2627,7 +3106,12 @@ async def websocket_tick_data(websocket: WebSocket):
                     database_name = message.get("database_name")
                     interval_seconds = message.get("interval_seconds", 1.0)
                     if database_name:
-                        await manager.start_tick_stream(database_name, interval_seconds)
+                        # Join the session's topic; only start a replay if none is running for it
+                        run_sessions.subscribe(websocket, database_name)
+                        if run_sessions.is_running(database_name):
+                            interval_seconds = run_sessions.get(database_name).interval_seconds
+                        else:
+                            await run_sessions.start(database_name, interval_seconds)
                         await manager.send_personal_message(
                             json.dumps({
                                 "type": "stream_started", 
@@ -2638,14 +3122,18 @@ async def websocket_tick_data(websocket: WebSocket):
                         )
                 
                 elif message.get("type") == "stop_stream":
-                    await manager.stop_tick_stream()
+                    database_name = message.get("database_name") or next(
+                        (name for name, session in run_sessions.sessions.items()
+                         if websocket in session.active_connections), None)
+                    if database_name:
+                        await run_sessions.stop(database_name)
                     await manager.send_personal_message(
-                        json.dumps({"type": "stream_stopped"}),
+                        json.dumps({"type": "stream_stopped", "database": database_name}),
                         websocket
                     )
                 
             except WebSocketDisconnect:
-                manager.disconnect(websocket)
+                run_sessions.unsubscribe(websocket)
                 break
             except Exception as e:
                 print(f"WebSocket error: {e}")
@@ -2655,23 +3143,21 @@ async def websocket_tick_data(websocket: WebSocket):
                 )
                 
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        run_sessions.unsubscribe(websocket)
     except Exception as e:
         print(f"WebSocket connection error: {e}")
-        manager.disconnect(websocket)
+        run_sessions.unsubscribe(websocket)
 
 @app.websocket("/ws/positions")
 async def websocket_positions(websocket: WebSocket):
     """WebSocket endpoint for real-time positions and orders updates"""
     await positions_manager.connect(websocket)
     try:
-        # Send an immediate snapshot so UI populates without waiting for next tick
+        # Send an immediate snapshot to this client so UI populates without waiting for a change
         try:
-            await broadcast_positions_update()
+            await positions_broadcaster.snapshot(websocket)
         except Exception as snap_exc:
-            print(f"Initial positions snapshot broadcast failed: {snap_exc}")
-        # Ensure periodic broadcaster running
-        _ensure_positions_broadcaster()
+            print(f"Initial positions snapshot failed: {snap_exc}")
         while True:
             # Just keep connection alive; broadcaster sends updates
             await asyncio.sleep(25)
@@ -2707,8 +3193,11 @@ async def websocket_ema_data(websocket: WebSocket):
                 if message.get("type") == "start_ema_stream":
                     database_name = message.get("database_name")
                     interval_seconds = message.get("interval_seconds", 1.0)
+                    # Optional indicator specs streamed with the EMAs, e.g. ["rsi:14", "bollinger:20,2"]
+                    indicator_specs = message.get("indicators") or []
                     if database_name:
-                        # Start periodic EMA calculation and streaming
+                        # Validates the specs before subscribing
+                        await get_index_indicators(database_name, indicator_specs)
                         await manager.send_personal_message(
                             json.dumps({
                                 "type": "ema_stream_started", 
@@ -2717,18 +3206,19 @@ async def websocket_ema_data(websocket: WebSocket):
                             }),
                             websocket
                         )
-                        
-                        # Start EMA streaming task
-                        print(f"Starting EMA streaming task for database: {database_name}")
-                        asyncio.create_task(stream_ema_data(websocket, database_name, interval_seconds))
+                        # Join the database's shared EMA publisher
+                        ema_publisher.subscribe(websocket, database_name, interval_seconds,
+                                                [IndicatorEngine.key(spec) for spec in indicator_specs])
                 
                 elif message.get("type") == "stop_ema_stream":
+                    ema_publisher.unsubscribe(websocket)
                     await manager.send_personal_message(
                         json.dumps({"type": "ema_stream_stopped"}),
                         websocket
                     )
                 
             except WebSocketDisconnect:
+                ema_publisher.unsubscribe(websocket)
                 manager.disconnect(websocket)
                 break
             except Exception as e:
@@ -2739,57 +3229,13 @@ async def websocket_ema_data(websocket: WebSocket):
                 )
                 
     except WebSocketDisconnect:
+        ema_publisher.unsubscribe(websocket)
         manager.disconnect(websocket)
     except Exception as e:
         print(f"EMA WebSocket connection error: {e}")
+        ema_publisher.unsubscribe(websocket)
         manager.disconnect(websocket)
 
-async def stream_ema_data(websocket: WebSocket, database_name: str, interval_seconds: float = 1.0):
-    """Stream EMA data from Redis at regular intervals"""
-    print(f"EMA streaming task started for database: {database_name}")
-    try:
-        while True:
-            print(f"EMA streaming loop iteration for {database_name}")
-            
-            # Check if WebSocket is still connected
-            try:
-                await websocket.ping()
-                print(f"WebSocket ping successful for {database_name}")
-            except:
-                print(f"EMA WebSocket disconnected for {database_name}")
-                break
-            
-            # Calculate EMAs from Redis data
-            try:
-                print(f"Calculating EMAs for {database_name}...")
-                ema_data = await calculate_index_emas(database_name)
-                print(f"EMA calculation result: {ema_data}")
-                
-                # Send EMA data if at least one EMA is available
-                if ema_data["long_ema"] is not None or ema_data["short_ema"] is not None:
-                    ema_message = {
-                        "data_type": "ema_data",
-                        "long_ema": ema_data["long_ema"],
-                        "short_ema": ema_data["short_ema"],
-                        "long_period": ema_data["long_period"],
-                        "short_period": ema_data["short_period"],
-                        "total_ticks": ema_data["total_ticks"],
-                        "timestamp": datetime.now().isoformat()
-                    }
-                    await websocket.send_text(json.dumps(ema_message))
-                    print(f"Sent EMA data: {ema_message}")
-                else:
-                    print("No EMA data available to send")
-            except Exception as e:
-                print(f"Error calculating EMAs: {e}")
-            
-            # Wait for next interval
-            print(f"Waiting {interval_seconds} seconds before next EMA calculation...")
-            await asyncio.sleep(interval_seconds)
-            
-    except Exception as e:
-        print(f"Error in EMA streaming: {e}")
-
 # Strategy API Endpoints
 
 @app.post("/api/strategies", response_model=Strategy)
@@ -3126,6 +3572,7 @@ class StrategyExecutionEngine:
         task = asyncio.create_task(self._execute_strategy(execution_id, strategy, trade_run_id))
         self.active_executions[execution_id] = task
         self.execution_data[execution_id] = {
+            "trade_run_id": trade_run_id,
             "current_step": 0,
             "step_results": {},
             "positions": [],
@@ -3244,7 +3691,7 @@ class StrategyExecutionEngine:
                 return False
             
             # Get current market data
-            current_data = await self._get_current_market_data(condition.symbol)
+            current_data = await self._get_current_market_data(condition.symbol, self._run_database(execution_id))
             if not current_data:
                 return False
             
@@ -3258,6 +3705,15 @@ class StrategyExecutionEngine:
                 result = current_data.get("ema", 0) > condition.value
             elif condition.condition_type == "ema_below":
                 result = current_data.get("ema", 0) < condition.value
+            elif condition.condition_type in ("time_after", "time_before"):
+                # Compare against market time of the replay, not wall-clock time
+                market_time = current_data.get("market_time")
+                if market_time and condition.time_value:
+                    time_of_day = market_time.strftime("%H:%M:%S")[:len(condition.time_value)]
+                    if condition.condition_type == "time_after":
+                        result = time_of_day >= condition.time_value
+                    else:
+                        result = time_of_day < condition.time_value
             # Add more condition types as needed
             
             # Log condition evaluation
@@ -3312,9 +3768,9 @@ class StrategyExecutionEngine:
                 # Place sell limit order
                 await self._place_order("sell", "limit", action.symbol, action.quantity, action.price, execution_id)
             elif action.action_type == "wait":
-                # Wait for specified time
+                # Wait for specified market time (falls back to wall-clock time without a replay)
                 if action.wait_seconds:
-                    await asyncio.sleep(action.wait_seconds)
+                    await run_sessions.clock_for(self._run_database(execution_id)).sleep(action.wait_seconds)
             # Add more action types as needed
             
             return True
@@ -3345,11 +3801,16 @@ class StrategyExecutionEngine:
                     return i
         return current_index + 1
     
-    async def _get_current_market_data(self, symbol: str) -> dict:
+    def _run_database(self, execution_id: str) -> Optional[str]:
+        """Run database the execution trades on, defaulting to the active run"""
+        execution = self.execution_data.get(execution_id) or {}
+        return execution.get("trade_run_id") or selected_database_store.get("run_database")
+
+    async def _get_current_market_data(self, symbol: str, run_database: Optional[str] = None) -> dict:
         """Get current market data for a symbol"""
         try:
-            # Get the current run database
-            run_database = selected_database_store.get("run_database")
+            # Get the run database of the execution, or the active run
+            run_database = run_database or selected_database_store.get("run_database")
             if not run_database:
                 return None
             
@@ -3368,7 +3829,8 @@ class StrategyExecutionEngine:
                 "volume": latest_tick.get("volume", 0),
                 "ema_short": ema_data.get("short_ema", 0),
                 "ema_long": ema_data.get("long_ema", 0),
-                "timestamp": latest_tick.get("ft", 0)
+                "timestamp": latest_tick.get("ft", 0),
+                "market_time": run_sessions.clock_for(run_database).now_datetime()
             }
             
         except Exception as e:
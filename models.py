@@ -85,15 +85,33 @@ class TickDataResponse(BaseModel):
     total_count: int
     database_name: str
 
+class ReplayMode(str, Enum):
+    INTERVAL = "interval"  # Fixed sleep of interval_seconds after every IndexTick
+    REALTIME = "realtime"  # Replay real ft gaps at speed x real time
+    MAX = "max"  # As fast as possible
+
 class StartRunRequest(BaseModel):
     database_name: str
     interval_seconds: float = 1.0
+    mode: ReplayMode = ReplayMode.INTERVAL
+    speed: float = 1.0  # Multiplier for realtime mode
+    resume: bool = False  # Continue from the run's last checkpoint instead of starting over
+    # Replay window: ft bounds, or "HH:MM[:SS]" market times on the run's trading day
+    start_ft: Optional[int] = None
+    end_ft: Optional[int] = None
+    start_time: Optional[str] = None
+    end_time: Optional[str] = None
 
 class StartRunResponse(BaseModel):
     message: str
     database_name: str
     status: str
     interval_seconds: float
+    mode: ReplayMode = ReplayMode.INTERVAL
+    speed: float = 1.0
+    resumed_from_ft: Optional[int] = None
+    start_ft: Optional[int] = None
+    end_ft: Optional[int] = None
     hours_for_expiry: Optional[int] = None 
 
 # Order Models
@@ -123,6 +141,8 @@ class OrderBase(BaseModel):
     trigger_price: Optional[float] = None
     # Made optional so API callers don't need to send it; backend injects current user id
     user_id: Optional[str] = None
+    # Run database the order belongs to; defaults to the active run, None matches every run
+    run_database: Optional[str] = None
 
 class OrderCreate(OrderBase):
     pass
@@ -0,0 +1,379 @@
+"""In-memory book of open orders, indexed by trigger price.
+
+``evaluate_and_execute_orders`` used to scan the open orders in MongoDB on
+every tick. The book keeps every PENDING / PARTIALLY_FILLED order in memory,
+per run database and symbol, in four heaps keyed so that the orders a price
+crosses are always at the top:
+
+    limit buy   fills when price <= limit     max-heap on the limit price
+    limit sell  fills when price >= limit     min-heap on the limit price
+    SL/SLM buy  fills when price >= trigger   min-heap on the trigger price
+    SL/SLM sell fills when price <= trigger   max-heap on the trigger price
+
+Market orders fill on the next tick of their symbol. A tick therefore costs
+O(log n) per order it crosses and nothing for the others. Cancelled orders are
+removed lazily and the heaps are rebuilt once stale entries outnumber live
+ones.
+
+MongoDB stays the source of truth: the book is hydrated from it at startup,
+callers write every change through, and changes made in another process are
+announced on the ``orders:changed`` Redis channel so that process's book
+reloads the orders. Messages carry the instance id of the publishing book,
+which skips its own messages.
+"""
+import asyncio
+import heapq
+import time
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager
+from itertools import count
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import bson
+
+# Redis pub/sub channel carrying comma-separated ids of changed orders ("*" reloads every order)
+ORDER_CHANNEL = "orders:changed"
+
+OPEN_STATUSES = ("pending", "partially_filled")
+
+# Stale heap entries tolerated before a symbol's heaps are rebuilt
+COMPACT_THRESHOLD = 64
+
+
+def _value(field) -> Optional[str]:
+    # Enum members are stored by value
+    return getattr(field, "value", field)
+
+
+class BookOrder:
+    __slots__ = ("id", "symbol", "book_symbol", "side", "order_type", "price", "trigger_price", "quantity",
+                 "filled_quantity", "user_id", "run_database", "seq", "active")
+
+    def __init__(self, order_id: str, symbol: str, side: str, order_type: str, price: Optional[float],
+                 trigger_price: Optional[float], quantity: int, filled_quantity: int = 0,
+                 user_id: Optional[str] = None, run_database: Optional[str] = None):
+        self.id = order_id
+        self.symbol = symbol
+        # Books are keyed case-insensitively, as ticks are matched
+        self.book_symbol = symbol.upper()
+        self.side = side
+        self.order_type = order_type
+        self.price = price
+        self.trigger_price = trigger_price
+        self.quantity = quantity
+        self.filled_quantity = filled_quantity
+        self.user_id = user_id
+        self.run_database = run_database
+        self.seq = 0
+        self.active = True
+
+    @classmethod
+    def from_doc(cls, doc: dict) -> "BookOrder":
+        """Order from a MongoDB document (``_id``) or an Order model dump (``id``)"""
+        return cls(str(doc.get("_id") or doc.get("id")), doc.get("symbol") or "", _value(doc.get("side")),
+                   _value(doc.get("order_type")), doc.get("price"), doc.get("trigger_price"),
+                   doc.get("quantity", 0), doc.get("filled_quantity", 0), doc.get("user_id"),
+                   doc.get("run_database"))
+
+    @property
+    def object_id(self) -> bson.ObjectId:
+        return bson.ObjectId(self.id)
+
+    @property
+    def remaining(self) -> int:
+        return self.quantity - self.filled_quantity
+
+
+class SymbolBook:
+    """Open orders of one symbol in one run database"""
+
+    def __init__(self):
+        self.market: deque = deque()
+        self.limit_buys: List[Tuple[float, int, BookOrder]] = []
+        self.limit_sells: List[Tuple[float, int, BookOrder]] = []
+        self.stop_buys: List[Tuple[float, int, BookOrder]] = []
+        self.stop_sells: List[Tuple[float, int, BookOrder]] = []
+        self.live = 0
+        self.stale = 0
+
+    def _heap(self, order: BookOrder) -> Tuple[Optional[list], Optional[float]]:
+        """Heap of an order and its key, or (None, None) for orders that can never fill"""
+        if order.order_type == "limit" and order.price is not None:
+            if order.side == "buy":
+                return self.limit_buys, -order.price
+            return self.limit_sells, order.price
+        if order.order_type in ("sl", "slm") and order.trigger_price is not None:
+            if order.side == "buy":
+                return self.stop_buys, order.trigger_price
+            return self.stop_sells, -order.trigger_price
+        return None, None
+
+    def add(self, order: BookOrder):
+        self.live += 1
+        if order.order_type == "market":
+            self.market.append(order)
+            return
+        heap, key = self._heap(order)
+        if heap is not None:
+            heapq.heappush(heap, (key, order.seq, order))
+
+    def remove(self, order: BookOrder):
+        # Heap entries are skipped once inactive and dropped at the next compaction
+        self.live -= 1
+        self.stale += 1
+        if self.stale > COMPACT_THRESHOLD and self.stale > self.live:
+            self.compact()
+
+    def compact(self):
+        self.market = deque(o for o in self.market if o.active)
+        for heap in (self.limit_buys, self.limit_sells, self.stop_buys, self.stop_sells):
+            heap[:] = [entry for entry in heap if entry[2].active]
+            heapq.heapify(heap)
+        self.stale = 0
+
+    @staticmethod
+    def _pop_crossed(heap: list, crossed, out: List[BookOrder]):
+        while heap:
+            key, _, order = heap[0]
+            if order.active and not crossed(key):
+                break
+            heapq.heappop(heap)
+            if order.active:
+                out.append(order)
+
+    def match(self, last_price: float) -> List[BookOrder]:
+        """Pop the orders last_price fills, in time order within each price level"""
+        out: List[BookOrder] = []
+        while self.market:
+            order = self.market.popleft()
+            if order.active:
+                out.append(order)
+        self._pop_crossed(self.limit_buys, lambda key: last_price <= -key, out)
+        self._pop_crossed(self.limit_sells, lambda key: last_price >= key, out)
+        self._pop_crossed(self.stop_buys, lambda key: last_price >= key, out)
+        self._pop_crossed(self.stop_sells, lambda key: last_price <= -key, out)
+        return out
+
+    def __len__(self) -> int:
+        return self.live
+
+
+class OrderBook:
+    def __init__(self, redis_client=None):
+        self.redis = redis_client
+        # Tags published changes, so this process skips its own messages
+        self.instance_id = uuid.uuid4().hex
+        # (run database, symbol) -> book, and order id -> order
+        self.books: Dict[Tuple[Optional[str], str], SymbolBook] = {}
+        self.orders: Dict[str, BookOrder] = {}
+        self._seq = count()
+        self._listeners: List[Callable[[Optional[str], Optional[dict]], None]] = []
+        self.matched = 0
+        self.evaluations = 0
+        self.published = 0
+        self.received = 0
+        self.own_skipped = 0
+
+    def add(self, order: BookOrder) -> bool:
+        """Add (or replace) an open order; orders without remaining quantity are not booked"""
+        if self.orders.get(order.id) is order:
+            return True
+        self.remove(order.id)
+        if order.remaining <= 0 or not order.book_symbol:
+            return False
+        order.active = True
+        order.seq = next(self._seq)
+        self.orders[order.id] = order
+        self.books.setdefault((order.run_database, order.book_symbol), SymbolBook()).add(order)
+        return True
+
+    def add_doc(self, doc: dict) -> bool:
+        """Book a MongoDB order document if it is open, drop it from the book otherwise"""
+        if _value(doc.get("status")) not in OPEN_STATUSES:
+            self.remove(str(doc.get("_id") or doc.get("id")))
+            return False
+        return self.add(BookOrder.from_doc(doc))
+
+    def remove(self, order_id: str) -> Optional[BookOrder]:
+        order = self.orders.pop(order_id, None)
+        if order is not None:
+            order.active = False
+            book = self.books.get((order.run_database, order.book_symbol))
+            if book is not None:
+                book.remove(order)
+                if not len(book):
+                    del self.books[(order.run_database, order.book_symbol)]
+        return order
+
+    def clear(self):
+        for order in self.orders.values():
+            order.active = False
+        self.books.clear()
+        self.orders.clear()
+
+    def match(self, symbol: str, last_price: float, run_database: Optional[str] = None) -> List[BookOrder]:
+        """Remove and return the orders of a symbol that last_price fills.
+
+        With run_database, only that run's orders and orders without a run are
+        considered; without it, every run's orders of the symbol are.
+        """
+        self.evaluations += 1
+        if not symbol:
+            return []
+        symbol = symbol.upper()
+        if run_database:
+            keys = [(run_database, symbol), (None, symbol)]
+        else:
+            keys = [key for key in self.books if key[1] == symbol]
+        crossed: List[BookOrder] = []
+        for key in keys:
+            book = self.books.get(key)
+            if book is None:
+                continue
+            for order in book.match(last_price):
+                crossed.append(order)
+                self.orders.pop(order.id, None)
+                order.active = False
+                book.live -= 1
+            if not len(book):
+                del self.books[key]
+        self.matched += len(crossed)
+        return crossed
+
+    async def hydrate(self, collection) -> int:
+        """Replace the book with every open order of a MongoDB orders collection"""
+        self.clear()
+        async for doc in collection.find({"status": {"$in": list(OPEN_STATUSES)}}):
+            self.add_doc(doc)
+        return len(self.orders)
+
+    def add_listener(self, callback: Callable[[Optional[str], Optional[dict]], None]):
+        """Call back with (order id, document) for orders changed in another process.
+
+        The document is None for a deleted order; both are None when every order was reloaded.
+        """
+        self._listeners.append(callback)
+
+    def _notify(self, order_id: Optional[str], doc: Optional[dict]):
+        for callback in self._listeners:
+            callback(order_id, doc)
+
+    async def refresh(self, collection, order_ids: Iterable[str]):
+        """Reload orders changed elsewhere; deleted orders leave the book"""
+        object_ids = []
+        for order_id in order_ids:
+            self.remove(order_id)
+            try:
+                object_ids.append(bson.ObjectId(order_id))
+            except bson.errors.InvalidId:
+                continue
+        if object_ids:
+            found = set()
+            async for doc in collection.find({"_id": {"$in": object_ids}}):
+                self.add_doc(doc)
+                found.add(doc["_id"])
+                self._notify(str(doc["_id"]), doc)
+            for object_id in object_ids:
+                if object_id not in found:
+                    self._notify(str(object_id), None)
+
+    async def publish_changes(self, order_ids: Optional[Iterable[str]] = None):
+        """Tell other processes to reload these orders (every order when None)"""
+        if self.redis is None:
+            return
+        changes = "*" if order_ids is None else ",".join(order_ids)
+        if not changes:
+            return
+        try:
+            await self.redis.publish(ORDER_CHANNEL, f"{self.instance_id}|{changes}")
+            self.published += 1
+        except Exception as e:
+            print(f"Could not publish order changes: {e}")
+
+    async def listen(self, collection_loader):
+        """Apply order changes published by other processes until cancelled.
+
+        collection_loader is a coroutine returning the orders collection.
+        """
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(ORDER_CHANNEL)
+        try:
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                data = message["data"]
+                data = data.decode() if isinstance(data, bytes) else data
+                sender, _, data = data.rpartition("|")
+                if sender == self.instance_id:
+                    # Already applied by this process; reloading could re-book an order being filled
+                    self.own_skipped += 1
+                    continue
+                self.received += 1
+                collection = await collection_loader()
+                if data == "*":
+                    await self.hydrate(collection)
+                    self._notify(None, None)
+                else:
+                    await self.refresh(collection, data.split(","))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Order change listener stopped: {e}")
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.close()
+
+    def stats(self) -> dict:
+        return {"orders": len(self.orders), "books": len(self.books),
+                "evaluations": self.evaluations, "matched": self.matched,
+                "published": self.published, "received": self.received, "own_skipped": self.own_skipped}
+
+
+class SymbolLocks:
+    """One asyncio lock per symbol, so order evaluation of different symbols runs in parallel.
+
+    ``hold`` takes the locks of several symbols in sorted order, which keeps
+    two callers holding overlapping sets from deadlocking. Ticks of one symbol
+    are still evaluated strictly in order. A lock is dropped once no caller
+    holds or waits for it.
+    """
+
+    def __init__(self):
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._users: Dict[str, int] = {}
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_seconds = 0.0
+
+    @asynccontextmanager
+    async def hold(self, symbols: Iterable[str]):
+        keys = sorted({symbol.upper() for symbol in symbols if symbol})
+        for key in keys:
+            self._users[key] = self._users.get(key, 0) + 1
+        acquired = []
+        try:
+            for key in keys:
+                lock = self._locks.setdefault(key, asyncio.Lock())
+                self.acquisitions += 1
+                if lock.locked():
+                    self.contended += 1
+                    started = time.perf_counter()
+                    await lock.acquire()
+                    self.wait_seconds += time.perf_counter() - started
+                else:
+                    await lock.acquire()
+                acquired.append(lock)
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+            for key in keys:
+                self._users[key] -= 1
+                if not self._users[key]:
+                    del self._users[key]
+                    self._locks.pop(key, None)
+
+    def stats(self) -> dict:
+        return {"symbols": len(self._locks), "acquisitions": self.acquisitions,
+                "contended": self.contended, "wait_seconds": round(self.wait_seconds, 4)}
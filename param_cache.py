@@ -0,0 +1,155 @@
+"""Typed in-process cache of trade parameters.
+
+Hot paths (tick storage, EMA calculation, EMA streaming) read parameters such
+as REDIS_LONG_TICK_LENGTH many times per second. ``ParameterCache`` keeps the
+parsed value of each parameter in memory, so a read is a dict lookup instead
+of a MongoDB query. Entries expire after a TTL as a safety net and are
+invalidated when parameters are created, updated, deleted or imported. The
+invalidation is also published on Redis so other workers drop their copies.
+"""
+import asyncio
+import json
+import re
+import time
+from datetime import date, datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+# Redis pub/sub channel carrying parameter invalidations ("*" clears everything)
+PARAMETER_CHANNEL = "parameters:invalidate"
+
+_MISSING = object()
+
+
+def validate_parameter_value(value: str, datatype: str):
+    """Validate that a parameter value matches its specified datatype"""
+    try:
+        if datatype == 'int':
+            int(value)
+        elif datatype == 'double':
+            float(value)
+        elif datatype == 'boolean':
+            if value.lower() not in ['true', 'false', '1', '0', 'yes', 'no']:
+                raise ValueError(f"Value '{value}' is not a valid boolean")
+        elif datatype == 'date':
+            # Basic date format validation (YYYY-MM-DD)
+            if not re.match(r'^\d{4}-\d{2}-\d{2}$', value):
+                raise ValueError(f"Value '{value}' is not a valid date format (YYYY-MM-DD)")
+        elif datatype == 'datetime':
+            # Basic datetime format validation (YYYY-MM-DD HH:MM:SS)
+            if not re.match(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$', value):
+                raise ValueError(f"Value '{value}' is not a valid datetime format (YYYY-MM-DD HH:MM:SS)")
+        elif datatype == 'json':
+            json.loads(value)
+        # string type doesn't need validation
+    except (ValueError, json.JSONDecodeError) as e:
+        raise ValueError(f"Value '{value}' does not match datatype '{datatype}': {str(e)}")
+
+
+def parse_parameter_value(value: str, datatype: Optional[str]):
+    """Convert a stored parameter value to the Python type of its datatype"""
+    if datatype:
+        validate_parameter_value(value, datatype)
+    if datatype == 'int':
+        return int(value)
+    if datatype == 'double':
+        return float(value)
+    if datatype == 'boolean':
+        return value.lower() in ['true', '1', 'yes']
+    if datatype == 'date':
+        return date.fromisoformat(value)
+    if datatype == 'datetime':
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+    if datatype == 'json':
+        return json.loads(value)
+    return value
+
+
+class ParameterCache:
+    def __init__(self, loader: Callable[[str], Awaitable[object]], redis_client=None,
+                 ttl_seconds: float = 60.0):
+        """
+        Args:
+            loader: Coroutine returning the Parameter with a name, or None
+            redis_client: Used to publish and receive invalidations between workers
+            ttl_seconds: Maximum age of a cached value
+        """
+        self.loader = loader
+        self.redis = redis_client
+        self.ttl_seconds = ttl_seconds
+        # name -> (parsed value or None, expiry on the monotonic clock)
+        self._entries: Dict[str, tuple] = {}
+        self._listeners: List[Callable[[Optional[str]], None]] = []
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, name: str, default=None, cast: Optional[Callable] = None):
+        """Parsed value of an active parameter, or default when missing, inactive or invalid"""
+        entry = self._entries.get(name)
+        if entry is not None and entry[1] > time.monotonic():
+            self.hits += 1
+            value = entry[0]
+        else:
+            self.misses += 1
+            value = await self._load(name)
+        if value is None:
+            return default
+        if cast is not None:
+            try:
+                return cast(value)
+            except (ValueError, TypeError):
+                return default
+        return value
+
+    async def _load(self, name: str):
+        value = None
+        try:
+            parameter = await self.loader(name)
+            if parameter and parameter.is_active:
+                value = parse_parameter_value(parameter.value, parameter.datatype)
+        except ValueError as e:
+            print(f"Parameter {name} has an invalid value: {e}")
+        self._entries[name] = (value, time.monotonic() + self.ttl_seconds)
+        return value
+
+    def add_listener(self, callback: Callable[[Optional[str]], None]):
+        """Call back with the parameter name (None for all) whenever entries are invalidated"""
+        self._listeners.append(callback)
+
+    def invalidate(self, name: Optional[str] = None):
+        """Drop one cached parameter, or every parameter when name is None"""
+        if name is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(name, None)
+        for callback in self._listeners:
+            callback(name)
+
+    async def publish_invalidation(self, name: Optional[str] = None):
+        """Invalidate locally and tell other workers to do the same"""
+        self.invalidate(name)
+        if self.redis is not None:
+            try:
+                await self.redis.publish(PARAMETER_CHANNEL, name or "*")
+            except Exception as e:
+                print(f"Could not publish parameter invalidation: {e}")
+
+    async def listen(self):
+        """Apply invalidations published by other workers until cancelled"""
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(PARAMETER_CHANNEL)
+        try:
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    name = message["data"]
+                    self.invalidate(None if name == "*" else name)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Parameter invalidation listener stopped: {e}")
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.close()
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "ttl_seconds": self.ttl_seconds}
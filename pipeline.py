@@ -0,0 +1,149 @@
+"""Staged asyncio pipeline used by trade-run tick streaming.
+
+Each Stage owns one or more bounded asyncio.Queues and a set of worker tasks.
+Producers call ``Stage.put``; when a queue is full the stage's policy decides
+whether the producer waits (backpressure) or an item is dropped. Workers pull
+up to ``batch_size`` queued items at a time and hand them to the stage handler
+as a list.
+
+A stage created with ``partition_key`` gets one queue and one worker per
+partition, and items with the same key always land on the same worker, so
+they are handled strictly in arrival order while different keys proceed in
+parallel.
+"""
+import asyncio
+import time
+from enum import Enum
+from typing import Awaitable, Callable, List, Optional
+
+
+class QueuePolicy(str, Enum):
+    BLOCK = "block"              # Producer waits for room (backpressure)
+    DROP_NEWEST = "drop_newest"  # Incoming item is discarded
+    DROP_OLDEST = "drop_oldest"  # Oldest queued item is discarded to make room
+
+
+class Stage:
+    def __init__(self, name: str, handler: Callable[[list], Awaitable[None]],
+                 maxsize: int = 1000, policy: QueuePolicy = QueuePolicy.BLOCK,
+                 concurrency: int = 1, batch_size: int = 1,
+                 partition_key: Optional[Callable[[object], object]] = None):
+        self.name = name
+        self.handler = handler
+        self.policy = QueuePolicy(policy)
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self.partition_key = partition_key
+        queue_count = self.concurrency if partition_key else 1
+        self._queues: List[asyncio.Queue] = [asyncio.Queue(maxsize) for _ in range(queue_count)]
+        self._tasks: List[asyncio.Task] = []
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.batches = 0
+        self.max_batch = 0
+        self.busy_seconds = 0.0
+
+    def start(self):
+        if self._tasks:
+            return
+        if self.partition_key:
+            workers = [self._worker(queue) for queue in self._queues]
+        else:
+            workers = [self._worker(self._queues[0]) for _ in range(self.concurrency)]
+        self._tasks = [asyncio.create_task(worker) for worker in workers]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def join(self):
+        """Wait until every queued item has been handled"""
+        for queue in self._queues:
+            await queue.join()
+
+    def _queue_for(self, item) -> asyncio.Queue:
+        if len(self._queues) == 1:
+            return self._queues[0]
+        return self._queues[hash(self.partition_key(item)) % len(self._queues)]
+
+    async def put(self, item):
+        queue = self._queue_for(item)
+        if self.policy == QueuePolicy.BLOCK or not queue.full():
+            await queue.put(item)
+        elif self.policy == QueuePolicy.DROP_NEWEST:
+            self.dropped += 1
+        else:
+            try:
+                queue.get_nowait()
+                queue.task_done()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+            queue.put_nowait(item)
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            started = time.perf_counter()
+            try:
+                await self.handler(batch)
+            except Exception as e:
+                self.errors += 1
+                print(f"Pipeline stage '{self.name}' failed on a batch of {len(batch)}: {e}")
+            finally:
+                self.busy_seconds += time.perf_counter() - started
+                self.processed += len(batch)
+                self.batches += 1
+                self.max_batch = max(self.max_batch, len(batch))
+                for _ in batch:
+                    queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            "policy": self.policy.value,
+            "concurrency": self.concurrency,
+            "queue_depth": sum(queue.qsize() for queue in self._queues),
+            "queue_capacity": sum(queue.maxsize for queue in self._queues),
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "batches": self.batches,
+            "avg_batch": round(self.processed / self.batches, 2) if self.batches else 0,
+            "max_batch": self.max_batch,
+            "busy_seconds": round(self.busy_seconds, 4),
+        }
+
+
+class Pipeline:
+    """A set of stages started, drained and stopped together"""
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = {stage.name: stage for stage in stages}
+
+    def __getitem__(self, name: str) -> Stage:
+        return self.stages[name]
+
+    def start(self):
+        for stage in self.stages.values():
+            stage.start()
+
+    async def join(self):
+        # Stages are listed upstream first, so draining in order flushes
+        # items that upstream handlers pushed further down the pipeline
+        for stage in self.stages.values():
+            await stage.join()
+
+    async def stop(self):
+        for stage in self.stages.values():
+            await stage.stop()
+
+    def stats(self) -> dict:
+        return {name: stage.stats() for name, stage in self.stages.items()}
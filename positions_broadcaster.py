@@ -0,0 +1,118 @@
+"""Coalesced, rate-limited broadcasting of positions to /ws/positions clients.
+
+Order changes and the end of each tick frame only mark the positions dirty.
+One task sends at most one update per interval: right away when the interval
+has passed since the last send, otherwise when it does, so all the changes of
+the frames in between go out together. Each message is encoded once for all
+clients and only sent when it differs from the last one sent, so a replay
+with no position changes sends nothing. The recent orders list is cached and
+reloaded from MongoDB only after an order changed, instead of on every tick.
+"""
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable, List, Optional
+
+
+class PositionsBroadcaster:
+    def __init__(self, manager, build_positions: Callable[[], List[dict]],
+                 load_orders: Callable[[], Awaitable[List[dict]]], interval_seconds: float = 0.25,
+                 idle_seconds: float = 1.0):
+        # manager: ConnectionManager of the positions clients
+        self.manager = manager
+        self.build_positions = build_positions
+        self.load_orders = load_orders
+        self.interval_seconds = interval_seconds
+        # Longest wait between checks while clients are connected, for prices that move without a frame
+        self.idle_seconds = idle_seconds
+        self.dirty = True
+        self.orders_stale = True
+        self._orders: List[dict] = []
+        self._sent = {"positions_update": None, "orders_update": None}
+        self._last_flush = 0.0
+        self._wake = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.marks = 0
+        self.flushes = 0
+        self.sends = 0
+        self.skipped = 0
+        self.order_loads = 0
+
+    def mark_dirty(self, orders: bool = False):
+        """Note that positions (and, with orders=True, the recent orders) changed; flushes within the interval"""
+        self.marks += 1
+        self.dirty = True
+        if orders:
+            self.orders_stale = True
+        self._wake.set()
+        self._ensure_task()
+
+    def _ensure_task(self):
+        if self.manager.active_connections and (self.task is None or self.task.done()):
+            self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        try:
+            while self.manager.active_connections:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.idle_seconds)
+                except asyncio.TimeoutError:
+                    # Prices may have been updated elsewhere; an unchanged message is not sent
+                    self.dirty = True
+                self._wake.clear()
+                delay = self._last_flush + self.interval_seconds - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if self.dirty:
+                    try:
+                        await self.flush()
+                    except Exception as e:
+                        print(f"Error broadcasting positions update: {e}")
+        except asyncio.CancelledError:
+            pass
+
+    async def _messages(self) -> dict:
+        if self.orders_stale:
+            self.orders_stale = False
+            self.order_loads += 1
+            try:
+                self._orders = await self.load_orders()
+            except Exception:
+                self.orders_stale = True
+                raise
+        return {
+            "positions_update": json.dumps({"type": "positions_update", "positions": self.build_positions()}),
+            "orders_update": json.dumps({"type": "orders_update", "orders": self._orders}),
+        }
+
+    async def flush(self):
+        """Send the messages that changed since the last flush to every client"""
+        self.dirty = False
+        self._last_flush = time.monotonic()
+        self.flushes += 1
+        changed = [(kind, message) for kind, message in (await self._messages()).items()
+                   if message != self._sent[kind]]
+        if not changed:
+            self.skipped += 1
+            return
+        for kind, message in changed:
+            self._sent[kind] = message
+            self.sends += 1
+            await self.manager.broadcast(message)
+
+    async def snapshot(self, websocket):
+        """Start the broadcaster and send the current positions and orders to one new client"""
+        self._ensure_task()
+        for message in (await self._messages()).values():
+            await websocket.send_text(message)
+
+    async def close(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    def stats(self) -> dict:
+        return {"clients": len(self.manager.active_connections), "interval_seconds": self.interval_seconds,
+                "marks": self.marks, "flushes": self.flushes, "sends": self.sends,
+                "skipped": self.skipped, "order_loads": self.order_loads}
@@ -0,0 +1,168 @@
+"""Positions maintained incrementally from order changes.
+
+``aggregate_positions`` groups the whole ``orders`` collection on every call.
+The ledger keeps the same accumulators per (symbol, user): filled buy/sell
+quantity and value, and pending order count, quantity and value. It also keeps
+the contribution of every order, so creating, filling, cancelling or deleting
+an order replaces one contribution in O(1). The derived fields (net position,
+average prices, realized P&L) follow the aggregation pipeline, which is now
+only run to reconcile the ledger.
+"""
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Accumulators of a position, in contribution order
+FIELDS = ("total_buy_quantity", "total_sell_quantity", "total_buy_value", "total_sell_value",
+          "open_buy_orders", "open_sell_orders", "open_buy_quantity", "open_sell_quantity",
+          "open_buy_value", "open_sell_value")
+
+# Fields compared by reconciliation; running sums may drift by float rounding
+COMPARED_FIELDS = FIELDS + ("net_position", "realized_pnl")
+
+
+def _value(field):
+    return getattr(field, "value", field)
+
+
+def order_contribution(doc: dict) -> Tuple:
+    """What one order adds to its position, as in the aggregation pipeline.
+
+    Filled orders count their filled quantity at the average price; pending
+    orders count as open orders with their remaining quantity at the limit
+    price. Partially filled, cancelled and rejected orders add nothing.
+    """
+    status = _value(doc.get("status"))
+    buy = _value(doc.get("side")) == "buy"
+    quantity = doc.get("quantity") or 0
+    filled_quantity = doc.get("filled_quantity") or 0
+    contribution = [0] * len(FIELDS)
+    if status == "filled":
+        average_price = doc.get("average_price")
+        contribution[0 if buy else 1] = filled_quantity
+        contribution[2 if buy else 3] = filled_quantity * average_price if average_price is not None else 0
+    elif status == "pending":
+        remaining = quantity - filled_quantity
+        price = doc.get("price")
+        contribution[4 if buy else 5] = 1
+        contribution[6 if buy else 7] = remaining
+        contribution[8 if buy else 9] = remaining * price if price is not None else 0
+    return tuple(contribution)
+
+
+class PositionLedger:
+    def __init__(self):
+        # (symbol, user id) -> accumulators, and order id -> (position key, contribution)
+        self._positions: Dict[Tuple[str, Optional[str]], List] = {}
+        self._orders: Dict[str, Tuple[Tuple[str, Optional[str]], Tuple]] = {}
+        # Orders per position; a position disappears with its last order, like an empty $group
+        self._order_counts: Dict[Tuple[str, Optional[str]], int] = {}
+        # Increases with every change, so readers can tell whether positions moved
+        self.version = 0
+        self.updates = 0
+
+    def _add(self, key, contribution: Tuple, sign: int):
+        position = self._positions.get(key)
+        if position is None:
+            position = self._positions[key] = [0] * len(FIELDS)
+        for i, delta in enumerate(contribution):
+            if delta:
+                position[i] += sign * delta
+
+    def apply(self, doc: dict):
+        """Record the current state of an order (a MongoDB document or Order model dump)"""
+        order_id = str(doc.get("_id") or doc.get("id"))
+        key = (doc.get("symbol"), doc.get("user_id"))
+        contribution = order_contribution(doc)
+        previous = self._orders.get(order_id)
+        if previous is not None:
+            if previous == (key, contribution):
+                return
+            self._remove(order_id)
+        self._orders[order_id] = (key, contribution)
+        self._order_counts[key] = self._order_counts.get(key, 0) + 1
+        self._add(key, contribution, 1)
+        self.version += 1
+        self.updates += 1
+
+    def apply_fill(self, order, quantity: int, price: float):
+        """Record a fill of a book order (see order_book.BookOrder) without re-reading it"""
+        self.apply({"_id": order.id, "symbol": order.symbol, "user_id": order.user_id,
+                    "side": order.side, "quantity": order.quantity, "filled_quantity": quantity,
+                    "average_price": price, "price": order.price, "status": "filled"})
+
+    def _remove(self, order_id: str) -> bool:
+        previous = self._orders.pop(order_id, None)
+        if previous is None:
+            return False
+        key, contribution = previous
+        self._add(key, contribution, -1)
+        self._order_counts[key] -= 1
+        if not self._order_counts[key]:
+            del self._order_counts[key]
+            del self._positions[key]
+        return True
+
+    def remove(self, order_id: str):
+        """Forget a deleted order"""
+        if self._remove(order_id):
+            self.version += 1
+            self.updates += 1
+
+    def clear(self):
+        self._positions.clear()
+        self._orders.clear()
+        self._order_counts.clear()
+        self.version += 1
+
+    def rebuild(self, docs: Iterable[dict]):
+        """Replace the ledger with the given orders"""
+        self.clear()
+        for doc in docs:
+            self.apply(doc)
+
+    def positions(self, user_id: Optional[str] = None) -> List[dict]:
+        """Positions with the fields of aggregate_positions(raw=True)"""
+        results = []
+        for (symbol, position_user), values in self._positions.items():
+            if user_id and position_user != user_id:
+                continue
+            position = dict(zip(FIELDS, values))
+            buy_quantity, sell_quantity = position["total_buy_quantity"], position["total_sell_quantity"]
+            average_buy = position["total_buy_value"] / buy_quantity if buy_quantity > 0 else None
+            average_sell = position["total_sell_value"] / sell_quantity if sell_quantity > 0 else None
+            position.update({
+                "symbol": symbol,
+                "user_id": position_user,
+                "net_position": buy_quantity - sell_quantity,
+                "average_buy_price": average_buy,
+                "average_sell_price": average_sell,
+                "open_buy_avg_price": (position["open_buy_value"] / position["open_buy_quantity"]
+                                       if position["open_buy_quantity"] > 0 else None),
+                "open_sell_avg_price": (position["open_sell_value"] / position["open_sell_quantity"]
+                                        if position["open_sell_quantity"] > 0 else None),
+                "realized_pnl": (min(buy_quantity, sell_quantity) * (average_sell - average_buy)
+                                 if buy_quantity > 0 and sell_quantity > 0 else 0),
+                "unrealized_pnl": 0.0,
+                "current_price": None,
+            })
+            results.append(position)
+        return results
+
+    def differences(self, aggregated: List[dict]) -> List[str]:
+        """Positions where the ledger and an aggregate_positions(raw=True) result disagree"""
+        expected = {(p.get("symbol"), p.get("user_id")): p for p in aggregated}
+        actual = {(p["symbol"], p["user_id"]): p for p in self.positions()}
+        differences = []
+        for key in expected.keys() | actual.keys():
+            if key not in expected or key not in actual:
+                differences.append(f"{key}: {'missing from ledger' if key in expected else 'not in orders'}")
+                continue
+            for field in COMPARED_FIELDS:
+                if not math.isclose(expected[key].get(field) or 0, actual[key].get(field) or 0,
+                                    rel_tol=1e-9, abs_tol=1e-6):
+                    differences.append(f"{key}: {field} {actual[key].get(field)} != {expected[key].get(field)}")
+        return differences
+
+    def stats(self) -> dict:
+        return {"positions": len(self._positions), "orders": len(self._orders),
+                "updates": self.updates, "version": self.version}
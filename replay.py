@@ -0,0 +1,404 @@
+"""Replay readers for trade runs.
+
+The IndexTick and OptionTick collections of a run database are read with one
+ft-sorted cursor each and merged in memory, so a replay costs a handful of
+batched cursor round-trips instead of one OptionTick query per IndexTick.
+
+Once the historical ticks are exhausted, new inserts are picked up from a
+MongoDB change stream, or by polling when the server is not a replica set.
+"""
+import asyncio
+import heapq
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, time as dt_time
+from typing import AsyncIterator, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+from pymongo.errors import OperationFailure
+
+from models import ReplayMode
+from ticks import TICK_PROJECTION
+
+# Number of documents fetched per cursor round-trip
+REPLAY_BATCH_SIZE = 1000
+
+# Idle time after the last change event before buffered live frames are flushed
+LIVE_FLUSH_SECONDS = 0.05
+
+# Change events buffered between the change stream and the frame builder
+LIVE_QUEUE_SIZE = 10000
+
+TICK_COLLECTIONS = ("IndexTick", "OptionTick")
+
+MARKET_TZ = ZoneInfo("Asia/Kolkata")
+
+
+@dataclass
+class LiveWatchStats:
+    """Counters of live monitoring; late ticks arrived after their ft's frame was emitted and are dropped"""
+    late_ticks: int = 0
+    last_late_ft: Optional[int] = None
+
+
+@dataclass
+class TickFrame:
+    """All ticks that share one feed time (ft)"""
+    ft: int
+    index_docs: List[dict] = field(default_factory=list)
+    option_docs: List[dict] = field(default_factory=list)
+
+
+class _PeekableCursor:
+    """Wrap an async cursor so the next document can be inspected without consuming it"""
+
+    def __init__(self, name: str, cursor):
+        self.name = name
+        self._cursor = cursor
+        self._head = None
+        self._exhausted = False
+
+    async def peek(self) -> Optional[dict]:
+        if self._head is None and not self._exhausted:
+            try:
+                self._head = await self._cursor.__anext__()
+            except StopAsyncIteration:
+                self._exhausted = True
+        return self._head
+
+    async def pop(self) -> Optional[dict]:
+        doc = await self.peek()
+        self._head = None
+        return doc
+
+
+async def merge_cursors_by_ft(cursors: Dict[str, object]) -> AsyncIterator[tuple]:
+    """K-way merge of ft-sorted cursors.
+
+    Args:
+        cursors: Mapping of source name to a cursor already sorted by ft ascending
+
+    Yields:
+        (ft, {source name: [docs with that ft]}) in ascending ft order
+    """
+    heap = []
+    sources = {}
+    for order, (name, cursor) in enumerate(cursors.items()):
+        source = _PeekableCursor(name, cursor)
+        sources[name] = source
+        head = await source.peek()
+        if head is not None:
+            heapq.heappush(heap, (head.get("ft", 0), order, name))
+
+    while heap:
+        current_ft = heap[0][0]
+        group: Dict[str, List[dict]] = {}
+        # Drain every source whose head sits on the current ft
+        while heap and heap[0][0] == current_ft:
+            _, order, name = heapq.heappop(heap)
+            source = sources[name]
+            docs = group.setdefault(name, [])
+            while True:
+                head = await source.peek()
+                if head is None or head.get("ft", 0) != current_ft:
+                    break
+                docs.append(await source.pop())
+            if head is not None:
+                heapq.heappush(heap, (head.get("ft", 0), order, name))
+        yield current_ft, group
+
+
+def ft_range_query(after_ft: Optional[int] = None, until_ft: Optional[int] = None) -> dict:
+    """Query on ft for after_ft < ft <= until_ft; either bound may be omitted"""
+    ft_filter = {}
+    if after_ft is not None:
+        ft_filter["$gt"] = after_ft
+    if until_ft is not None:
+        ft_filter["$lte"] = until_ft
+    return {"ft": ft_filter} if ft_filter else {}
+
+
+async def iter_tick_frames(database, after_ft: Optional[int] = None,
+                           batch_size: int = REPLAY_BATCH_SIZE,
+                           until_ft: Optional[int] = None) -> AsyncIterator[TickFrame]:
+    """Yield one TickFrame per IndexTick feed time from a run database.
+
+    OptionTicks are attached to the frame of the IndexTick with the same ft.
+    OptionTicks whose ft has no IndexTick are skipped, matching the original
+    per-IndexTick lookup behaviour.
+
+    Args:
+        database: Motor database of the run
+        after_ft: Only replay ticks with ft strictly greater than this value
+        batch_size: Documents fetched per cursor round-trip
+        until_ft: Only replay ticks with ft up to and including this value
+    """
+    query = ft_range_query(after_ft, until_ft)
+    cursors = {
+        "index": database["IndexTick"].find(query, TICK_PROJECTION).sort("ft", 1).batch_size(batch_size),
+        "option": database["OptionTick"].find(query, TICK_PROJECTION).sort("ft", 1).batch_size(batch_size),
+    }
+    async for ft, group in merge_cursors_by_ft(cursors):
+        index_docs = group.get("index")
+        if not index_docs:
+            continue
+        yield TickFrame(ft=ft, index_docs=index_docs, option_docs=group.get("option", []))
+
+
+async def first_tick_ft(database) -> Optional[int]:
+    """Feed time of the first IndexTick of a run"""
+    docs = await database["IndexTick"].find({}, {"ft": 1}).sort("ft", 1).limit(1).to_list(length=1)
+    return docs[0]["ft"] if docs else None
+
+
+def ft_at_time_of_day(day_ft: int, time_of_day: str) -> int:
+    """Feed time of an "HH:MM[:SS]" market time on the trading day containing day_ft"""
+    day = datetime.fromtimestamp(day_ft, tz=MARKET_TZ).date()
+    clock_time = dt_time.fromisoformat(time_of_day)
+    return int(datetime.combine(day, clock_time, tzinfo=MARKET_TZ).timestamp())
+
+
+async def read_warmup_ticks(database, before_ft: int, count: int) -> tuple:
+    """Read the count IndexTicks before before_ft and the OptionTicks of the same span.
+
+    One bulk query per collection; both lists are returned oldest first.
+    """
+    index_docs = await database["IndexTick"].find({"ft": {"$lt": before_ft}}, TICK_PROJECTION) \
+        .sort("ft", -1).limit(count).to_list(length=count)
+    index_docs.reverse()
+    if not index_docs:
+        return [], []
+    option_docs = await database["OptionTick"].find({"ft": {"$gte": index_docs[0]["ft"], "$lt": before_ft}},
+                                                    TICK_PROJECTION) \
+        .sort("ft", 1).to_list(length=None)
+    return index_docs, option_docs
+
+
+async def change_streams_supported(database) -> bool:
+    """Change streams need a replica set or a sharded cluster"""
+    try:
+        hello = await database.client.admin.command("hello")
+    except Exception as e:
+        print(f"Could not determine MongoDB topology: {e}")
+        return False
+    return bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+
+
+async def _pump_change_stream(stream, queue: asyncio.Queue):
+    """Forward inserted tick documents from a change stream into a queue; a full queue pauses reading"""
+    try:
+        async for change in stream:
+            await queue.put((change["ns"]["coll"], change["fullDocument"]))
+    except Exception as e:
+        await queue.put((None, e))
+
+
+async def _watch_change_stream(database, after_ft: int, flush_seconds: float,
+                               stats: Optional[LiveWatchStats] = None,
+                               queue_size: int = LIVE_QUEUE_SIZE) -> AsyncIterator[TickFrame]:
+    """Yield frames for ticks inserted after after_ft using a change stream.
+
+    The stream is opened before the catch-up read so inserts that land while
+    catching up are not lost; events at or below the caught-up ft were read by
+    the catch-up and are dropped. Events for a frame already emitted after
+    that are late: frames stay in ft order, so they are counted and dropped.
+    """
+    stats = stats if stats is not None else LiveWatchStats()
+    pipeline = [
+        {"$match": {"operationType": "insert", "ns.coll": {"$in": list(TICK_COLLECTIONS)}}},
+        # Keep the event _id (resume token) and only the tick fields of the document
+        {"$project": {"ns": 1, **{f"fullDocument.{name}": 1 for name in TICK_PROJECTION if name != "_id"}}},
+    ]
+    async with database.watch(pipeline) as stream:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        pump_task = asyncio.create_task(_pump_change_stream(stream, queue))
+        try:
+            last_ft = after_ft
+            async for frame in iter_tick_frames(database, after_ft=last_ft):
+                last_ft = frame.ft
+                yield frame
+            caught_up_ft = last_ft
+
+            pending: Dict[int, TickFrame] = {}
+            while True:
+                try:
+                    if pending:
+                        coll, doc = await asyncio.wait_for(queue.get(), flush_seconds)
+                    else:
+                        coll, doc = await queue.get()
+                except asyncio.TimeoutError:
+                    # Feed went quiet: everything buffered is complete
+                    for ft in sorted(pending):
+                        last_ft = ft
+                        yield pending.pop(ft)
+                    continue
+
+                if coll is None:
+                    raise doc
+
+                ft = doc.get("ft", 0)
+                if ft <= last_ft:
+                    if ft > caught_up_ft:
+                        stats.late_ticks += 1
+                        stats.last_late_ft = ft
+                        if stats.late_ticks == 1 or stats.late_ticks % 100 == 0:
+                            print(f"Dropped late {coll} at ft {ft}, frames up to ft {last_ft} were already "
+                                  f"emitted ({stats.late_ticks} late ticks)")
+                    continue
+
+                # A newer ft closes every older buffered frame
+                for old_ft in sorted(k for k in pending if k < ft):
+                    last_ft = old_ft
+                    yield pending.pop(old_ft)
+
+                frame = pending.setdefault(ft, TickFrame(ft=ft))
+                if coll == "IndexTick":
+                    frame.index_docs.append(doc)
+                else:
+                    frame.option_docs.append(doc)
+        finally:
+            pump_task.cancel()
+
+
+async def watch_tick_frames(database, after_ft: int, poll_interval: float = 1.0,
+                            flush_seconds: float = LIVE_FLUSH_SECONDS,
+                            stats: Optional[LiveWatchStats] = None) -> AsyncIterator[TickFrame]:
+    """Yield frames for IndexTick/OptionTick inserts after after_ft, forever.
+
+    Live frames are keyed by ft like replay frames, but may carry only
+    OptionTicks when the feed writes no IndexTick for that ft.
+
+    Args:
+        database: Motor database of the run
+        after_ft: Last ft already published
+        poll_interval: Seconds between queries when polling is used
+        flush_seconds: Idle time before a buffered change-stream frame is emitted
+        stats: Counters updated while watching (late ticks)
+    """
+    last_ft = after_ft
+    if await change_streams_supported(database):
+        try:
+            async for frame in _watch_change_stream(database, last_ft, flush_seconds, stats):
+                last_ft = frame.ft
+                yield frame
+        except OperationFailure as e:
+            print(f"Change stream unavailable, falling back to polling: {e}")
+    else:
+        print("MongoDB is not a replica set, monitoring new ticks by polling")
+
+    while True:
+        async for frame in iter_tick_frames(database, after_ft=last_ft):
+            last_ft = frame.ft
+            yield frame
+        await asyncio.sleep(poll_interval)
+
+
+class VirtualClock:
+    """Market clock driven by the feed time of replayed frames.
+
+    ``sleep`` waits for market time to advance rather than wall-clock time, so
+    strategy waits scale with the replay speed. Before the first frame the
+    clock has no time and ``sleep`` falls back to ``asyncio.sleep``. Once the
+    replay stops, ends or follows live inserts, ``release`` moves waits to the
+    wall clock, so they finish instead of waiting for frames that never come.
+    """
+
+    def __init__(self):
+        self.ft: Optional[int] = None
+        self._waiters: list = []
+        self._sequence = 0
+        # Set by release: waits use wall-clock time
+        self.wall_clock = False
+
+    def now(self) -> Optional[int]:
+        return self.ft
+
+    def now_datetime(self) -> Optional[datetime]:
+        """Current market time in the exchange timezone"""
+        if self.ft is None:
+            return None
+        return datetime.fromtimestamp(self.ft, tz=MARKET_TZ)
+
+    def advance(self, ft: int):
+        if self.ft is not None and ft <= self.ft:
+            return
+        self.ft = ft
+        while self._waiters and self._waiters[0][0] <= ft:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(ft)
+
+    async def sleep(self, seconds: float):
+        if self.ft is None or self.wall_clock:
+            await asyncio.sleep(seconds)
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._sequence += 1
+        heapq.heappush(self._waiters, (self.ft + seconds, self._sequence, future))
+        await future
+
+    def release(self):
+        """Finish pending and future waits on the wall clock, after the market time they still had left"""
+        self.wall_clock = True
+        for target, _, future in self._waiters:
+            if not future.done():
+                delay = max(0.0, target - self.ft) if self.ft is not None else 0.0
+                future.get_loop().call_later(delay, _resolve, future, target)
+        self._waiters = []
+
+    def reset(self):
+        self.release()
+        self.ft = None
+        self.wall_clock = False
+
+
+def _resolve(future: asyncio.Future, value):
+    if not future.done():
+        future.set_result(value)
+
+
+class ReplayPacer:
+    """Decides how long ingest waits between frames and measures throughput"""
+
+    def __init__(self, mode: ReplayMode = ReplayMode.INTERVAL, speed: float = 1.0,
+                 interval_seconds: float = 1.0):
+        self.mode = ReplayMode(mode)
+        self.speed = speed if speed and speed > 0 else 1.0
+        self.interval_seconds = interval_seconds
+        self._anchor: Optional[tuple] = None
+        self.started_at: Optional[float] = None
+        self.frames = 0
+        self.ticks = 0
+
+    async def pace(self, frame: TickFrame):
+        """Called after a frame is handed to the pipeline"""
+        now = time.perf_counter()
+        if self.started_at is None:
+            self.started_at = now
+        self.frames += 1
+        self.ticks += len(frame.index_docs) + len(frame.option_docs)
+
+        if self.mode == ReplayMode.INTERVAL:
+            await asyncio.sleep(self.interval_seconds)
+        elif self.mode == ReplayMode.REALTIME:
+            # Anchor wall time to the first frame so sleeps do not accumulate drift
+            if self._anchor is None:
+                self._anchor = (now, frame.ft)
+            anchor_wall, anchor_ft = self._anchor
+            delay = anchor_wall + (frame.ft - anchor_ft) / self.speed - now
+            if delay > 0:
+                await asyncio.sleep(delay)
+        else:
+            # Let the pipeline workers run; backpressure comes from the stage queues
+            await asyncio.sleep(0)
+
+    def stats(self) -> dict:
+        elapsed = time.perf_counter() - self.started_at if self.started_at else 0.0
+        return {
+            "mode": self.mode.value,
+            "speed": self.speed,
+            "frames": self.frames,
+            "ticks": self.ticks,
+            "elapsed_seconds": round(elapsed, 3),
+            "ticks_per_second": round(self.ticks / elapsed, 1) if elapsed > 0 else 0.0,
+        }
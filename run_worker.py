@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+SwSauda - Trade run worker process
+Replays one run database in its own process so concurrent runs use all CPU cores.
+
+Started by the API when RUN_SESSION_PROCESSES is enabled. Ticks are replayed,
+stored in Redis and matched against orders here; WebSocket messages are
+published on the session's Redis channel and relayed to clients by the API.
+"""
+
+import argparse
+import asyncio
+import json
+import signal
+from typing import Optional
+
+from database import connect_to_mongo, connect_to_redis, close_mongo_connection, close_redis_connection, redis_client
+from models import ReplayMode
+from checkpoint import load_checkpoint
+import main as app_main
+
+# Seconds between status updates written to Redis
+STATUS_INTERVAL = 1.0
+
+
+async def run_session(database_name: str, interval_seconds: float, mode: ReplayMode, speed: float,
+                      resume: bool = False, start_ft: Optional[int] = None, end_ft: Optional[int] = None):
+    # The API stops a worker with SIGTERM; cancelling lets the stream save its final checkpoint
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    await connect_to_mongo()
+    await connect_to_redis()
+    session = app_main.ConnectionManager(publish_channel=app_main.session_channel(database_name))
+    status_key = app_main.session_status_key(database_name)
+    # Follow parameter changes made through the API process
+    parameter_listener = asyncio.create_task(app_main.parameter_cache.listen())
+    # Match against this process's own order book, kept in sync with orders placed through the API
+    await app_main.order_book.hydrate(await app_main.get_orders_collection())
+    await app_main.load_positions_ledger()
+    order_listener = asyncio.create_task(app_main.order_book.listen(app_main.get_orders_collection))
+    try:
+        checkpoint = await load_checkpoint(database_name) if resume else None
+        await session.start_tick_stream(database_name, interval_seconds, mode, speed, checkpoint,
+                                        start_ft, end_ft)
+        while session.is_stream_running():
+            await redis_client.set(status_key, json.dumps(session.session_status()), ex=int(STATUS_INTERVAL * 10))
+            await asyncio.sleep(STATUS_INTERVAL)
+    finally:
+        parameter_listener.cancel()
+        order_listener.cancel()
+        await session.stop_tick_stream()
+        await redis_client.delete(status_key)
+        await close_mongo_connection()
+        await close_redis_connection()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay one trade run database")
+    parser.add_argument("database_name")
+    parser.add_argument("--interval", type=float, default=1.0)
+    parser.add_argument("--mode", choices=[m.value for m in ReplayMode], default=ReplayMode.INTERVAL.value)
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--resume", action="store_true", help="Continue from the run's checkpoint")
+    parser.add_argument("--start-ft", type=int, default=None, help="Seek to this feed time")
+    parser.add_argument("--end-ft", type=int, default=None, help="Stop after this feed time")
+    args = parser.parse_args()
+
+    print(f"🚀 Run worker for {args.database_name} ({args.mode} mode)")
+    try:
+        asyncio.run(run_session(args.database_name, args.interval, ReplayMode(args.mode), args.speed,
+                                args.resume, args.start_ft, args.end_ft))
+    except asyncio.CancelledError:
+        print(f"Run worker for {args.database_name} stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test script for trade run checkpoints
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import checkpoint
+from checkpoint import CHECKPOINT_TTL_SECONDS, checkpoint_key, clear_checkpoint, load_checkpoint, save_checkpoint
+from main import ConnectionManager
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.expiry = {}
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value
+        self.expiry[key] = ex
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def delete(self, key):
+        return int(self.values.pop(key, None) is not None)
+
+
+def use_fake_redis() -> FakeRedis:
+    redis = FakeRedis()
+    checkpoint.redis_client = redis
+    return redis
+
+
+def test_save_load_and_clear():
+    """A checkpoint is stored per database with a TTL, loaded back and cleared"""
+    print("=== Testing checkpoints ===")
+    redis = use_fake_redis()
+
+    async def run():
+        await save_checkpoint("N_20250718", {"last_ft": 1752810000, "last_prices": {"Nifty 50": 25000.5}})
+        await save_checkpoint("N_20250718", {"last_ft": 1752810060, "last_prices": {"Nifty 50": 25010.0}})
+        loaded = await load_checkpoint("N_20250718")
+        other = await load_checkpoint("N_20250719")
+        await clear_checkpoint("N_20250718")
+        return loaded, other, await load_checkpoint("N_20250718")
+
+    loaded, other, cleared = asyncio.run(run())
+    assert loaded["last_ft"] == 1752810060 and loaded["last_prices"] == {"Nifty 50": 25010.0}
+    assert loaded["database_name"] == "N_20250718" and "saved_at" in loaded
+    assert redis.expiry[checkpoint_key("N_20250718")] == CHECKPOINT_TTL_SECONDS
+    assert other is None and cleared is None
+    print("✅ Checkpoint saved, replaced, loaded and cleared")
+
+
+def test_corrupt_checkpoint_is_ignored():
+    """An unreadable checkpoint loads as None so the run starts fresh"""
+    redis = use_fake_redis()
+    redis.values[checkpoint_key("N_20250718")] = "{not json"
+    assert asyncio.run(load_checkpoint("N_20250718")) is None
+    print("✅ Corrupt checkpoint ignored")
+
+
+class FakePipeline:
+    def __init__(self):
+        self.joined = False
+
+    async def join(self):
+        await asyncio.sleep(0)
+        self.joined = True
+
+
+def test_final_checkpoint_on_stop():
+    """A stopping stream drains its pipeline and checkpoints the last replayed ft"""
+    redis = use_fake_redis()
+    session = ConnectionManager()
+
+    async def checkpoint_state(database_name, last_ft):
+        return {"last_ft": last_ft}
+    session._checkpoint_state = checkpoint_state
+
+    async def run():
+        pipeline = FakePipeline()
+        await session._final_checkpoint(pipeline, "N_20250718", None)
+        assert not pipeline.joined and not redis.values  # nothing replayed yet
+        await session._final_checkpoint(pipeline, "N_20250718", 1752810120)
+        return pipeline
+
+    pipeline = asyncio.run(run())
+    assert pipeline.joined
+    assert json.loads(redis.values[checkpoint_key("N_20250718")])["last_ft"] == 1752810120
+    print("✅ Final checkpoint saved on stop")
+
+
+if __name__ == "__main__":
+    test_save_load_and_clear()
+    test_corrupt_checkpoint_is_ignored()
+    test_final_checkpoint_on_stop()
@@ -7,7 +7,7 @@ import asyncio
 import json
 from datetime import datetime
 from database import connect_to_mongo, connect_to_redis, close_mongo_connection, close_redis_connection, redis_client
-from main import calculate_ema, calculate_index_emas, get_redis_tick_length, get_redis_short_tick_length
+from main import calculate_index_emas, get_redis_tick_length, get_redis_short_tick_length
 
 async def test_complete_ema_workflow():
     """Test complete EMA workflow"""
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared EMA publisher
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ema_publisher import EmaPublisher
+
+
+class FakeWebSocket:
+    def __init__(self, fail: bool = False):
+        self.sent = []
+        self.fail = fail
+
+    async def send_text(self, message: str):
+        if self.fail:
+            raise RuntimeError("disconnected")
+        self.sent.append(json.loads(message))
+
+
+def make_publisher(versions: dict):
+    calls = []
+
+    async def compute(database_name, specs):
+        calls.append((database_name, specs))
+        return {"data_type": "ema_data", "long_ema": 1.0, "short_ema": 2.0,
+                "indicators": {spec: len(spec) for spec in specs}}
+
+    return EmaPublisher(compute, versions.get), calls
+
+
+def test_one_computation_fans_out_to_all_subscribers():
+    """Subscribers of a database share one computation with the union of their specs"""
+    print("=== Testing shared EMA publisher ===")
+    versions = {"N_20250718": 1}
+    publisher, calls = make_publisher(versions)
+    clients = [FakeWebSocket() for _ in range(50)]
+
+    async def run():
+        for i, client in enumerate(clients):
+            publisher.subscribe(client, "N_20250718", 0.1, ["rsi:14"] if i % 2 else [])
+        await asyncio.sleep(0.05)
+        # No new ticks: the next intervals skip both the computation and the sends
+        await asyncio.sleep(0.25)
+        versions["N_20250718"] = 2
+        await asyncio.sleep(0.15)
+        stats = publisher.stats()
+        await publisher.close()
+        return stats
+
+    stats = asyncio.run(run())
+    assert calls == [("N_20250718", ("rsi:14",))] * 2
+    assert stats["N_20250718"]["subscribers"] == 50 and stats["N_20250718"]["skipped"] >= 1
+    assert all(len(client.sent) == 2 for client in clients)
+    assert clients[1].sent[0]["indicators"] == {"rsi:14": 6}
+    assert "indicators" not in clients[0].sent[0]
+    print("✅ One computation per update, fanned out to every subscriber")
+
+
+def test_unsubscribe_and_failed_sends_stop_the_task():
+    """The last unsubscribe cancels a database's task; failing subscribers are dropped"""
+    publisher, calls = make_publisher({})
+    client, broken = FakeWebSocket(), FakeWebSocket(fail=True)
+
+    async def run():
+        publisher.subscribe(client, "N_20250718", 0.1)
+        publisher.subscribe(broken, "N_20250718", 0.1)
+        task = publisher.topics["N_20250718"].task
+        await asyncio.sleep(0.05)
+        subscribers = len(publisher.topics["N_20250718"].subscribers)
+        assert publisher.unsubscribe(client)
+        await asyncio.sleep(0)
+        return subscribers, task
+
+    subscribers, task = asyncio.run(run())
+    assert subscribers == 1 and len(client.sent) == 1
+    assert task.done() and publisher.topics == {}
+    assert not publisher.unsubscribe(client)
+    print("✅ Tasks end with the last subscriber")
+
+
+def test_resubscribe_moves_to_other_database():
+    """A second start replaces the WebSocket's subscription instead of adding a task"""
+    publisher, calls = make_publisher({})
+    client = FakeWebSocket()
+
+    async def run():
+        publisher.subscribe(client, "N_20250718", 1.0)
+        publisher.subscribe(client, "N_20250719", 1.0)
+        await asyncio.sleep(0.05)
+        topics = sorted(publisher.topics)
+        await publisher.close()
+        return topics
+
+    assert asyncio.run(run()) == ["N_20250719"]
+    assert [c[0] for c in calls] == ["N_20250719"]
+    print("✅ Subscriptions replaced on restart")
+
+
+if __name__ == "__main__":
+    test_one_computation_fans_out_to_all_subscribers()
+    test_unsubscribe_and_failed_sends_stop_the_task()
+    test_resubscribe_moves_to_other_database()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Test script for batched fill persistence
+"""
+
+import asyncio
+import os
+import sys
+
+import bson
+from pymongo.errors import BulkWriteError
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fills import FILL_EVENTS_COLLECTION, Fill, FillStats, persist_fills
+from order_book import BookOrder
+
+
+class FakeResult:
+    def __init__(self, matched_count):
+        self.matched_count = matched_count
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __aiter__(self):
+        self._iter = iter(self.docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeCollection:
+    """Orders collection applying the guarded updates to in-memory documents"""
+
+    def __init__(self, fail_indexes=()):
+        self.fail_indexes = set(fail_indexes)
+        self.bulk_writes = []
+        self.inserts = []
+        self.docs = {}
+        self.finds = 0
+
+    async def bulk_write(self, requests, ordered=True):
+        assert ordered is False
+        self.bulk_writes.append(requests)
+        matched = 0
+        for i, request in enumerate(requests):
+            doc = self.docs.get(request._filter["_id"])
+            if i in self.fail_indexes or doc is None or doc["status"] not in request._filter["status"]["$in"]:
+                continue
+            doc.update(request._doc["$set"])
+            matched += 1
+        if self.fail_indexes:
+            raise BulkWriteError({"writeErrors": [{"index": i, "code": 11000, "errmsg": "failed"}
+                                                  for i in sorted(self.fail_indexes)], "nMatched": matched})
+        return FakeResult(matched)
+
+    def find(self, query, projection=None):
+        self.finds += 1
+        return FakeCursor([self.docs[i] for i in query["_id"]["$in"] if i in self.docs])
+
+    async def insert_many(self, documents, ordered=True):
+        self.inserts.append(documents)
+
+
+class FakeDatabase:
+    def __init__(self, orders: FakeCollection):
+        self.orders = orders
+        self.collections = {FILL_EVENTS_COLLECTION: FakeCollection()}
+
+    def __getitem__(self, name):
+        return self.collections[name]
+
+
+def make_fills(count: int, orders: FakeCollection):
+    fills = [Fill(BookOrder(str(bson.ObjectId()), "NIFTY", "buy", "market", None, None, 75), 75, 100.5, 1752810000)
+             for _ in range(count)]
+    for fill in fills:
+        orders.docs[fill.order.object_id] = {"_id": fill.order.object_id, "status": "pending"}
+    return fills
+
+
+def test_frame_is_one_bulk_write():
+    """Fifty fills of a frame are one unordered bulk_write, guarded on the order still being open"""
+    print("=== Testing batched fill writes ===")
+    database = FakeDatabase(FakeCollection())
+    stats = FillStats()
+    fills = make_fills(50, database.orders)
+
+    failed, unmatched = asyncio.run(persist_fills(database, fills, stats, journal=True))
+    assert failed == [] and unmatched == [] and database.orders.finds == 0
+    assert len(database.orders.bulk_writes) == 1 and len(database.orders.bulk_writes[0]) == 50
+    update = database.orders.bulk_writes[0][0]._doc
+    assert update["$set"]["status"] == "filled" and update["$set"]["average_price"] == 100.5
+    assert database.orders.bulk_writes[0][0]._filter["status"] == {"$in": ["pending", "partially_filled"]}
+    events = database[FILL_EVENTS_COLLECTION].inserts
+    assert len(events) == 1 and [e["order_id"] for e in events[0]] == [f.order.id for f in fills]
+    stats.lock_held(0.002)
+    assert stats.stats()["write_amplification"] == 0.04  # two round-trips for 50 fills
+    assert stats.stats()["avg_lock_ms"] == 2.0
+    print("✅ One bulk write per frame")
+
+
+def test_failed_writes_are_returned():
+    """Fills rejected by the bulk write are returned for a retry and are not journaled"""
+    database = FakeDatabase(FakeCollection(fail_indexes=[1]))
+    stats = FillStats()
+    fills = make_fills(3, database.orders)
+
+    failed, unmatched = asyncio.run(persist_fills(database, fills, stats, journal=True))
+    assert failed == [fills[1]] and unmatched == []
+    assert [e["order_id"] for e in database[FILL_EVENTS_COLLECTION].inserts[0]] == [fills[0].order.id, fills[2].order.id]
+    assert stats.fills == 2 and stats.failed == 1
+    assert asyncio.run(persist_fills(database, [], stats)) == ([], []) and stats.round_trips == 2
+    print("✅ Failed fills returned for retry")
+
+
+def test_order_cancelled_during_write():
+    """A fill whose order was cancelled while the write was in flight is dropped, not counted or journaled"""
+    database = FakeDatabase(FakeCollection())
+    stats = FillStats()
+    fills = make_fills(3, database.orders)
+    # Cancelled through the API after the book matched it
+    database.orders.docs[fills[1].order.object_id]["status"] = "cancelled"
+
+    failed, unmatched = asyncio.run(persist_fills(database, fills, stats, journal=True))
+    assert failed == [] and unmatched == [fills[1]]
+    assert database.orders.docs[fills[1].order.object_id]["status"] == "cancelled"
+    assert [e["order_id"] for e in database[FILL_EVENTS_COLLECTION].inserts[0]] == [fills[0].order.id, fills[2].order.id]
+    assert stats.fills == 2 and stats.unmatched == 1 and stats.failed == 0
+    assert database.orders.finds == 1 and stats.round_trips == 3  # write, re-read, journal
+    print("✅ Fills of cancelled orders dropped")
+
+
+if __name__ == "__main__":
+    test_frame_is_one_bulk_write()
+    test_failed_writes_are_returned()
+    test_order_cancelled_during_write()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Test script for index provisioning helpers
+"""
+
+import os
+import sys
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indexes import RUN_DATABASE_INDEXES, summarize_plan
+
+
+def test_summarize_index_scan_plan():
+    """An index-backed plan reports its stages and index names"""
+    print("=== Testing plan summary ===")
+    explain = {
+        "queryPlanner": {
+            "namespace": "N_20250718.OptionTick",
+            "winningPlan": {
+                "stage": "FETCH",
+                "inputStage": {"stage": "IXSCAN", "indexName": "ft_1_token_1"}
+            }
+        }
+    }
+    summary = summarize_plan(explain)
+    assert summary["stages"] == ["FETCH", "IXSCAN"]
+    assert summary["indexes"] == ["ft_1_token_1"]
+    assert summary["uses_index"]
+    print("✅ Index scan detected")
+
+
+def test_summarize_collection_scan_plan():
+    """A collection scan (including slot-based engine output) is flagged"""
+    print("=== Testing collection scan summary ===")
+    explain = {"queryPlanner": {"winningPlan": {"queryPlan": {"stage": "COLLSCAN"}}}}
+    summary = summarize_plan(explain)
+    assert summary["stages"] == ["COLLSCAN"]
+    assert not summary["uses_index"]
+    print("✅ Collection scan detected")
+
+
+def test_option_tick_index_serves_lookup():
+    """OptionTick is indexed on (ft, token) so replay sorts and view lookups share one index"""
+    keys = [list(model.document["key"].keys()) for model in RUN_DATABASE_INDEXES["OptionTick"]]
+    assert ["ft", "token"] in keys
+    print("✅ OptionTick (ft, token) index defined")
+
+
+if __name__ == "__main__":
+    test_summarize_index_scan_plan()
+    test_summarize_collection_scan_plan()
+    test_option_tick_index_serves_lookup()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Test script for the incremental indicators
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indicators import EMA, IndicatorEngine, create_indicator, parse_spec
+
+
+def reference_ema(prices, period):
+    """SMA seed of the first period prices, then the EMA recursion"""
+    ema = sum(prices[:period]) / period
+    alpha = 2 / (period + 1)
+    for price in prices[period:]:
+        ema = alpha * price + (1 - alpha) * ema
+    return ema
+
+
+def test_incremental_matches_recomputation():
+    """Updating once per tick gives the same EMA as recomputing over all prices"""
+    print("=== Testing incremental EMA ===")
+    prices = [25000 + (i * 37) % 101 - 50 for i in range(300)]
+    ema = EMA(50)
+    for i, price in enumerate(prices, start=1):
+        ema.update(price)
+        if i == 10:
+            # Progressive period: mean of the prices seen so far
+            assert abs(ema.value - sum(prices[:10]) / 10) < 1e-9 and ema.period_used == 10
+    assert abs(ema.value - reference_ema(prices, 50)) < 1e-9
+    assert ema.period_used == 50
+    print("✅ Incremental EMA matches recomputation")
+
+
+def test_engine_state_round_trip():
+    """An engine restored from its checkpoint state continues identically"""
+    engine = IndicatorEngine(("ema:5", "ema:20", "macd", "min:5", "bollinger:10,2"))
+    for ft, price in enumerate(range(100, 130), start=1):
+        engine.update(float(price % 7 + price), ft)
+    restored = IndicatorEngine.from_state(json.loads(json.dumps(engine.state())))
+    for engine_ in (engine, restored):
+        engine_.update(131.0, 31)
+    assert restored.values() == engine.values()
+    assert restored.count == 31 and restored.last_ft == 31
+
+    # A spec registered later is seeded from stored prices and shared by equal specs
+    rsi = engine.add("RSI:14", [float(p) for p in range(100, 110)])
+    assert engine.add("rsi") is rsi and engine.has("rsi:14")
+    print("✅ Engine state survives a checkpoint")
+
+
+def test_rolling_indicators():
+    """Window indicators match a direct computation over the window"""
+    prices = [float((i * 37) % 101) for i in range(60)]
+    window = prices[-10:]
+    specs = {"sma:10": sum(window) / 10, "min:10": min(window), "max:10": max(window),
+             "wma:10": sum(w * p for w, p in enumerate(window, start=1)) / 55}
+    for spec, expected in specs.items():
+        indicator = create_indicator(spec)
+        for price in prices:
+            indicator.update(price)
+        assert abs(indicator.value - expected) < 1e-9, spec
+    bands = create_indicator("bollinger:10,2")
+    for price in prices:
+        bands.update(price)
+    mean = sum(window) / 10
+    deviation = (sum((p - mean) ** 2 for p in window) / 10) ** 0.5
+    assert abs(bands.value["upper"] - (mean + 2 * deviation)) < 1e-6
+    rsi = create_indicator("rsi:14")
+    for price in range(1, 20):
+        rsi.update(float(price))
+    assert rsi.value == 100.0
+    assert parse_spec("macd") == ("macd", (12, 26, 9))
+    assert parse_spec("ema:9.0") == ("ema", (9,))
+    for bad in ("foo:1", "ema:0", "vwap:5", "sma:x", "ema:9.7", "macd:12,26.5"):
+        try:
+            parse_spec(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"{bad} should be rejected")
+    print("✅ Rolling indicators match direct computation")
+
+
+def test_engine_evicts_unused_specs():
+    """A full engine drops the least recently read unpinned spec instead of refusing new ones"""
+    engine = IndicatorEngine(("ema:20", "ema:9"), max_indicators=4)
+    engine.add("sma:5", [1.0, 2.0])
+    engine.add("rsi:14", [1.0, 2.0])
+    engine.values(["sma:5"])
+    engine.add("max:5", [1.0, 2.0])
+    assert engine.has("ema:20", "ema:9", "sma:5", "max:5") and not engine.has("rsi:14")
+    engine.add("min:5")
+    assert engine.has("ema:20", "ema:9", "min:5") and engine.evicted == 2
+
+    # Pinned specs survive a checkpoint; repinning releases the old ones
+    restored = IndicatorEngine.from_state(json.loads(json.dumps(engine.state())))
+    assert restored.pinned == {"ema:20", "ema:9"}
+    restored.max_indicators = 4
+    restored.pin("ema:30", "ema:9")
+    restored.add("ema:30")
+    restored.add("ema:5")
+    assert restored.has("ema:30", "ema:9", "ema:5") and not restored.has("ema:20")
+
+    full = IndicatorEngine(("ema:20", "ema:9"), max_indicators=2)
+    try:
+        full.add("sma:5")
+    except ValueError:
+        print("✅ Unused indicator specs are evicted")
+        return
+    raise AssertionError("An engine of pinned specs only should refuse new ones")
+
+
+def test_stored_tick_emas_match_the_run_engine():
+    """calculate_index_emas gives the same EMAs from the stored ticks as from the run's engine"""
+    import main
+
+    prices = [25000.0 + (i * 37) % 101 - 50 for i in range(30)]
+
+    async def tick_length():
+        return 20
+
+    async def short_tick_length():
+        return 9
+
+    async def recent_prices(database_name, limit):
+        return prices[-limit:]
+
+    originals = (main.get_redis_tick_length, main.get_redis_short_tick_length, main.get_recent_index_prices)
+    main.get_redis_tick_length, main.get_redis_short_tick_length = tick_length, short_tick_length
+    main.get_recent_index_prices = recent_prices
+    try:
+        stored = asyncio.run(main.calculate_index_emas("N_TEST"))
+        engine = IndicatorEngine(("ema:20", "ema:9"))
+        for ft, price in enumerate(prices[-20:], start=1):
+            engine.update(price, ft)
+        main.index_indicators["N_TEST"] = engine
+        live = asyncio.run(main.calculate_index_emas("N_TEST"))
+    finally:
+        main.index_indicators.pop("N_TEST", None)
+        main.get_redis_tick_length, main.get_redis_short_tick_length, main.get_recent_index_prices = originals
+    assert stored == live
+    assert stored["long_period"] == 20 and stored["short_period"] == 9 and stored["total_ticks"] == 20
+    print("✅ Stored-tick EMAs match the run engine")
+
+
+if __name__ == "__main__":
+    test_incremental_matches_recomputation()
+    test_engine_state_round_trip()
+    test_engine_evicts_unused_specs()
+    test_stored_tick_emas_match_the_run_engine()
+    test_rolling_indicators()
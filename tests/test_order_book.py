@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Test script for the in-memory order book
+"""
+
+import asyncio
+import os
+import random
+import sys
+
+import bson
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_book import BookOrder, OrderBook, SymbolLocks
+
+
+def random_orders(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    orders = []
+    for i in range(count):
+        order_type = rng.choice(["market", "limit", "limit", "sl", "slm"])
+        price = round(rng.uniform(90, 110), 1)
+        orders.append(BookOrder(str(i), rng.choice(["nifty25jul25000ce", "NIFTY25JUL25000PE"]),
+                                rng.choice(["buy", "sell"]), order_type,
+                                price if order_type == "limit" else None,
+                                price if order_type in ("sl", "slm") else None,
+                                rng.randint(1, 5) * 75))
+    return orders
+
+
+def crosses(order: BookOrder, last_price: float) -> bool:
+    """The linear filter evaluate_and_execute_orders used to apply"""
+    if order.order_type == "market":
+        return True
+    if order.order_type == "limit":
+        return last_price <= order.price if order.side == "buy" else last_price >= order.price
+    return last_price >= order.trigger_price if order.side == "buy" else last_price <= order.trigger_price
+
+
+def test_matches_linear_scan():
+    """Every tick fills exactly the orders the linear scan would fill"""
+    print("=== Testing order book matching ===")
+    book = OrderBook()
+    remaining = random_orders(2000)
+    for order in remaining:
+        book.add(order)
+
+    rng = random.Random(11)
+    for _ in range(300):
+        symbol = rng.choice(["NIFTY25JUL25000CE", "nifty25jul25000pe"])
+        last_price = round(rng.uniform(88, 112), 1)
+        expected = {o.id for o in remaining if o.book_symbol == symbol.upper() and crosses(o, last_price)}
+        matched = book.match(symbol, last_price)
+        assert {o.id for o in matched} == expected
+        assert len(matched) == len(expected)  # nothing filled twice
+        remaining = [o for o in remaining if o.id not in expected]
+    assert len(book.orders) == len(remaining)
+    print("✅ Book matches the linear scan")
+
+
+def test_cancel_scope_and_compaction():
+    """Removed orders never fill, runs only see their own orders, and stale entries are compacted"""
+    book = OrderBook()
+    for i in range(200):
+        book.add(BookOrder(f"a{i}", "NIFTY", "buy", "limit", 100.0, None, 75, run_database="N_20250718"))
+    book.add(BookOrder("shared", "NIFTY", "buy", "limit", 100.0, None, 75))
+    book.add(BookOrder("other", "NIFTY", "buy", "limit", 100.0, None, 75, run_database="N_20250719"))
+    book.add(BookOrder("done", "NIFTY", "buy", "market", None, None, 75, filled_quantity=75))
+
+    for i in range(150):
+        book.remove(f"a{i}")
+    symbol_book = book.books[("N_20250718", "NIFTY")]
+    assert len(symbol_book.limit_buys) < 150  # rebuilt once stale entries outnumbered live ones
+
+    matched = book.match("NIFTY", 99.0, "N_20250718")
+    assert sorted(o.id for o in matched) == sorted([f"a{i}" for i in range(150, 200)] + ["shared"])
+    assert list(book.orders) == ["other"] and "done" not in book.orders
+    assert book.stats()["matched"] == 51
+    print("✅ Cancels, run scoping and compaction")
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __aiter__(self):
+        self._iter = iter(self.docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query):
+        if "_id" in query:
+            ids = set(query["_id"]["$in"])
+            return FakeCursor([d for d in self.docs if d["_id"] in ids])
+        statuses = set(query["status"]["$in"])
+        return FakeCursor([d for d in self.docs if d["status"] in statuses])
+
+
+def test_hydrate_and_refresh():
+    """The book loads open orders from MongoDB and reloads orders changed elsewhere"""
+    ids = [bson.ObjectId() for _ in range(3)]
+    docs = [
+        {"_id": ids[0], "symbol": "NIFTY", "side": "sell", "order_type": "limit", "price": 101.0,
+         "quantity": 75, "filled_quantity": 0, "status": "pending"},
+        {"_id": ids[1], "symbol": "NIFTY", "side": "buy", "order_type": "sl", "trigger_price": 102.0,
+         "quantity": 75, "filled_quantity": 0, "status": "filled"},
+        {"_id": ids[2], "symbol": "NIFTY", "side": "buy", "order_type": "market",
+         "quantity": 75, "filled_quantity": 0, "status": "pending"},
+    ]
+    collection = FakeCollection(docs)
+    book = OrderBook()
+
+    async def run():
+        loaded = await book.hydrate(collection)
+        docs[0]["status"] = "cancelled"
+        docs[1]["status"] = "pending"
+        await book.refresh(collection, [str(ids[0]), str(ids[1]), "not-an-id"])
+        return loaded
+
+    assert asyncio.run(run()) == 2
+    assert sorted(book.orders) == sorted([str(ids[1]), str(ids[2])])
+    assert [o.id for o in book.match("NIFTY", 102.5)] == [str(ids[2]), str(ids[1])]
+    print("✅ Hydrate and refresh from MongoDB")
+
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.queue = asyncio.Queue()
+
+    async def subscribe(self, channel):
+        self.redis.subscribers.append(self.queue)
+
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+
+    async def unsubscribe(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+class FakeRedis:
+    def __init__(self):
+        self.subscribers = []
+
+    async def publish(self, channel, message):
+        for queue in self.subscribers:
+            queue.put_nowait({"type": "message", "data": message})
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+
+def test_listen_skips_own_changes():
+    """A process reloads orders changed by another process, but not the ones it published itself"""
+    order_id = bson.ObjectId()
+    doc = {"_id": order_id, "symbol": "NIFTY", "side": "buy", "order_type": "limit", "price": 99.0,
+           "quantity": 75, "filled_quantity": 0, "status": "pending"}
+    collection = FakeCollection([doc])
+    redis = FakeRedis()
+    api, worker = OrderBook(redis), OrderBook(redis)
+    reloaded = {"api": [], "worker": []}
+    api.add_listener(lambda oid, d: reloaded["api"].append(oid))
+    worker.add_listener(lambda oid, d: reloaded["worker"].append(oid))
+
+    async def loader():
+        return collection
+
+    async def run():
+        tasks = [asyncio.create_task(book.listen(loader)) for book in (api, worker)]
+        await asyncio.sleep(0)
+        api.add_doc(doc)
+        await api.publish_changes([str(order_id)])
+        await asyncio.sleep(0.01)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run(run())
+    assert reloaded == {"api": [], "worker": [str(order_id)]}
+    assert list(worker.orders) == [str(order_id)]
+    assert api.stats()["own_skipped"] == 1 and worker.stats()["received"] == 1
+    print("✅ Own order changes are not reloaded")
+
+
+def test_symbol_locks_shard_evaluation():
+    """A held symbol blocks only its own evaluations, which then run in arrival order"""
+    print("=== Testing per-symbol locks ===")
+    locks = SymbolLocks()
+    events = []
+
+    async def evaluate(name, symbols, hold=0.0):
+        async with locks.hold(symbols):
+            events.append(f"{name} start")
+            await asyncio.sleep(hold)
+            events.append(f"{name} end")
+
+    async def run():
+        first = asyncio.create_task(evaluate("ce-1", ["NIFTY25JUL25000CE"], hold=0.05))
+        await asyncio.sleep(0)
+        # Another option and the index are not blocked by the held CE lock
+        await asyncio.gather(evaluate("pe", ["NIFTY25JUL25000PE"]), evaluate("index", ["Nifty 50"]))
+        events.append("others done")
+        # A frame touching CE and PE waits for CE; a later CE tick queues behind it
+        frame = asyncio.create_task(evaluate("frame", ["nifty25jul25000pe", "NIFTY25JUL25000CE"]))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(evaluate("ce-2", ["NIFTY25JUL25000CE"]))
+        await asyncio.gather(first, frame, second)
+
+    asyncio.run(run())
+    assert events.index("others done") < events.index("ce-1 end")
+    assert events[-4:] == ["frame start", "frame end", "ce-2 start", "ce-2 end"]
+    assert locks.stats()["symbols"] == 0 and locks.stats()["contended"] >= 2
+    print("✅ Symbols evaluated in parallel, each in order")
+
+
+if __name__ == "__main__":
+    test_matches_linear_scan()
+    test_cancel_scope_and_compaction()
+    test_hydrate_and_refresh()
+    test_listen_skips_own_changes()
+    test_symbol_locks_shard_evaluation()
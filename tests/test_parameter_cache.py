@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test script for the in-process parameter cache
+"""
+
+import asyncio
+import os
+import sys
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Parameter
+from param_cache import ParameterCache, parse_parameter_value
+
+
+def make_parameter(name, value, datatype=None, is_active=True):
+    return Parameter(id="1", name=name, value=value, datatype=datatype, is_active=is_active,
+                     created_at="2025-07-18T09:15:00", updated_at="2025-07-18T09:15:00", created_by="test")
+
+
+def test_cached_reads_skip_the_loader():
+    """Repeated reads are served from memory until the parameter is invalidated"""
+    print("=== Testing parameter cache ===")
+    store = {"REDIS_LONG_TICK_LENGTH": make_parameter("REDIS_LONG_TICK_LENGTH", "500", "int")}
+    loads = []
+
+    async def loader(name):
+        loads.append(name)
+        return store.get(name)
+
+    cache = ParameterCache(loader)
+
+    async def run():
+        values = [await cache.get("REDIS_LONG_TICK_LENGTH", 1000, int) for _ in range(100)]
+        store["REDIS_LONG_TICK_LENGTH"] = make_parameter("REDIS_LONG_TICK_LENGTH", "800", "int")
+        cache.invalidate("REDIS_LONG_TICK_LENGTH")
+        values.append(await cache.get("REDIS_LONG_TICK_LENGTH", 1000, int))
+        values.append(await cache.get("MISSING", 50, int))
+        return values
+
+    values = asyncio.run(run())
+    assert values[:100] == [500] * 100
+    assert values[100] == 800
+    assert values[101] == 50
+    assert loads == ["REDIS_LONG_TICK_LENGTH", "REDIS_LONG_TICK_LENGTH", "MISSING"]
+    print("✅ Cached reads and invalidation")
+
+
+def test_inactive_or_invalid_parameters_use_default():
+    """Inactive parameters and values that do not match their datatype fall back to the default"""
+    store = {
+        "OFF": make_parameter("OFF", "10", "int", is_active=False),
+        "BAD": make_parameter("BAD", "ten", "int"),
+    }
+
+    async def loader(name):
+        return store.get(name)
+
+    cache = ParameterCache(loader)
+
+    async def run():
+        return await cache.get("OFF", 1), await cache.get("BAD", 2)
+
+    assert asyncio.run(run()) == (1, 2)
+    assert parse_parameter_value("yes", "boolean") is True
+    assert parse_parameter_value('{"a": 1}', "json") == {"a": 1}
+    print("✅ Defaults for inactive and invalid parameters")
+
+
+if __name__ == "__main__":
+    test_cached_reads_skip_the_loader()
+    test_inactive_or_invalid_parameters_use_default()
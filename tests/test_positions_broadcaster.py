@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Test script for the coalescing positions broadcaster
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from positions_broadcaster import PositionsBroadcaster
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.messages = []
+
+    async def send_text(self, message):
+        self.messages.append(json.loads(message))
+
+
+class FakeManager:
+    def __init__(self, clients):
+        self.active_connections = clients
+        self.broadcasts = []
+
+    async def broadcast(self, message):
+        self.broadcasts.append(json.loads(message))
+        for client in self.active_connections:
+            await client.send_text(message)
+
+
+def make_broadcaster(clients, interval_seconds=0.05, idle_seconds=1.0):
+    state = {"price": 100.0, "orders": [{"id": "1", "status": "pending"}], "order_loads": 0}
+
+    def build_positions():
+        return [{"symbol": "NIFTY25JUL25000CE", "current_price": state["price"]}]
+
+    async def load_orders():
+        state["order_loads"] += 1
+        return list(state["orders"])
+
+    manager = FakeManager(clients)
+    return PositionsBroadcaster(manager, build_positions, load_orders, interval_seconds, idle_seconds), manager, state
+
+
+def test_frames_coalesce():
+    """Forty ticks of a frame produce one update, and unchanged positions are not sent again"""
+    print("=== Testing positions broadcaster ===")
+    clients = [FakeWebSocket() for _ in range(3)]
+    broadcaster, manager, state = make_broadcaster(clients)
+
+    async def run():
+        for i in range(40):
+            state["price"] = 100.0 + i
+            broadcaster.mark_dirty()
+        await asyncio.sleep(0.02)
+        # Nothing changed: the flush after these marks sends nothing
+        for _ in range(10):
+            broadcaster.mark_dirty()
+        await asyncio.sleep(0.1)
+        await broadcaster.close()
+
+    asyncio.run(run())
+    assert [m["type"] for m in manager.broadcasts] == ["positions_update", "orders_update"]
+    assert manager.broadcasts[0]["positions"][0]["current_price"] == 139.0
+    assert all(len(c.messages) == 2 for c in clients)
+    stats = broadcaster.stats()
+    assert stats["flushes"] == 2 and stats["skipped"] == 1 and stats["order_loads"] == 1
+    print("✅ One update per frame, none when unchanged")
+
+
+def test_rate_limit_and_order_cache():
+    """Updates are at least the interval apart; orders are reloaded only after an order change"""
+    clients = [FakeWebSocket()]
+    broadcaster, manager, state = make_broadcaster(clients, interval_seconds=0.1)
+    sent_at = []
+    broadcast = manager.broadcast
+
+    async def timed_broadcast(message):
+        sent_at.append(asyncio.get_running_loop().time())
+        await broadcast(message)
+    manager.broadcast = timed_broadcast
+
+    async def run():
+        for i in range(12):
+            state["price"] = 100.0 + i
+            broadcaster.mark_dirty()
+            await asyncio.sleep(0.025)
+        state["orders"].append({"id": "2", "status": "filled"})
+        broadcaster.mark_dirty(orders=True)
+        await asyncio.sleep(0.15)
+        await broadcaster.close()
+
+    asyncio.run(run())
+    positions_sends = [t for t, m in zip(sent_at, manager.broadcasts) if m["type"] == "positions_update"]
+    assert 3 <= len(positions_sends) <= 5
+    assert all(b - a >= 0.09 for a, b in zip(positions_sends, positions_sends[1:]))
+    assert state["order_loads"] == 2
+    assert manager.broadcasts[-1] == {"type": "orders_update", "orders": state["orders"]}
+    print("✅ Rate limited, orders cached between order changes")
+
+
+def test_snapshot_and_no_clients():
+    """A new client gets the current state; without clients nothing is built or sent"""
+    broadcaster, manager, state = make_broadcaster([])
+
+    async def run():
+        broadcaster.mark_dirty(orders=True)
+        await asyncio.sleep(0.01)
+        assert broadcaster.task is None and state["order_loads"] == 0
+        client = FakeWebSocket()
+        manager.active_connections.append(client)
+        await broadcaster.snapshot(client)
+        await asyncio.sleep(0.01)
+        await broadcaster.close()
+        return client
+
+    client = asyncio.run(run())
+    assert [m["type"] for m in client.messages][:2] == ["positions_update", "orders_update"]
+    print("✅ Snapshot for new clients")
+
+
+if __name__ == "__main__":
+    test_frames_coalesce()
+    test_rate_limit_and_order_cache()
+    test_snapshot_and_no_clients()
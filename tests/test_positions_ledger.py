@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Test script for the incremental positions ledger
+"""
+
+import asyncio
+import os
+import random
+import sys
+
+import bson
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_book import BookOrder, OrderBook
+from positions_ledger import PositionLedger
+
+
+def aggregate(orders):
+    """The $group / $addFields stages of aggregate_positions, in Python"""
+    groups = {}
+    for o in orders:
+        g = groups.setdefault((o["symbol"], o["user_id"]), [0] * 10)
+        buy = o["side"] == "buy"
+        if o["status"] == "filled":
+            g[0 if buy else 1] += o["filled_quantity"]
+            g[2 if buy else 3] += o["filled_quantity"] * o["average_price"]
+        elif o["status"] == "pending":
+            remaining = o["quantity"] - o["filled_quantity"]
+            g[4 if buy else 5] += 1
+            g[6 if buy else 7] += remaining
+            g[8 if buy else 9] += remaining * o["price"] if o["price"] is not None else 0
+    results = []
+    for (symbol, user_id), g in groups.items():
+        results.append({
+            "symbol": symbol, "user_id": user_id,
+            "total_buy_quantity": g[0], "total_sell_quantity": g[1],
+            "total_buy_value": g[2], "total_sell_value": g[3],
+            "open_buy_orders": g[4], "open_sell_orders": g[5],
+            "open_buy_quantity": g[6], "open_sell_quantity": g[7],
+            "open_buy_value": g[8], "open_sell_value": g[9],
+            "net_position": g[0] - g[1],
+            "realized_pnl": min(g[0], g[1]) * (g[3] / g[1] - g[2] / g[0]) if g[0] > 0 and g[1] > 0 else 0,
+        })
+    return results
+
+
+def random_order(rng):
+    status = rng.choice(["pending", "pending", "filled", "cancelled", "partially_filled"])
+    quantity = rng.randint(1, 4) * 75
+    price = rng.choice([None, round(rng.uniform(90, 110), 2)])
+    return {"_id": bson.ObjectId(), "symbol": rng.choice(["NIFTY25JUL25000CE", "NIFTY25JUL25000PE"]),
+            "user_id": rng.choice(["u1", "u2"]), "side": rng.choice(["buy", "sell"]), "status": status,
+            "quantity": quantity, "filled_quantity": quantity if status == "filled" else 0,
+            "average_price": round(rng.uniform(90, 110), 2) if status == "filled" else None, "price": price}
+
+
+def test_ledger_matches_aggregation():
+    """Random creates, fills, cancels and deletes keep the ledger equal to a full aggregation"""
+    print("=== Testing positions ledger ===")
+    rng = random.Random(5)
+    ledger = PositionLedger()
+    orders = {}
+    for _ in range(2000):
+        action = rng.random()
+        if action < 0.5 or not orders:
+            order = random_order(rng)
+            orders[order["_id"]] = order
+            ledger.apply(order)
+        elif action < 0.8:
+            order = orders[rng.choice(list(orders))]
+            if order["status"] == "pending":
+                order.update(status="filled", filled_quantity=order["quantity"],
+                             average_price=round(rng.uniform(90, 110), 2))
+            else:
+                order["status"] = "cancelled"
+            ledger.apply(dict(order))
+        else:
+            order_id = rng.choice(list(orders))
+            del orders[order_id]
+            ledger.remove(str(order_id))
+    assert ledger.differences(aggregate(orders.values())) == []
+    assert ledger.stats()["orders"] == len(orders)
+
+    # A filter by user returns only that user's positions
+    assert {p["user_id"] for p in ledger.positions(user_id="u1")} == {"u1"}
+    orders.clear()
+    ledger.clear()
+    assert ledger.positions() == [] and ledger.differences([]) == []
+    print("✅ Ledger matches the aggregation")
+
+
+def test_fill_and_drift_detection():
+    """A book fill moves the position without a re-read, and reconciliation spots drift"""
+    ledger = PositionLedger()
+    order_id = str(bson.ObjectId())
+    doc = {"_id": order_id, "symbol": "NIFTY25JUL25000CE", "user_id": "u1", "side": "buy",
+           "status": "pending", "quantity": 75, "filled_quantity": 0, "price": 100.0}
+    ledger.apply(doc)
+    version = ledger.version
+    ledger.apply(dict(doc))
+    assert ledger.version == version  # unchanged order, unchanged ledger
+
+    ledger.apply_fill(BookOrder.from_doc(doc), 75, 99.5)
+    [position] = ledger.positions()
+    assert position["total_buy_quantity"] == 75 and position["open_buy_orders"] == 0
+    assert position["average_buy_price"] == 99.5 and position["net_position"] == 75
+
+    doc.update(status="filled", filled_quantity=75, average_price=99.5)
+    assert ledger.differences(aggregate([doc])) == []
+    doc["average_price"] = 101.0
+    assert len(ledger.differences(aggregate([doc]))) == 1
+    assert ledger.differences([]) == ["('NIFTY25JUL25000CE', 'u1'): not in orders"]
+    print("✅ Fills applied and drift detected")
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __aiter__(self):
+        self._iter = iter(self.docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query):
+        ids = set(query["_id"]["$in"])
+        return FakeCursor([d for d in self.docs if d["_id"] in ids])
+
+
+def test_follows_order_book_refresh():
+    """Orders changed in another process reach the ledger through the order book listener"""
+    ids = [bson.ObjectId() for _ in range(2)]
+    docs = [{"_id": i, "symbol": "NIFTY", "user_id": "u1", "side": "sell", "order_type": "limit",
+             "status": "pending", "quantity": 75, "filled_quantity": 0, "price": 101.0} for i in ids]
+    ledger = PositionLedger()
+    book = OrderBook()
+    book.add_listener(lambda order_id, doc: ledger.remove(order_id) if doc is None else ledger.apply(doc))
+
+    async def run():
+        await book.refresh(FakeCollection(docs), [str(i) for i in ids])
+        docs[0].update(status="filled", filled_quantity=75, average_price=101.5)
+        del docs[1]
+        await book.refresh(FakeCollection(docs), [str(i) for i in ids])
+
+    asyncio.run(run())
+    [position] = ledger.positions()
+    assert position["total_sell_quantity"] == 75 and position["open_sell_orders"] == 0
+    assert ledger.stats()["orders"] == 1 and list(book.orders) == []
+    print("✅ Ledger follows order book refreshes")
+
+
+if __name__ == "__main__":
+    test_ledger_matches_aggregation()
+    test_fill_and_drift_detection()
+    test_follows_order_book_refresh()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Test script for the merged-cursor tick replay reader
+"""
+
+import asyncio
+import os
+import sys
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from replay import (LiveWatchStats, VirtualClock, _watch_change_stream, ft_at_time_of_day, iter_tick_frames,
+                    read_warmup_ticks, watch_tick_frames)
+
+
+class FakeCursor:
+    """Minimal stand-in for a Motor cursor over an in-memory list"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self._iter = iter(self.docs)
+
+    def sort(self, key, direction):
+        self.docs = sorted(self.docs, key=lambda d: d[key], reverse=direction < 0)
+        self._iter = iter(self.docs)
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def limit(self, count):
+        self.docs = self.docs[:count]
+        self._iter = iter(self.docs)
+        return self
+
+    async def to_list(self, length=None):
+        return list(self.docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+        self.find_calls = 0
+
+    def find(self, query, projection=None):
+        self.find_calls += 1
+        docs = self.docs
+        ft_filter = query.get("ft", {})
+        checks = {
+            "$gt": lambda ft, bound: ft > bound,
+            "$gte": lambda ft, bound: ft >= bound,
+            "$lt": lambda ft, bound: ft < bound,
+            "$lte": lambda ft, bound: ft <= bound,
+        }
+        for op, bound in ft_filter.items():
+            docs = [d for d in docs if checks[op](d["ft"], bound)]
+        return FakeCursor(list(docs))
+
+
+class FakeAdmin:
+    async def command(self, name):
+        # Standalone server: no replica set name
+        return {"isWritablePrimary": True}
+
+
+class FakeClient:
+    admin = FakeAdmin()
+
+
+class FakeDatabase(dict):
+    client = FakeClient()
+
+
+def build_database():
+    index_ticks = [{"ft": ft, "ts": "Nifty 50", "lp": 25000.0 + ft} for ft in (3, 1, 2, 5)]
+    option_ticks = [
+        {"ft": 1, "token": 11, "lp": 100.0},
+        {"ft": 1, "token": 12, "lp": 90.0},
+        {"ft": 2, "token": 11, "lp": 101.0},
+        {"ft": 4, "token": 11, "lp": 102.0},  # no IndexTick at ft 4
+        {"ft": 5, "token": 12, "lp": 88.0},
+    ]
+    return FakeDatabase(IndexTick=FakeCollection(index_ticks), OptionTick=FakeCollection(option_ticks))
+
+
+async def collect(database, after_ft=None):
+    return [frame async for frame in iter_tick_frames(database, after_ft=after_ft)]
+
+
+def test_frames_are_merged_by_ft():
+    """Each IndexTick ft yields one frame carrying its OptionTicks"""
+    print("=== Testing merged tick frames ===")
+    database = build_database()
+    frames = asyncio.run(collect(database))
+
+    assert [f.ft for f in frames] == [1, 2, 3, 5]
+    assert [len(f.option_docs) for f in frames] == [2, 1, 0, 1]
+    assert all(len(f.index_docs) == 1 for f in frames)
+    # One cursor per collection, regardless of the number of IndexTicks
+    assert database["IndexTick"].find_calls == 1
+    assert database["OptionTick"].find_calls == 1
+    print("✅ Frames merged with a single cursor per collection")
+
+
+def test_frames_after_ft():
+    """Monitoring reads only frames newer than the last replayed ft"""
+    print("=== Testing frames after ft ===")
+    frames = asyncio.run(collect(build_database(), after_ft=2))
+    assert [f.ft for f in frames] == [3, 5]
+    print("✅ Frames after ft returned")
+
+
+def test_frames_in_window_and_warmup():
+    """A bounded window replays only its frames and warms up from the ticks before it"""
+    print("=== Testing replay window ===")
+    database = build_database()
+    frames = asyncio.run(collect_window(database, after_ft=1, until_ft=3))
+    assert [f.ft for f in frames] == [2, 3]
+
+    index_docs, option_docs = asyncio.run(read_warmup_ticks(database, before_ft=5, count=2))
+    assert [d["ft"] for d in index_docs] == [2, 3]
+    assert [d["ft"] for d in option_docs] == [2, 4]
+
+    # 14:00 IST on the trading day of 2025-07-18 09:15:05 IST
+    assert ft_at_time_of_day(1752810305, "14:00") == 1752827400
+    print("✅ Window bounds and warm-up read")
+
+
+async def collect_window(database, after_ft, until_ft):
+    return [frame async for frame in iter_tick_frames(database, after_ft=after_ft, until_ft=until_ft)]
+
+
+def test_watch_falls_back_to_polling():
+    """Without a replica set, live monitoring polls for frames after the last ft"""
+    print("=== Testing live monitoring fallback ===")
+    database = build_database()
+
+    async def first_live_frames():
+        frames = []
+        async for frame in watch_tick_frames(database, after_ft=1, poll_interval=0.01):
+            frames.append(frame)
+            if frame.ft == 3:
+                database["IndexTick"].docs.append({"ft": 7, "ts": "Nifty 50", "lp": 25007.0})
+            if len(frames) == 4:
+                return frames
+
+    frames = asyncio.run(asyncio.wait_for(first_live_frames(), timeout=5))
+    assert [f.ft for f in frames] == [2, 3, 5, 7]
+    print("✅ Polling fallback picked up new ticks")
+
+
+class FakeChangeStream:
+    """Change stream over a list of (collection, document) inserts, optionally fed while running"""
+
+    def __init__(self, events):
+        self.events = asyncio.Queue()
+        for event in events:
+            self.events.put_nowait(event)
+        self.delivered = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        coll, doc = await self.events.get()
+        self.delivered += 1
+        return {"ns": {"coll": coll}, "fullDocument": doc}
+
+
+class FakeReplicaSetAdmin:
+    async def command(self, name):
+        return {"isWritablePrimary": True, "setName": "rs0"}
+
+
+class FakeReplicaSetClient:
+    admin = FakeReplicaSetAdmin()
+
+
+class FakeReplicaSetDatabase(FakeDatabase):
+    client = FakeReplicaSetClient()
+
+    def watch(self, pipeline):
+        return self.stream
+
+
+def test_watch_change_stream_frames_and_late_ticks():
+    """Change events become ft frames after the catch-up read; late ticks are counted, not silently lost"""
+    print("=== Testing live monitoring with a change stream ===")
+    database = FakeReplicaSetDatabase(IndexTick=FakeCollection([{"ft": ft, "ts": "Nifty 50", "lp": 1.0} for ft in (1, 2, 3)]),
+                                      OptionTick=FakeCollection([]))
+    database.stream = FakeChangeStream([
+        ("IndexTick", {"ft": 3, "ts": "Nifty 50", "lp": 1.0}),  # also read by the catch-up
+        ("IndexTick", {"ft": 4, "ts": "Nifty 50", "lp": 2.0}),
+        ("OptionTick", {"ft": 4, "token": 11, "lp": 100.0}),
+        ("IndexTick", {"ft": 5, "ts": "Nifty 50", "lp": 3.0}),
+    ])
+    stats = LiveWatchStats()
+
+    async def run():
+        frames = []
+        async for frame in watch_tick_frames(database, after_ft=1, flush_seconds=0.01, stats=stats):
+            frames.append(frame)
+            if frame.ft == 5:
+                # Arrives after frame 5 was flushed on the idle timeout
+                database.stream.events.put_nowait(("OptionTick", {"ft": 5, "token": 11, "lp": 101.0}))
+                database.stream.events.put_nowait(("IndexTick", {"ft": 6, "ts": "Nifty 50", "lp": 4.0}))
+            if frame.ft == 6:
+                return frames
+
+    frames = asyncio.run(asyncio.wait_for(run(), timeout=5))
+    assert [f.ft for f in frames] == [2, 3, 4, 5, 6]
+    assert len(frames[2].option_docs) == 1 and frames[3].option_docs == []
+    assert stats.late_ticks == 1 and stats.last_late_ft == 5
+    print("✅ Change stream frames built, late tick counted")
+
+
+def test_change_stream_queue_is_bounded():
+    """A slow consumer stops the pump once the queue is full"""
+    database = FakeReplicaSetDatabase(IndexTick=FakeCollection([{"ft": 1, "ts": "Nifty 50", "lp": 1.0}]),
+                                      OptionTick=FakeCollection([]))
+    database.stream = FakeChangeStream([("IndexTick", {"ft": ft, "ts": "Nifty 50", "lp": 1.0})
+                                        for ft in range(2, 100)])
+
+    async def run():
+        frames = _watch_change_stream(database, 0, flush_seconds=0.01, queue_size=5)
+        assert (await frames.__anext__()).ft == 1
+        await asyncio.sleep(0.05)  # the consumer does not read
+        delivered = database.stream.delivered
+        await frames.aclose()
+        return delivered
+
+    # Five queued events and one waiting for room
+    assert asyncio.run(run()) <= 6
+    print("✅ Change stream queue bounded")
+
+
+def test_virtual_clock_sleep_follows_feed_time():
+    """Strategy waits complete when market time passes, not wall-clock time"""
+    print("=== Testing virtual clock ===")
+
+    async def run():
+        clock = VirtualClock()
+        clock.advance(100)
+        waiter = asyncio.create_task(clock.sleep(30))
+        await asyncio.sleep(0)
+        clock.advance(120)
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        clock.advance(130)
+        await asyncio.wait_for(waiter, timeout=1)
+        clock.advance(125)  # time never moves backwards
+        return clock.now()
+
+    assert asyncio.run(run()) == 130
+    print("✅ Virtual clock released the wait at market time")
+
+
+def test_virtual_clock_release_falls_back_to_wall_clock():
+    """When the replay stops, pending waits finish on the wall clock instead of hanging or being cancelled"""
+
+    async def run():
+        clock = VirtualClock()
+        clock.advance(100)
+        short = asyncio.create_task(clock.sleep(0.05))
+        long = asyncio.create_task(clock.sleep(30))
+        await asyncio.sleep(0)
+        clock.release()
+        await asyncio.wait_for(short, timeout=1)
+        assert not long.done()
+        # New waits after the replay stopped use the wall clock
+        await asyncio.wait_for(clock.sleep(0.01), timeout=1)
+        clock.reset()
+        await asyncio.sleep(0)
+        assert not long.cancelled() and not clock.wall_clock
+        long.cancel()
+
+    asyncio.run(run())
+    print("✅ Released waits finish on the wall clock")
+
+
+if __name__ == "__main__":
+    test_frames_are_merged_by_ft()
+    test_frames_after_ft()
+    test_frames_in_window_and_warmup()
+    test_watch_falls_back_to_polling()
+    test_watch_change_stream_frames_and_late_ticks()
+    test_change_stream_queue_is_bounded()
+    test_virtual_clock_sleep_follows_feed_time()
+    test_virtual_clock_release_falls_back_to_wall_clock()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Test script for concurrent run session topics
+"""
+
+import asyncio
+import os
+import sys
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import checkpoint
+import main
+from checkpoint import load_checkpoint, save_checkpoint
+from main import RunSessionRegistry
+from tick_store import RedisStreamTickWriter
+from ticks import TickRecord
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def xadd(self, key, fields, id="*", maxlen=None, approximate=True):
+        self.commands.append(lambda: self.redis.values.setdefault(key, []).append((id, fields)))
+
+    def sadd(self, key, *members):
+        self.commands.append(lambda: self.redis.values.setdefault(key, set()).update(members))
+
+    async def execute(self):
+        return [command() for command in self.commands]
+
+
+class FakeRedis:
+    """Tick streams and checkpoints of one Redis"""
+
+    def __init__(self):
+        self.values = {}
+
+    def pipeline(self, transaction=False):
+        return FakePipeline(self)
+
+    async def scan_iter(self, match=None, count=None):
+        for key in [k for k in self.values if k.startswith(match.rstrip("*"))]:
+            yield key
+
+    async def unlink(self, *keys):
+        return sum(self.values.pop(key, None) is not None for key in keys)
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def delete(self, key):
+        return int(self.values.pop(key, None) is not None)
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, message):
+        self.sent.append(message)
+
+
+def test_sessions_broadcast_to_their_own_topic():
+    """Clients only receive messages of the run database they subscribed to"""
+    print("=== Testing run session topics ===")
+    registry = RunSessionRegistry()
+    first, second = FakeWebSocket(), FakeWebSocket()
+    registry.subscribe(first, "N_20250718")
+    registry.subscribe(second, "N_20250719")
+
+    async def broadcast():
+        await registry.get("N_20250718").broadcast("tick-18")
+        await registry.get("N_20250719").broadcast("tick-19")
+
+    asyncio.run(broadcast())
+    assert first.sent == ["tick-18"]
+    assert second.sent == ["tick-19"]
+    print("✅ Each session broadcast to its own clients")
+
+
+def test_subscribe_moves_client_between_topics():
+    """Subscribing to another run leaves the previous topic"""
+    print("=== Testing topic switch ===")
+    registry = RunSessionRegistry()
+    client = FakeWebSocket()
+    registry.subscribe(client, "N_20250718")
+    registry.subscribe(client, "N_20250719")
+
+    assert client not in registry.get("N_20250718").active_connections
+    assert client in registry.get("N_20250719").active_connections
+    assert registry.running() == []
+    print("✅ Client moved to the new topic")
+
+
+def test_last_prices_stay_per_session():
+    """Runs of the same symbol on different days keep their own last prices"""
+    registry = RunSessionRegistry()
+    registry.subscribe(FakeWebSocket(), "N_20250718")
+    registry.subscribe(FakeWebSocket(), "N_20250719")
+    registry.get("N_20250718").last_prices["Nifty 50"] = 25000.0
+    registry.get("N_20250719").last_prices["Nifty 50"] = 25200.0
+    registry.get("N_20250719").last_prices["NIFTY25JUL25000CE"] = 120.0
+
+    assert registry.last_price("Nifty 50", "N_20250718") == 25000.0
+    assert registry.last_price("Nifty 50", "N_20250719") == 25200.0
+    assert registry.last_price("NIFTY25JUL25000CE", "N_20250718") == 120.0  # only known to the other run
+    assert registry.last_price("BANKNIFTY", "N_20250718") is None
+    print("✅ Last prices kept per session")
+
+
+def test_fresh_restart_flushes_after_the_old_run_stopped():
+    """The stopping replay's last ticks and checkpoint do not leak into a fresh restart"""
+    print("=== Testing fresh restart of a running session ===")
+    redis = FakeRedis()
+
+    async def max_ticks():
+        return 1000
+
+    writer = RedisStreamTickWriter(redis, max_ticks)
+    originals = (main.tick_writer, checkpoint.redis_client)
+    main.tick_writer, checkpoint.redis_client = writer, redis
+    registry = RunSessionRegistry()
+    registry.subscribe(FakeWebSocket(), "N_20250718")
+    session = registry.get("N_20250718")
+    seen = {}
+
+    async def old_replay():
+        try:
+            await asyncio.Event().wait()
+        finally:
+            # Like _stream_ticks: drain the queued ticks and save a final checkpoint
+            tick = TickRecord.from_doc({"ft": 1752810600, "token": 101, "lp": 120.0}, "optiontick")
+            await writer.write([tick], "N_20250718")
+            await save_checkpoint("N_20250718", {"last_ft": 1752810600})
+
+    async def start_tick_stream(database_name, *args):
+        seen["keys"] = sorted(redis.values)
+        seen["checkpoint"] = await load_checkpoint(database_name)
+        seen["last_ids"] = dict(writer._last_ids)
+
+    async def run():
+        session.is_streaming = True
+        session.tick_stream_task = asyncio.create_task(old_replay())
+        await asyncio.sleep(0)
+        session.start_tick_stream = start_tick_stream
+        await registry.start("N_20250718", fresh=True)
+
+    try:
+        asyncio.run(run())
+    finally:
+        main.tick_writer, checkpoint.redis_client = originals
+    assert seen == {"keys": [], "checkpoint": None, "last_ids": {}}
+    print("✅ Redis, checkpoint and stream IDs empty when the new replay starts")
+
+
+if __name__ == "__main__":
+    test_sessions_broadcast_to_their_own_topic()
+    test_subscribe_moves_client_between_topics()
+    test_last_prices_stay_per_session()
+    test_fresh_restart_flushes_after_the_old_run_stopped()
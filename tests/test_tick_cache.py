@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test script for the in-process ring-buffer tick cache
+"""
+
+import os
+import sys
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tick_cache import TickCache, TickRing
+from ticks import TickRecord
+
+INDEX_KEY = "ticks:N_20250718:indextick"
+
+
+def index_tick(ft):
+    return TickRecord.from_doc({"ft": ft, "token": 26000, "lp": 25000.0 + ft, "ts": "Nifty 50"}, "indextick")
+
+
+def option_tick(ft, token):
+    return TickRecord.from_doc({"ft": ft, "token": token, "lp": 100.0 + ft}, "optiontick")
+
+
+def test_ring_views_after_wrap():
+    """The latest ticks are one contiguous view even after the ring wraps"""
+    print("=== Testing tick ring ===")
+    ring = TickRing(4)
+    for ft in range(1, 8):
+        ring.append(index_tick(ft))
+    view = ring.latest_values(3)
+    assert view["ft"].tolist() == [5, 6, 7]
+    assert view.base is ring.values  # zero-copy
+    assert [t.ft for t in ring.latest_records()] == [4, 5, 6, 7]
+    assert [t.ft for t in ring.resized(2).latest_records()] == [6, 7]
+    print("✅ Ring views are contiguous and oldest first")
+
+
+def test_cache_hits_and_misses():
+    """Complete databases answer every read; others only reads the ring can fully serve"""
+    cache = TickCache()
+    cache.reset("N_20250718", complete=True)
+    cache.append("N_20250718", [(INDEX_KEY, index_tick(ft)) for ft in range(1, 4)], 1000)
+    cache.append("N_20250718", [(f"ticks:N_20250718:optiontick:{token}", option_tick(ft, token))
+                                for ft in range(1, 5) for token in ((101,) if ft % 2 else (102,))], 1000)
+
+    assert cache.latest_values("N_20250718", INDEX_KEY, 1000)["lp"].tolist() == [25001.0, 25002.0, 25003.0]
+    keys = cache.keys("N_20250718", "ticks:N_20250718:optiontick:")
+    assert [t.ft for t in cache.latest_records("N_20250718", keys, 3)] == [4, 3, 2]
+    assert [t.ft for t in cache.latest_records("N_20250718", keys, None, start_ft=2, end_ft=3)] == [3, 2]
+    assert cache.latest_records("N_20250718", ["ticks:N_20250718:optiontick:999"], 5) == []
+
+    # A resumed run only holds the ticks written since it resumed
+    cache.reset("N_20250718")
+    cache.append("N_20250718", [(INDEX_KEY, index_tick(ft)) for ft in range(10, 13)], 1000)
+    assert cache.latest_values("N_20250718", INDEX_KEY, 1000) is None
+    assert cache.latest_values("N_20250718", INDEX_KEY, 2)["ft"].tolist() == [11, 12]
+    assert cache.latest_records("N_20250718", [INDEX_KEY], None, start_ft=11) is None
+    assert cache.keys("N_20250718", "ticks:N_20250718:optiontick:") is None
+    assert cache.stats()["misses"] == 2
+    print("✅ Cache serves complete runs and falls back to Redis otherwise")
+
+
+if __name__ == "__main__":
+    test_ring_views_after_wrap()
+    test_cache_hits_and_misses()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test script for the Redis tick encodings
+"""
+
+import asyncio
+import os
+import sys
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tick_codec import TICK_STRUCT, create_tick_codec, symbols_key
+from ticks import TickRecord
+
+
+class FakeRedis:
+    """Hash commands of a decode_responses=False client"""
+
+    def __init__(self):
+        self.hashes = {}
+
+    async def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field.encode())
+
+    async def hincrby(self, key, field, amount):
+        values = self.hashes.setdefault(key, {})
+        values[field.encode()] = str(int(values.get(field.encode(), b"0")) + amount).encode()
+        return int(values[field.encode()])
+
+    async def hsetnx(self, key, field, value):
+        values = self.hashes.setdefault(key, {})
+        if field.encode() in values:
+            return 0
+        values[field.encode()] = str(value).encode()
+        return 1
+
+    async def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field.encode()] = value.encode()
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+
+def option_ticks():
+    return [TickRecord.from_doc({"ft": 1752810305 + i, "token": 26001 + i % 2, "e": "NFO", "lp": 125.5 + i,
+                                 "pc": -0.02, "rt": "2025-07-18 09:15:05", "ts": f"NIFTY25JUL2510{i % 2}CE"},
+                                "optiontick") for i in range(4)]
+
+
+def test_binary_round_trip():
+    """Binary records are fixed width and decode to the same tick dicts"""
+    print("=== Testing binary tick encoding ===")
+    redis = FakeRedis()
+    codec = create_tick_codec("binary")
+    ticks = option_ticks()
+
+    async def run():
+        await codec.prepare(redis, "N_20250718", ticks)
+        values = [codec.encode("N_20250718", tick) for tick in ticks]
+        # A reader in another process resolves symbols from Redis
+        reader = create_tick_codec("binary")
+        return values, await reader.decode(redis, "N_20250718", values, "optiontick")
+
+    values, decoded = asyncio.run(run())
+    assert all(len(v) == TICK_STRUCT.size == 49 for v in values)
+    assert decoded == [t.to_dict() for t in ticks]
+    assert len([f for f in redis.hashes[symbols_key("N_20250718")] if f.isdigit()]) == 2
+    assert codec.ft_of(values[2]) == 1752810307
+    print("✅ Binary ticks round-trip through a 2-entry symbol table")
+
+
+def test_arrays_match_between_encodings():
+    """Both encodings decode straight into the same numpy columns"""
+    redis = FakeRedis()
+    ticks = option_ticks()
+
+    async def run():
+        arrays = []
+        for encoding in ("json", "binary"):
+            codec = create_tick_codec(encoding)
+            await codec.prepare(redis, "N_20250718", ticks)
+            values = [codec.encode("N_20250718", tick) for tick in ticks]
+            arrays.append(await codec.to_array(redis, "N_20250718", values))
+        return arrays
+
+    json_array, binary_array = asyncio.run(run())
+    assert json_array.tolist() == binary_array.tolist()
+    assert binary_array["lp"].tolist() == [125.5, 126.5, 127.5, 128.5]
+    print("✅ JSON and binary arrays match")
+
+
+if __name__ == "__main__":
+    test_binary_round_trip()
+    test_arrays_match_between_encodings()
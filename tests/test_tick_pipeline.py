@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test script for the staged tick pipeline (bounded queues, policies, partitioning)
+"""
+
+import asyncio
+import os
+import sys
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline import Pipeline, QueuePolicy, Stage
+
+
+def test_partitioned_stage_keeps_per_key_order():
+    """Items sharing a partition key are handled in arrival order"""
+    print("=== Testing per-symbol ordering ===")
+    seen = {}
+
+    async def handler(batch):
+        for symbol, seq in batch:
+            seen.setdefault(symbol, []).append(seq)
+            await asyncio.sleep(0)
+
+    async def run():
+        stage = Stage("matching", handler, maxsize=10, concurrency=4, batch_size=3,
+                      partition_key=lambda item: item[0])
+        pipeline = Pipeline([stage])
+        pipeline.start()
+        for seq in range(50):
+            for symbol in ("NIFTY", "CE100", "PE100", "CE200", "PE200"):
+                await stage.put((symbol, seq))
+        await pipeline.join()
+        await pipeline.stop()
+        return stage.stats()
+
+    stats = asyncio.run(run())
+    assert all(seqs == list(range(50)) for seqs in seen.values())
+    assert stats["processed"] == 250 and stats["dropped"] == 0
+    print("✅ Per-symbol order preserved across partitioned workers")
+
+
+def test_drop_policies():
+    """Full queues drop instead of blocking the producer"""
+    print("=== Testing drop policies ===")
+
+    async def run(policy):
+        handled = []
+        release = asyncio.Event()
+
+        async def handler(batch):
+            await release.wait()
+            handled.extend(batch)
+
+        stage = Stage("fanout", handler, maxsize=2, policy=policy)
+        stage.start()
+        await stage.put(0)
+        await asyncio.sleep(0)  # worker takes item 0 and waits
+        for item in range(1, 6):
+            await stage.put(item)
+        release.set()
+        await stage.join()
+        await stage.stop()
+        return handled, stage.dropped
+
+    handled, dropped = asyncio.run(run(QueuePolicy.DROP_OLDEST))
+    assert handled == [0, 4, 5] and dropped == 3
+    handled, dropped = asyncio.run(run(QueuePolicy.DROP_NEWEST))
+    assert handled == [0, 1, 2] and dropped == 3
+    print("✅ Drop policies applied")
+
+
+if __name__ == "__main__":
+    test_partitioned_stage_keeps_per_key_order()
+    test_drop_policies()
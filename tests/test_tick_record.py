@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Test script for the hot-path tick record
+"""
+
+import json
+import os
+import sys
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import OptionTickData
+from ticks import TickRecord
+
+
+def test_record_matches_pydantic_tick():
+    """A TickRecord serializes to the same payload as the pydantic model path"""
+    print("=== Testing tick record payload ===")
+    doc = {"ft": 1752810305, "token": 43512, "e": "NFO", "lp": 101, "pc": 0.5,
+           "rt": "2025-07-18 09:15:05", "ts": "NIFTY24JUL25000CE"}
+    expected = OptionTickData(**doc).dict()
+    expected["data_type"] = "optiontick"
+
+    record = TickRecord.from_doc(doc, "optiontick")
+    assert json.loads(record.json) == expected
+    assert isinstance(record.lp, float)
+    print("✅ Payload matches OptionTickData")
+
+
+def test_record_encodes_once():
+    """Every consumer gets the same encoded string"""
+    record = TickRecord.from_doc({"ft": 1, "token": 26000, "lp": 25000.0, "ts": "Nifty 50"}, "indextick")
+    assert record.json is record.json
+    print("✅ JSON encoded once")
+
+
+if __name__ == "__main__":
+    test_record_matches_pydantic_tick()
+    test_record_encodes_once()
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Test script for the batched Redis tick writer
+"""
+
+import asyncio
+import os
+import sys
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tick_store import RedisStreamTickWriter, RedisTickWriter, create_tick_writer
+from ticks import TickRecord
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def lpush(self, key, *values):
+        self.commands.append(("lpush", key, values))
+
+    def lrange(self, key, start, end):
+        self.commands.append(("lrange", key, start, end))
+
+    def xdel(self, key, *entry_ids):
+        self.commands.append(("xdel", key, entry_ids))
+
+    def ltrim(self, key, start, end):
+        self.commands.append(("ltrim", key, start, end))
+
+    def sadd(self, key, *members):
+        self.commands.append(("sadd", key, members))
+
+    def xadd(self, key, fields, id="*", maxlen=None, approximate=True):
+        self.commands.append(("xadd", key, fields, id, maxlen))
+
+    def xrevrange(self, key, max="+", min="-", count=None):
+        self.commands.append(("xrevrange", key, max, min, count))
+
+    async def execute(self):
+        self.redis.round_trips += 1
+        self.redis.commands.extend(self.commands)
+        results = []
+        for command in self.commands:
+            if command[0] == "xrevrange":
+                results.append(self.redis.range_entries(*command[1:]))
+            if command[0] == "lpush":
+                self.redis.lists[command[1]] = list(reversed(command[2])) + self.redis.lists.get(command[1], [])
+            if command[0] == "ltrim":
+                values = self.redis.lists.get(command[1], [])
+                self.redis.lists[command[1]] = values[command[2]:None if command[3] == -1 else command[3] + 1]
+            if command[0] == "lrange":
+                values = self.redis.lists.get(command[1], [])
+                results.append(values[command[2]:None if command[3] == -1 else command[3] + 1])
+            if command[0] == "xdel":
+                self.redis.streams[command[1]] = [e for e in self.redis.streams[command[1]] if e[0] not in command[2]]
+            if command[0] == "sadd":
+                self.redis.sets.setdefault(command[1], set()).update(str(m) for m in command[2])
+            if command[0] == "xadd":
+                self.redis.streams.setdefault(command[1], []).append((command[3], command[2]))
+        return results
+
+
+class FakeRedis:
+    def __init__(self):
+        self.round_trips = 0
+        self.commands = []
+        self.streams = {}
+        self.sets = {}
+        self.lists = {}
+
+    def pipeline(self, transaction=False):
+        return FakePipeline(self)
+
+    async def xrevrange(self, key, max="+", min="-", count=None):
+        return self.range_entries(key, max, min, count)
+
+    async def lrange(self, key, start, end):
+        return self.lists.get(key, [])[start:None if end == -1 else end + 1]
+
+    def range_entries(self, key, max="+", min="-", count=None):
+        def millis(entry_id):
+            return int(entry_id.split("-")[0])
+
+        entries = [e for e in reversed(self.streams.get(key, []))
+                   if (max == "+" or millis(e[0]) <= int(max)) and (min == "-" or millis(e[0]) >= int(min))]
+        return entries[:count] if count else entries
+
+    async def smembers(self, key):
+        return set(self.sets.get(key, set()))
+
+    async def scan_iter(self, match=None, count=None):
+        keys = list(self.sets) + list(self.streams)
+        for key in keys:
+            if key.startswith(match.rstrip("*")):
+                yield key
+
+    async def unlink(self, *keys):
+        removed = 0
+        for key in keys:
+            removed += (self.sets.pop(key, None) is not None) + (self.streams.pop(key, None) is not None)
+        return removed
+
+
+def frame_ticks():
+    ticks = [TickRecord.from_doc({"ft": 1, "token": 26000, "lp": 25000.0, "ts": "Nifty 50"}, "indextick")]
+    for token in (101, 102):
+        for ft in (1, 2):
+            ticks.append(TickRecord.from_doc({"ft": ft, "token": token, "lp": 100.0 + ft}, "optiontick"))
+    return ticks
+
+
+def test_batch_is_one_round_trip():
+    """A frame is written with one LPUSH and one LTRIM per key in a single round-trip"""
+    print("=== Testing batched tick writes ===")
+    redis = FakeRedis()
+    loads = []
+
+    async def max_ticks():
+        loads.append(1)
+        return 1000
+
+    writer = RedisTickWriter(redis, max_ticks)
+
+    async def run():
+        await writer.write(frame_ticks(), "N_20250718")
+        await writer.write(frame_ticks(), "N_20250718")
+
+    asyncio.run(run())
+    assert redis.round_trips == 2
+    assert len(loads) == 1  # list length is cached between writes
+    first_batch = redis.commands[:6]
+    assert [c[0] for c in first_batch] == ["lpush", "ltrim"] * 3
+    option_push = [c for c in first_batch if c[1] == "ticks:N_20250718:optiontick:101"][0]
+    assert [v.count('"ft": 2') for v in option_push[2]] == [0, 1]  # oldest first, newest ends at the head
+    assert writer.stats()["avg_batch"] == 5
+    print("✅ One pipelined round-trip per batch")
+
+
+def test_batch_keeps_only_max_ticks():
+    """Only the newest max_ticks values of a key are pushed"""
+    redis = FakeRedis()
+
+    async def max_ticks():
+        return 1
+
+    writer = RedisTickWriter(redis, max_ticks)
+    asyncio.run(writer.write(frame_ticks(), "N_20250718"))
+    option_push = [c for c in redis.commands if c[0] == "lpush" and c[1].endswith(":101")][0]
+    assert len(option_push[2]) == 1 and '"ft": 2' in option_push[2][0]
+    print("✅ Batch trimmed to max ticks")
+
+
+def test_stream_backend_encodes_ft_in_ids():
+    """Stream entries carry the feed time in their ID and read back newest first by ft window"""
+    print("=== Testing stream tick backend ===")
+    redis = FakeRedis()
+
+    async def max_ticks():
+        return 1000
+
+    writer = create_tick_writer("stream", redis, max_ticks)
+    assert isinstance(writer, RedisStreamTickWriter)
+    key = "ticks:N_20250718:optiontick:101"
+
+    async def run():
+        await writer.write(frame_ticks(), "N_20250718")
+        # Same ft continues the sequence, an older ft is skipped
+        await writer.write([TickRecord.from_doc({"ft": 2, "token": 101, "lp": 99.0}, "optiontick"),
+                            TickRecord.from_doc({"ft": 1, "token": 101, "lp": 98.0}, "optiontick")],
+                           "N_20250718")
+        return await writer.read_latest(key, 2), await writer.read_range(key, 1, 1)
+
+    latest, window = asyncio.run(run())
+    assert redis.round_trips == 2
+    assert [e[0] for e in redis.streams[key]] == ["1000-0", "2000-0", "2000-1"]
+    assert all(c[4] == 1000 for c in redis.commands if c[0] == "xadd")  # MAXLEN trimming on every XADD
+    assert ['"lp": 99.0' in v for v in latest] == [True, False]
+    assert len(window) == 1 and '"ft": 1' in window[0]
+    assert writer.stats()["out_of_order"] == 1
+
+    writer.forget("N_20250718")
+    asyncio.run(writer.write([TickRecord.from_doc({"ft": 1, "token": 101}, "optiontick")], "N_20250718"))
+    assert redis.streams[key][-1][0] == "1000-0"
+    print("✅ Stream IDs follow ft and ranges read by ft")
+
+
+def test_token_registry_and_flush():
+    """Option tokens are registered once on write and a flush unlinks only that database"""
+    print("=== Testing token registry and flush ===")
+    redis = FakeRedis()
+
+    async def max_ticks():
+        return 1000
+
+    writer = create_tick_writer("stream", redis, max_ticks)
+
+    async def run():
+        await writer.write(frame_ticks(), "N_20250718")
+        await writer.write(frame_ticks()[1:], "N_20250718")
+        await writer.write(frame_ticks(), "N_20250719")
+        tokens = await writer.option_tokens("N_20250718")
+        removed = await writer.flush("N_20250718")
+        return tokens, removed, await writer.option_tokens("N_20250718")
+
+    tokens, removed, after = asyncio.run(run())
+    assert tokens == ["101", "102"]
+    assert len([c for c in redis.commands if c[0] == "sadd" and "N_20250718" in c[1]]) == 1
+    assert removed == 4  # index stream, two option streams and the registry
+    assert after == [] and "ticks:N_20250719:tokens" in redis.sets
+    print("✅ Tokens listed from the registry and flush scoped to one database")
+
+
+def test_multi_token_read_merges_newest():
+    """All token streams are read in one round-trip and heap-merged newest first"""
+    print("=== Testing multi-token merge ===")
+    redis = FakeRedis()
+
+    async def max_ticks():
+        return 1000
+
+    writer = create_tick_writer("stream", redis, max_ticks)
+    keys = ["ticks:N_20250718:optiontick:101", "ticks:N_20250718:optiontick:102"]
+
+    async def run():
+        await writer.write([TickRecord.from_doc({"ft": ft, "token": token, "lp": float(ft)}, "optiontick")
+                            for ft in range(1, 6) for token in ((101,) if ft % 2 else (102,))],
+                           "N_20250718")
+        trips = redis.round_trips
+        value_lists = await writer.read_many(keys, limit=3)
+        return redis.round_trips - trips, value_lists
+
+    trips, value_lists = asyncio.run(run())
+    assert trips == 1
+    merged = writer.merge_newest(value_lists, 3)
+    assert [writer.codec.ft_of(v) for v in merged] == [5, 4, 3]
+    assert [writer.codec.ft_of(v) for v in writer.merge_newest([[], value_lists[1]])] == [4, 2]
+    print("✅ Latest ticks of all tokens merged in one round-trip")
+
+
+def test_trim_after_checkpoint():
+    """Resuming from a checkpoint removes the ticks stored after it, and a restarted stream writer continues"""
+    print("=== Testing resume trimming ===")
+
+    async def max_ticks():
+        return 1000
+
+    def ticks(fts):
+        return [TickRecord.from_doc({"ft": ft, "token": token, "lp": 100.0 + ft}, "optiontick")
+                for ft in fts for token in (101, 102)]
+
+    for backend in ("list", "stream"):
+        redis = FakeRedis()
+        key = "ticks:N_20250718:optiontick:101"
+
+        async def run():
+            await create_tick_writer(backend, redis, max_ticks).write(ticks(range(1, 6)), "N_20250718")
+            # Restarted process; the checkpoint was saved at ft 3
+            writer = create_tick_writer(backend, redis, max_ticks)
+            removed = await writer.trim_after("N_20250718", 3)
+            await writer.write(ticks([4, 5]), "N_20250718")
+            return writer, removed, await writer.read_latest(key)
+
+        writer, removed, values = asyncio.run(run())
+        assert removed == 4  # ft 4 and 5 of both tokens
+        assert [writer.codec.ft_of(v) for v in values] == [5, 4, 3, 2, 1], backend
+        if backend == "stream":
+            assert writer.stats()["out_of_order"] == 0
+            assert [e[0] for e in redis.streams[key]][-2:] == ["4000-0", "5000-0"]
+    print("✅ Ticks after the checkpoint replaced, not duplicated")
+
+
+def test_unknown_backend_rejected():
+    try:
+        create_tick_writer("hash", FakeRedis(), None)
+    except ValueError:
+        print("✅ Unknown backend rejected")
+        return
+    raise AssertionError("expected ValueError")
+
+
+if __name__ == "__main__":
+    test_batch_is_one_round_trip()
+    test_batch_keeps_only_max_ticks()
+    test_stream_backend_encodes_ft_in_ids()
+    test_token_registry_and_flush()
+    test_multi_token_read_merges_newest()
+    test_trim_after_checkpoint()
+    test_unknown_backend_rejected()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test script for the per-option-token indicator bank
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indicators import EMA
+from tick_codec import ARRAY_DTYPE
+from ticks import TickRecord
+from token_indicators import TokenIndicatorBank
+
+
+def option_ticks(frames: int, tokens=(101, 102, 103)):
+    ticks = []
+    for ft in range(1, frames + 1):
+        ticks.append(TickRecord.from_doc({"ft": ft, "token": 26000, "lp": 25000.0 + ft}, "indextick"))
+        for i, token in enumerate(tokens):
+            # Token 103 only trades on even frames
+            if token == 103 and ft % 2:
+                continue
+            ticks.append(TickRecord.from_doc({"ft": ft, "token": token, "lp": 100.0 + i * 10 + (ft * 7 % 5)}, "optiontick"))
+    return ticks
+
+
+def test_frame_updates_match_scalar_indicators():
+    """Vectorized per-token EMAs and rolling stats match per-token recomputation"""
+    print("=== Testing per-token indicators ===")
+    ticks = option_ticks(30)
+    bank = TokenIndicatorBank((3, 9), window=5, capacity=2)
+    bank.update(ticks)
+
+    assert bank.frames == 30 and bank.stats()["capacity"] == 4  # grown past the initial capacity
+    values = bank.values()
+    for token in (101, 102, 103):
+        prices = [t.lp for t in ticks if t.token == token]
+        expected = {}
+        for period in (3, 9):
+            ema = EMA(period)
+            for price in prices:
+                ema.update(price)
+            expected[str(period)] = round(ema.value, 2)
+        assert values[str(token)]["ema"] == expected
+        assert values[str(token)]["ticks"] == len(prices)
+        assert values[str(token)]["mean"] == round(float(np.mean(prices[-5:])), 2)
+        assert values[str(token)]["min"] == min(prices[-5:]) and values[str(token)]["max"] == max(prices[-5:])
+        assert values[str(token)]["change"] == prices[-1] - prices[-2]
+    assert "26000" not in values  # index ticks are not option tokens
+    assert bank.values(["999"]) == {"999": None}
+    print("✅ Per-token indicators match recomputation")
+
+
+def test_partial_window_and_state_round_trip():
+    """A token with fewer ticks than the window only counts its own prices, also after a checkpoint"""
+    bank = TokenIndicatorBank((3,), window=5)
+    bank.update(option_ticks(4))
+    restored = TokenIndicatorBank.from_state(json.loads(json.dumps(bank.state())))
+    assert restored.values() == bank.values()
+    assert restored.values(["103"])["103"]["window"] == 2
+
+    more = option_ticks(8)[len(option_ticks(4)):]
+    bank.update(more)
+    restored.update(more)
+    assert restored.values() == bank.values()
+    print("✅ Partial windows and checkpoint state round-trip")
+
+
+def test_stored_arrays_replay_by_frame():
+    """Stored ticks read from Redis (newest first, per token) replay in ft order"""
+    ticks = [t for t in option_ticks(10) if t.data_type == "optiontick"]
+    live = TokenIndicatorBank((3, 9), window=5)
+    live.update(ticks)
+
+    arrays = []
+    for token in (101, 102, 103):
+        rows = [(t.ft, t.token, t.lp, t.pc) for t in reversed(ticks) if t.token == token]
+        arrays.append(np.array(rows, dtype=ARRAY_DTYPE))
+    stored = TokenIndicatorBank((3, 9), window=5)
+    stored.update_array(arrays)
+    assert stored.values().keys() == live.values().keys()
+    for token, value in live.values().items():
+        assert stored.values()[token] == value
+    print("✅ Stored ticks replay into the same indicators")
+
+
+if __name__ == "__main__":
+    test_frame_updates_match_scalar_indicators()
+    test_partial_window_and_state_round_trip()
+    test_stored_arrays_replay_by_frame()
@@ -0,0 +1,149 @@
+"""In-process ring buffers of the latest ticks of each Redis tick key.
+
+The process that replays a run writes every tick to Redis and, through the
+tick pipeline, to a ``TickRing`` per key here. EMA calculation, strategy
+market data and ``/api/redis-ticks`` read the ring instead of fetching and
+decoding the same ticks from Redis.
+
+Each ring stores every value twice (at ``i`` and ``i + capacity``), so the
+latest N ticks are always one contiguous slice: reads are zero-copy numpy
+views, oldest first. A database is *complete* once its replay started fresh
+in this process; only then is a missing key or a short ring a real answer.
+Otherwise (resumed runs, runs replayed by another worker) a read that the
+rings cannot fully answer returns None and the caller falls back to Redis.
+"""
+import heapq
+from itertools import islice
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from ticks import TickRecord
+
+RING_DTYPE = np.dtype([("ft", "<i8"), ("lp", "<f8"), ("pc", "<f8")])
+
+
+class TickRing:
+    __slots__ = ("capacity", "values", "records", "_next", "count")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.values = np.zeros(2 * capacity, dtype=RING_DTYPE)
+        self.records = np.empty(2 * capacity, dtype=object)
+        # Slot of the next write and number of ticks held (at most capacity)
+        self._next = 0
+        self.count = 0
+
+    def append(self, tick: TickRecord):
+        slot = self._next
+        row = (tick.ft, tick.lp, tick.pc)
+        self.values[slot] = row
+        self.values[slot + self.capacity] = row
+        self.records[slot] = tick
+        self.records[slot + self.capacity] = tick
+        self._next = (slot + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def _window(self, limit: Optional[int]) -> slice:
+        size = self.count if limit is None else min(limit, self.count)
+        end = self._next + self.capacity
+        return slice(end - size, end)
+
+    def latest_values(self, limit: Optional[int] = None) -> np.ndarray:
+        """View of the latest (ft, lp, pc) rows, oldest first"""
+        return self.values[self._window(limit)]
+
+    def latest_records(self, limit: Optional[int] = None) -> np.ndarray:
+        """View of the latest TickRecords, oldest first"""
+        return self.records[self._window(limit)]
+
+    def resized(self, capacity: int) -> "TickRing":
+        ring = TickRing(capacity)
+        for tick in self.latest_records(capacity):
+            ring.append(tick)
+        return ring
+
+
+class TickCache:
+    def __init__(self):
+        # Redis tick key -> ring, and database -> its keys
+        self._rings: Dict[str, TickRing] = {}
+        self._keys: Dict[str, set] = {}
+        # Databases whose every tick since the last flush went through this cache
+        self._complete: set = set()
+        self.hits = 0
+        self.misses = 0
+
+    def reset(self, database_name: str, complete: bool = False):
+        """Drop a database's rings; complete means its replay starts from an empty Redis in this process"""
+        for redis_key in self._keys.pop(database_name, ()):
+            self._rings.pop(redis_key, None)
+        if complete:
+            self._complete.add(database_name)
+        else:
+            self._complete.discard(database_name)
+
+    def append(self, database_name: str, keyed_ticks: Iterable[tuple], capacity: int):
+        """Add (redis key, tick) pairs, oldest first, keeping the latest capacity ticks per key"""
+        keys = self._keys.setdefault(database_name, set())
+        for redis_key, tick in keyed_ticks:
+            ring = self._rings.get(redis_key)
+            if ring is None:
+                ring = self._rings[redis_key] = TickRing(capacity)
+                keys.add(redis_key)
+            elif ring.capacity != capacity:
+                ring = self._rings[redis_key] = ring.resized(capacity)
+            ring.append(tick)
+
+    def _ring(self, database_name: str, redis_key: str, limit: Optional[int]) -> Optional[TickRing]:
+        """Ring able to answer a read of limit ticks, None when Redis must be read"""
+        ring = self._rings.get(redis_key)
+        if database_name in self._complete:
+            return ring or TickRing(1)
+        if ring is None or limit is None or ring.count < limit:
+            return None
+        return ring
+
+    def latest_values(self, database_name: str, redis_key: str, limit: Optional[int] = None) -> Optional[np.ndarray]:
+        """Latest (ft, lp, pc) rows of a key as a view, oldest first, or None on a miss"""
+        ring = self._ring(database_name, redis_key, limit)
+        if ring is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return ring.latest_values(limit)
+
+    def latest_records(self, database_name: str, redis_keys: List[str], limit: Optional[int] = None,
+                       start_ft: Optional[int] = None, end_ft: Optional[int] = None) -> Optional[List[TickRecord]]:
+        """Latest TickRecords of the keys (within an ft window), newest first, or None on a miss"""
+        ranged = start_ft is not None or end_ft is not None
+        per_key = []
+        for redis_key in redis_keys:
+            # A window may reach back past the ring, which only a complete database can rule out
+            ring = self._ring(database_name, redis_key, None if ranged else limit)
+            if ring is None:
+                self.misses += 1
+                return None
+            records = ring.latest_records()
+            if ranged:
+                fts = ring.latest_values()["ft"]
+                low = 0 if start_ft is None else int(np.searchsorted(fts, start_ft, side="left"))
+                high = len(fts) if end_ft is None else int(np.searchsorted(fts, end_ft, side="right"))
+                records = records[low:high]
+            per_key.append(records[::-1])
+        self.hits += 1
+        if len(per_key) == 1:
+            return list(per_key[0][:limit] if limit else per_key[0])
+        merged = heapq.merge(*per_key, key=lambda tick: tick.ft, reverse=True)
+        return list(islice(merged, limit) if limit else merged)
+
+    def keys(self, database_name: str, prefix: str) -> Optional[List[str]]:
+        """Cached keys of a complete database starting with prefix, None when the cache may lack keys"""
+        if database_name not in self._complete:
+            return None
+        return sorted(k for k in self._keys.get(database_name, ()) if k.startswith(prefix))
+
+    def stats(self) -> dict:
+        return {"keys": len(self._rings), "complete_databases": sorted(self._complete),
+                "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,171 @@
+"""Encodings of ticks stored in Redis.
+
+``json`` keeps the readable JSON of each tick (~200 bytes). ``binary`` packs a
+tick into a fixed-width 49-byte record::
+
+    ft int64 | token uint32 | lp float64 | pc float64 | symbol uint16 | rt 19 bytes
+
+The exchange and trading symbol of a tick are stored once per run database in
+the hash ``ticks:{database}:symbols`` and referenced by a symbol id. Binary
+values are read with ``numpy.frombuffer`` straight into a structured array, so
+readers such as the EMA calculation never parse JSON. The binary encoding
+needs a Redis client created with ``decode_responses=False``.
+"""
+import json
+import struct
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ticks import TickRecord
+
+TICK_ENCODINGS = ("json", "binary")
+
+# Little-endian, unpadded; must match TICK_DTYPE
+TICK_STRUCT = struct.Struct("<qIddH19s")
+
+TICK_DTYPE = np.dtype([("ft", "<i8"), ("token", "<u4"), ("lp", "<f8"), ("pc", "<f8"),
+                       ("symbol", "<u2"), ("rt", "S19")])
+
+# Numeric columns returned by read_array for both encodings
+ARRAY_DTYPE = np.dtype([("ft", "<i8"), ("token", "<u4"), ("lp", "<f8"), ("pc", "<f8")])
+
+# Field of the symbol hash holding the last assigned id
+NEXT_SYMBOL_FIELD = "__next__"
+
+
+def symbols_key(database_name: str) -> str:
+    return f"ticks:{database_name}:symbols"
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class JsonTickCodec:
+    name = "json"
+    binary = False
+
+    async def prepare(self, redis, database_name: str, ticks: List[TickRecord]):
+        """Resolve anything encode() needs before a batch is written"""
+
+    def encode(self, database_name: str, tick: TickRecord):
+        return tick.json
+
+    def ft_of(self, value) -> int:
+        # TickRecord JSON starts with the feed time; avoid parsing the whole tick
+        if value.startswith('{"ft": '):
+            end = value.find(",", 7)
+            if end > 0:
+                return int(value[7:end])
+        return json.loads(value).get("ft", 0)
+
+    async def decode(self, redis, database_name: str, values: list, data_type: str) -> List[dict]:
+        ticks = []
+        for value in values:
+            try:
+                ticks.append(json.loads(value))
+            except json.JSONDecodeError:
+                continue
+        return ticks
+
+    async def to_array(self, redis, database_name: str, values: list) -> np.ndarray:
+        rows = []
+        for value in values:
+            try:
+                tick = json.loads(value)
+            except json.JSONDecodeError:
+                continue
+            rows.append((tick.get("ft", 0), tick.get("token", 0), tick.get("lp", 0.0), tick.get("pc", 0.0)))
+        return np.array(rows, dtype=ARRAY_DTYPE)
+
+    def forget(self, database_name: str):
+        """Drop cached state of a database whose keys were deleted"""
+
+
+class BinaryTickCodec(JsonTickCodec):
+    name = "binary"
+    binary = True
+
+    def __init__(self):
+        # database -> (exchange, trading symbol) -> id, and the reverse
+        self._ids: Dict[str, Dict[Tuple[str, str], int]] = {}
+        self._symbols: Dict[str, Dict[int, Tuple[str, str]]] = {}
+
+    async def _symbol_id(self, redis, database_name: str, symbol: Tuple[str, str]) -> int:
+        key = symbols_key(database_name)
+        field = json.dumps(list(symbol))
+        symbol_id = await redis.hget(key, field)
+        if symbol_id is None:
+            # Another writer may assign the same symbol concurrently; HSETNX keeps the first id
+            candidate = await redis.hincrby(key, NEXT_SYMBOL_FIELD, 1)
+            if candidate > 0xFFFF:
+                raise ValueError(f"Symbol table of {database_name} is full")
+            if await redis.hsetnx(key, field, candidate):
+                await redis.hset(key, str(candidate), field)
+                symbol_id = candidate
+            else:
+                symbol_id = await redis.hget(key, field)
+        return int(symbol_id)
+
+    async def prepare(self, redis, database_name: str, ticks: List[TickRecord]):
+        ids = self._ids.setdefault(database_name, {})
+        symbols = self._symbols.setdefault(database_name, {})
+        for tick in ticks:
+            symbol = (tick.e, tick.ts)
+            if symbol not in ids:
+                symbol_id = await self._symbol_id(redis, database_name, symbol)
+                ids[symbol] = symbol_id
+                symbols[symbol_id] = symbol
+
+    def encode(self, database_name: str, tick: TickRecord) -> bytes:
+        symbol_id = self._ids[database_name][(tick.e, tick.ts)]
+        return TICK_STRUCT.pack(tick.ft, tick.token, tick.lp, tick.pc, symbol_id, tick.rt.encode()[:19])
+
+    def ft_of(self, value) -> int:
+        return TICK_STRUCT.unpack_from(value)[0]
+
+    def _records(self, values: list) -> np.ndarray:
+        values = [v for v in values if len(v) == TICK_STRUCT.size]
+        return np.frombuffer(b"".join(values), dtype=TICK_DTYPE)
+
+    async def _load_symbols(self, redis, database_name: str) -> Dict[int, Tuple[str, str]]:
+        symbols = self._symbols.setdefault(database_name, {})
+        ids = self._ids.setdefault(database_name, {})
+        for field, value in (await redis.hgetall(symbols_key(database_name))).items():
+            field = _text(field)
+            if field.isdigit():
+                symbol = tuple(json.loads(_text(value)))
+                symbols[int(field)] = symbol
+                ids[symbol] = int(field)
+        return symbols
+
+    async def decode(self, redis, database_name: str, values: list, data_type: str) -> List[dict]:
+        records = self._records(values)
+        symbols = self._symbols.get(database_name, {})
+        if any(int(s) not in symbols for s in np.unique(records["symbol"])):
+            symbols = await self._load_symbols(redis, database_name)
+        ticks = []
+        for ft, token, lp, pc, symbol_id, rt in records.tolist():
+            exchange, trading_symbol = symbols.get(symbol_id, ("", ""))
+            ticks.append({"ft": ft, "token": token, "e": exchange, "lp": lp, "pc": pc,
+                          "rt": rt.decode(errors="replace"), "ts": trading_symbol, "data_type": data_type})
+        return ticks
+
+    async def to_array(self, redis, database_name: str, values: list) -> np.ndarray:
+        records = self._records(values)
+        array = np.empty(len(records), dtype=ARRAY_DTYPE)
+        for name in ARRAY_DTYPE.names:
+            array[name] = records[name]
+        return array
+
+    def forget(self, database_name: str):
+        self._ids.pop(database_name, None)
+        self._symbols.pop(database_name, None)
+
+
+def create_tick_codec(encoding: str) -> JsonTickCodec:
+    """Codec for REDIS_TICK_ENCODING ("json" or "binary")"""
+    if encoding not in TICK_ENCODINGS:
+        raise ValueError(f"Unknown Redis tick encoding '{encoding}', expected one of {TICK_ENCODINGS}")
+    return BinaryTickCodec() if encoding == "binary" else JsonTickCodec()
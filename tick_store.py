@@ -0,0 +1,380 @@
+"""Batched Redis storage for ticks.
+
+Ticks are kept in ``ticks:{database}:indextick`` and
+``ticks:{database}:optiontick:{token}``. A batch is written in one pipelined
+round-trip instead of an awaited command per tick.
+
+Two backends share that layout (REDIS_TICK_BACKEND):
+
+* ``list`` - encoded ticks newest first; a batch is one LPUSH with all values
+  of a key followed by one LTRIM.
+* ``stream`` - Redis Streams; XADD with approximate MAXLEN and the feed time
+  encoded in the entry ID (``{ft * 1000}-{seq}``), so a time window is an
+  XRANGE/XREVRANGE.
+
+Both return ticks newest first, so readers never sort on the client. The
+option tokens of a database are registered in the set ``ticks:{database}:tokens``
+as they are written, so listing tokens never scans the keyspace; a flush walks
+the database's keys with SCAN and removes them with UNLINK. Values
+are encoded by a ``tick_codec`` codec (REDIS_TICK_ENCODING).
+"""
+import heapq
+import time
+from itertools import islice
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from tick_codec import JsonTickCodec
+from ticks import TickRecord
+
+# Seconds a loaded list length (REDIS_LONG_TICK_LENGTH) is reused before reloading
+MAX_TICKS_REFRESH_SECONDS = 30.0
+
+# Keys unlinked per command when flushing a database
+FLUSH_BATCH_SIZE = 500
+
+
+def index_key(database_name: str) -> str:
+    return f"ticks:{database_name}:indextick"
+
+
+def option_key(database_name: str, token) -> str:
+    return f"ticks:{database_name}:optiontick:{token}"
+
+
+def tokens_key(database_name: str) -> str:
+    return f"ticks:{database_name}:tokens"
+
+
+def tick_key(database_name: str, tick: TickRecord) -> str:
+    if tick.data_type == "indextick":
+        return index_key(database_name)
+    return option_key(database_name, tick.token)
+
+
+TICK_BACKENDS = ("list", "stream")
+
+# Field holding the encoded tick in a stream entry
+STREAM_FIELD = "t"
+
+
+def stream_id_bound(ft: Optional[int], default: str) -> str:
+    """XRANGE bound covering every entry of a feed time (incomplete IDs match all sequences)"""
+    return default if ft is None else str(int(ft) * 1000)
+
+
+class RedisTickWriter:
+    """List backend: newest tick at the head of each list"""
+
+    backend = "list"
+
+    def __init__(self, redis_client, max_ticks_loader: Callable[[], Awaitable[int]],
+                 transaction: bool = False, codec: Optional[JsonTickCodec] = None):
+        self.redis = redis_client
+        self.max_ticks_loader = max_ticks_loader
+        self.codec = codec or JsonTickCodec()
+        # MULTI/EXEC makes a batch visible to readers all at once
+        self.transaction = transaction
+        self._max_ticks: Optional[int] = None
+        self._max_ticks_loaded_at = 0.0
+        # database -> option tokens already added to its registry set
+        self._registered: Dict[str, set] = {}
+        self.batches = 0
+        self.ticks = 0
+        self.commands = 0
+        self.max_batch = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.last_seconds = 0.0
+        self.errors = 0
+
+    async def max_ticks(self) -> int:
+        now = time.monotonic()
+        if self._max_ticks is None or now - self._max_ticks_loaded_at > MAX_TICKS_REFRESH_SECONDS:
+            self._max_ticks = await self.max_ticks_loader()
+            self._max_ticks_loaded_at = now
+        return self._max_ticks
+
+    def invalidate(self):
+        """Reload the list length on the next write"""
+        self._max_ticks = None
+
+    async def write(self, ticks: List[TickRecord], database_name: str, max_ticks: Optional[int] = None):
+        """Store ticks (oldest first) for every key in a single round-trip"""
+        if not ticks:
+            return
+        if max_ticks is None:
+            max_ticks = await self.max_ticks()
+        ticks_by_key: Dict[str, List[TickRecord]] = {}
+        for tick in ticks:
+            ticks_by_key.setdefault(tick_key(database_name, tick), []).append(tick)
+        registered = self._registered.setdefault(database_name, set())
+        new_tokens = {tick.token for tick in ticks if tick.data_type != "indextick"} - registered
+
+        started = time.perf_counter()
+        commands = 0
+        try:
+            await self.codec.prepare(self.redis, database_name, ticks)
+            async with self.redis.pipeline(transaction=self.transaction) as pipe:
+                for redis_key, key_ticks in ticks_by_key.items():
+                    commands += self._queue_writes(pipe, database_name, redis_key, key_ticks, max_ticks)
+                if new_tokens:
+                    pipe.sadd(tokens_key(database_name), *new_tokens)
+                    commands += 1
+                if commands:
+                    await pipe.execute()
+            registered.update(new_tokens)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.batches += 1
+            self.ticks += len(ticks)
+            self.commands += commands
+            self.max_batch = max(self.max_batch, len(ticks))
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+            self.last_seconds = elapsed
+
+    def _queue_writes(self, pipe, database_name: str, redis_key: str, ticks: List[TickRecord],
+                      max_ticks: int) -> int:
+        # LPUSH of oldest-first values leaves the newest tick at the head
+        encode = self.codec.encode
+        pipe.lpush(redis_key, *[encode(database_name, tick) for tick in ticks[-max_ticks:]])
+        pipe.ltrim(redis_key, 0, max_ticks - 1)
+        return 2
+
+    def forget(self, database_name: str):
+        """Drop per-key write state of a database whose keys were deleted"""
+        self._registered.pop(database_name, None)
+        self.codec.forget(database_name)
+
+    async def option_tokens(self, database_name: str) -> List[str]:
+        """Option tokens with ticks in Redis, from the registry set"""
+        members = await self.redis.smembers(tokens_key(database_name))
+        tokens = [m.decode() if isinstance(m, bytes) else m for m in members]
+        return sorted(tokens, key=lambda t: int(t) if t.isdigit() else 0)
+
+    async def flush(self, database_name: str) -> int:
+        """Remove every key of a database with SCAN and UNLINK; returns the number of keys removed"""
+        removed = 0
+        batch = []
+        async for redis_key in self.redis.scan_iter(match=f"ticks:{database_name}:*", count=FLUSH_BATCH_SIZE):
+            batch.append(redis_key)
+            if len(batch) >= FLUSH_BATCH_SIZE:
+                removed += await self.redis.unlink(*batch)
+                batch = []
+        if batch:
+            removed += await self.redis.unlink(*batch)
+        self.forget(database_name)
+        return removed
+
+    async def _database_keys(self, database_name: str) -> List[str]:
+        return [index_key(database_name)] + [option_key(database_name, token)
+                                             for token in await self.option_tokens(database_name)]
+
+    async def trim_after(self, database_name: str, ft: int) -> int:
+        """Remove the ticks newer than ft, e.g. stored after the checkpoint a run resumes from"""
+        redis_keys = await self._database_keys(database_name)
+        value_lists = await self.read_many(redis_keys)
+        removed = 0
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for redis_key, values in zip(redis_keys, value_lists):
+                # Newest first: drop the head of the list up to the first tick at or before ft
+                newer = 0
+                for value in values:
+                    if self.codec.ft_of(value) <= ft:
+                        break
+                    newer += 1
+                if newer:
+                    pipe.ltrim(redis_key, newer, -1)
+                    removed += newer
+            if removed:
+                await pipe.execute()
+        return removed
+
+    async def decode(self, database_name: str, values: list, data_type: str) -> List[dict]:
+        """Tick dicts of values returned by read_latest/read_range"""
+        return await self.codec.decode(self.redis, database_name, values, data_type)
+
+    async def read_array(self, database_name: str, redis_key: str, limit: Optional[int] = None):
+        """Numeric columns (ft, token, lp, pc) of a key as a numpy structured array, newest first"""
+        return await self.codec.to_array(self.redis, database_name, await self.read_latest(redis_key, limit))
+
+    async def read_latest(self, redis_key: str, limit: Optional[int] = None) -> list:
+        """Encoded ticks of a key, newest first"""
+        return await self.redis.lrange(redis_key, 0, limit - 1 if limit else -1)
+
+    async def read_range(self, redis_key: str, start_ft: Optional[int] = None, end_ft: Optional[int] = None,
+                         limit: Optional[int] = None) -> list:
+        """Encoded ticks with start_ft <= ft <= end_ft, newest first
+
+        Lists have no index by feed time, so the whole list is read and filtered.
+        """
+        return self._filter_range(await self.read_latest(redis_key), start_ft, end_ft, limit)
+
+    def _filter_range(self, values: list, start_ft: Optional[int], end_ft: Optional[int],
+                      limit: Optional[int]) -> list:
+        selected = []
+        for value in values:
+            ft = self.codec.ft_of(value)
+            if (start_ft is None or ft >= start_ft) and (end_ft is None or ft <= end_ft):
+                selected.append(value)
+                if limit and len(selected) >= limit:
+                    break
+        return selected
+
+    def _queue_read(self, pipe, redis_key: str, limit: Optional[int], ranged: bool):
+        pipe.lrange(redis_key, 0, limit - 1 if limit and not ranged else -1)
+
+    def _read_values(self, result, start_ft: Optional[int], end_ft: Optional[int], limit: Optional[int]) -> list:
+        if start_ft is None and end_ft is None:
+            return result
+        return self._filter_range(result, start_ft, end_ft, limit)
+
+    async def read_many(self, redis_keys: List[str], limit: Optional[int] = None, start_ft: Optional[int] = None,
+                        end_ft: Optional[int] = None) -> List[list]:
+        """Encoded ticks of several keys (each newest first, optionally within an ft window) in one round-trip"""
+        if not redis_keys:
+            return []
+        ranged = start_ft is not None or end_ft is not None
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for redis_key in redis_keys:
+                self._queue_read(pipe, redis_key, limit, ranged)
+            results = await pipe.execute()
+        return [self._read_values(result, start_ft, end_ft, limit) for result in results]
+
+    def merge_newest(self, value_lists: List[list], limit: Optional[int] = None) -> list:
+        """Merge per-key newest-first values into one newest-first list of at most limit values
+
+        heapq.merge only compares the heads of the K lists, so the latest N of all
+        keys cost O(N log K) instead of sorting every value.
+        """
+        merged = heapq.merge(*value_lists, key=self.codec.ft_of, reverse=True)
+        return list(islice(merged, limit) if limit else merged)
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "encoding": self.codec.name,
+            "transaction": self.transaction,
+            "batches": self.batches,
+            "ticks": self.ticks,
+            "commands": self.commands,
+            "errors": self.errors,
+            "avg_batch": round(self.ticks / self.batches, 2) if self.batches else 0,
+            "max_batch": self.max_batch,
+            "avg_latency_ms": round(self.total_seconds / self.batches * 1000, 3) if self.batches else 0,
+            "max_latency_ms": round(self.max_seconds * 1000, 3),
+            "last_latency_ms": round(self.last_seconds * 1000, 3),
+        }
+
+
+class RedisStreamTickWriter(RedisTickWriter):
+    """Stream backend: one entry per tick with the feed time in its ID"""
+
+    backend = "stream"
+
+    def __init__(self, redis_client, max_ticks_loader: Callable[[], Awaitable[int]],
+                 transaction: bool = False, codec: Optional[JsonTickCodec] = None):
+        super().__init__(redis_client, max_ticks_loader, transaction, codec)
+        # Clients without decode_responses return field names as bytes
+        self.field = STREAM_FIELD.encode() if self.codec.binary else STREAM_FIELD
+        # key -> (milliseconds, sequence) of the last entry ID written
+        self._last_ids: Dict[str, Tuple[int, int]] = {}
+        self.out_of_order = 0
+
+    def _next_id(self, redis_key: str, ft: int) -> Optional[str]:
+        millis = ft * 1000
+        last = self._last_ids.get(redis_key)
+        if last is None or millis > last[0]:
+            entry = (millis, 0)
+        elif millis == last[0]:
+            entry = (millis, last[1] + 1)
+        else:
+            # Stream IDs must increase; a tick older than the stream head is skipped
+            return None
+        self._last_ids[redis_key] = entry
+        return f"{entry[0]}-{entry[1]}"
+
+    def _queue_writes(self, pipe, database_name: str, redis_key: str, ticks: List[TickRecord],
+                      max_ticks: int) -> int:
+        commands = 0
+        for tick in ticks[-max_ticks:]:
+            entry_id = self._next_id(redis_key, tick.ft)
+            if entry_id is None:
+                self.out_of_order += 1
+                continue
+            pipe.xadd(redis_key, {STREAM_FIELD: self.codec.encode(database_name, tick)}, id=entry_id, maxlen=max_ticks, approximate=True)
+            commands += 1
+        return commands
+
+    def forget(self, database_name: str):
+        prefix = f"ticks:{database_name}:"
+        for redis_key in [k for k in self._last_ids if k.startswith(prefix)]:
+            del self._last_ids[redis_key]
+        super().forget(database_name)
+
+    async def trim_after(self, database_name: str, ft: int) -> int:
+        """Remove the entries newer than ft and continue entry IDs from the remaining head of each stream
+
+        After a restart the last written IDs are unknown; without them every XADD
+        below the stream head would be rejected.
+        """
+        redis_keys = await self._database_keys(database_name)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for redis_key in redis_keys:
+                pipe.xrevrange(redis_key, "+", stream_id_bound(int(ft) + 1, "-"))
+            newer = await pipe.execute()
+        removed = 0
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for redis_key, entries in zip(redis_keys, newer):
+                if entries:
+                    pipe.xdel(redis_key, *[entry_id for entry_id, _ in entries])
+                    removed += len(entries)
+            for redis_key in redis_keys:
+                pipe.xrevrange(redis_key, "+", "-", count=1)
+            heads = (await pipe.execute())[-len(redis_keys):]
+        for redis_key, head in zip(redis_keys, heads):
+            if head:
+                entry_id = head[0][0]
+                entry_id = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+                millis, sequence = entry_id.split("-")
+                self._last_ids[redis_key] = (int(millis), int(sequence))
+            else:
+                self._last_ids.pop(redis_key, None)
+        return removed
+
+    async def read_latest(self, redis_key: str, limit: Optional[int] = None) -> list:
+        entries = await self.redis.xrevrange(redis_key, "+", "-", count=limit)
+        return [fields[self.field] for _, fields in entries]
+
+    async def read_range(self, redis_key: str, start_ft: Optional[int] = None, end_ft: Optional[int] = None,
+                         limit: Optional[int] = None) -> list:
+        entries = await self.redis.xrevrange(redis_key, stream_id_bound(end_ft, "+"),
+                                             stream_id_bound(start_ft, "-"), count=limit)
+        return [fields[self.field] for _, fields in entries]
+
+    async def read_many(self, redis_keys: List[str], limit: Optional[int] = None, start_ft: Optional[int] = None,
+                        end_ft: Optional[int] = None) -> List[list]:
+        if not redis_keys:
+            return []
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for redis_key in redis_keys:
+                pipe.xrevrange(redis_key, stream_id_bound(end_ft, "+"), stream_id_bound(start_ft, "-"), count=limit)
+            results = await pipe.execute()
+        return [[fields[self.field] for _, fields in entries] for entries in results]
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["out_of_order"] = self.out_of_order
+        return stats
+
+
+def create_tick_writer(backend: str, redis_client, max_ticks_loader: Callable[[], Awaitable[int]],
+                       transaction: bool = False, codec: Optional[JsonTickCodec] = None) -> RedisTickWriter:
+    """Tick writer for REDIS_TICK_BACKEND ("list" or "stream")"""
+    if backend not in TICK_BACKENDS:
+        raise ValueError(f"Unknown Redis tick backend '{backend}', expected one of {TICK_BACKENDS}")
+    writer_class = RedisStreamTickWriter if backend == "stream" else RedisTickWriter
+    return writer_class(redis_client, max_ticks_loader, transaction, codec)
@@ -0,0 +1,49 @@
+"""Compact tick record used on the streaming hot path.
+
+Replay data comes from our own collections, so ticks skip pydantic validation
+and are built straight from projected documents. Each record encodes its JSON
+once; the WebSocket fan-out and the Redis writer reuse the same string.
+"""
+import json
+
+# Fields read from IndexTick / OptionTick documents
+TICK_FIELDS = ("ft", "token", "e", "lp", "pc", "rt", "ts")
+
+# Mongo projection matching TICK_FIELDS
+TICK_PROJECTION = {"_id": 0, **{name: 1 for name in TICK_FIELDS}}
+
+_encoder = json.JSONEncoder()
+
+
+class TickRecord:
+    """One index or option tick with the same fields as TickData/OptionTickData"""
+
+    __slots__ = ("ft", "token", "e", "lp", "pc", "rt", "ts", "data_type", "_json")
+
+    def __init__(self, ft: int, token: int, e: str, lp: float, pc: float, rt: str, ts: str, data_type: str):
+        self.ft = ft
+        self.token = token
+        self.e = e
+        self.lp = lp
+        self.pc = pc
+        self.rt = rt
+        self.ts = ts
+        self.data_type = data_type
+        self._json = None
+
+    @classmethod
+    def from_doc(cls, doc: dict, data_type: str) -> "TickRecord":
+        get = doc.get
+        return cls(int(get("ft", 0)), int(get("token", 0)), get("e", ""), float(get("lp", 0.0)),
+                   float(get("pc", 0.0)), get("rt", ""), get("ts", ""), data_type)
+
+    def to_dict(self) -> dict:
+        return {"ft": self.ft, "token": self.token, "e": self.e, "lp": self.lp, "pc": self.pc,
+                "rt": self.rt, "ts": self.ts, "data_type": self.data_type}
+
+    @property
+    def json(self) -> str:
+        """JSON of the tick, encoded on first use and shared by every consumer"""
+        if self._json is None:
+            self._json = _encoder.encode(self.to_dict())
+        return self._json
@@ -0,0 +1,169 @@
+"""Indicators of every option token of a run, vectorized across tokens.
+
+Each token gets a slot on first sight; its state lives in numpy arrays indexed
+by slot (EMAs as a periods x slots matrix, a rolling price window as a slots x
+window matrix). The option ticks of one ft frame are folded in with a handful
+of array operations, whatever the number of tokens.
+
+EMAs follow the progressive period of ``indicators.EMA``: the mean of the
+prices seen until ``period`` prices arrived, then
+``ema = alpha * price + (1 - alpha) * ema``. Rolling statistics (mean,
+standard deviation, min, max) cover the last ``window`` prices of a token and
+are computed when read.
+"""
+from itertools import groupby
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from ticks import TickRecord
+
+
+class TokenIndicatorBank:
+    def __init__(self, ema_periods: Iterable[int] = (9, 21), window: int = 20, capacity: int = 64):
+        self.ema_periods = np.array(sorted(set(int(p) for p in ema_periods)), dtype=np.int64)
+        if not len(self.ema_periods) or self.ema_periods[0] <= 0 or window <= 0:
+            raise ValueError("EMA periods and the rolling window must be positive")
+        self.alphas = 2.0 / (self.ema_periods + 1)
+        self.window_size = int(window)
+        # token -> slot, and slot -> token
+        self.slots: Dict[int, int] = {}
+        self.tokens: List[int] = []
+        self.frames = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int):
+        self.count = np.zeros(capacity, dtype=np.int64)
+        self.last_ft = np.zeros(capacity, dtype=np.int64)
+        self.last_price = np.zeros(capacity, dtype=np.float64)
+        self.previous_price = np.zeros(capacity, dtype=np.float64)
+        self.ema = np.zeros((len(self.ema_periods), capacity), dtype=np.float64)
+        self.window = np.full((capacity, self.window_size), np.nan, dtype=np.float64)
+
+    def _grow(self, capacity: int):
+        size = len(self.count)
+        arrays = (self.count, self.last_ft, self.last_price, self.previous_price, self.ema, self.window)
+        self._allocate(capacity)
+        self.count[:size], self.last_ft[:size], self.last_price[:size], self.previous_price[:size] = arrays[:4]
+        self.ema[:, :size] = arrays[4]
+        self.window[:size] = arrays[5]
+
+    def slot(self, token: int) -> int:
+        slot = self.slots.get(token)
+        if slot is None:
+            slot = self.slots[token] = len(self.tokens)
+            self.tokens.append(token)
+            if slot >= len(self.count):
+                self._grow(2 * len(self.count))
+        return slot
+
+    def update_frame(self, ft: int, tokens: Iterable[int], prices: Iterable[float]):
+        """Fold one ft frame of (token, price) into every token's state; a repeated token keeps its last price"""
+        latest = dict(zip(tokens, prices))
+        if not latest:
+            return
+        slots = np.fromiter((self.slot(token) for token in latest), dtype=np.int64, count=len(latest))
+        prices = np.fromiter(latest.values(), dtype=np.float64, count=len(latest))
+
+        counts = self.count[slots] + 1
+        self.count[slots] = counts
+        self.last_ft[slots] = ft
+        self.previous_price[slots] = np.where(counts > 1, self.last_price[slots], prices)
+        self.last_price[slots] = prices
+
+        ema = self.ema[:, slots]
+        warm = counts <= self.ema_periods[:, None]
+        alphas = self.alphas[:, None]
+        self.ema[:, slots] = np.where(warm, ema + (prices - ema) / counts,
+                                      alphas * prices + (1 - alphas) * ema)
+        self.window[slots, (counts - 1) % self.window_size] = prices
+        self.frames += 1
+
+    def update(self, ticks: Iterable[TickRecord]):
+        """Fold option ticks (oldest first) in, one vectorized update per ft frame"""
+        for ft, frame in groupby((t for t in ticks if t.data_type == "optiontick"), key=lambda t: t.ft):
+            frame = list(frame)
+            self.update_frame(ft, (t.token for t in frame), (t.lp for t in frame))
+
+    def update_array(self, arrays: List[np.ndarray]):
+        """Fold stored ticks (arrays with ft, token and lp columns, any order) in, oldest frame first"""
+        ticks = np.concatenate(arrays)
+        if not len(ticks):
+            return
+        ticks = ticks[np.argsort(ticks["ft"], kind="stable")]
+        boundaries = np.flatnonzero(np.diff(ticks["ft"])) + 1
+        for frame in np.split(ticks, boundaries):
+            self.update_frame(int(frame["ft"][0]), frame["token"].tolist(), frame["lp"].tolist())
+
+    def values(self, tokens: Optional[Iterable[int]] = None) -> Dict[str, dict]:
+        """Indicators per token (every known token when None); unknown tokens map to None"""
+        tokens = self.tokens if tokens is None else [int(token) for token in tokens]
+        known = [token for token in tokens if token in self.slots]
+        result: Dict[str, Optional[dict]] = {str(token): None for token in tokens}
+        if not known:
+            return result
+        slots = np.array([self.slots[token] for token in known], dtype=np.int64)
+        rows = self.window[slots]
+        filled = np.minimum(self.count[slots], self.window_size)
+        # Rows always hold at least one price, so the nan-aware reductions never see an empty row
+        mean = np.nanmean(rows, axis=1)
+        std = np.nanstd(rows, axis=1)
+        low = np.nanmin(rows, axis=1)
+        high = np.nanmax(rows, axis=1)
+        emas = self.ema[:, slots]
+        periods_used = np.minimum(self.count[slots][None, :], self.ema_periods[:, None])
+        for i, token in enumerate(known):
+            result[str(token)] = {
+                "ft": int(self.last_ft[slots[i]]),
+                "ticks": int(self.count[slots[i]]),
+                "last_price": float(self.last_price[slots[i]]),
+                "change": float(self.last_price[slots[i]] - self.previous_price[slots[i]]),
+                "ema": {str(period): round(float(emas[p, i]), 2) for p, period in enumerate(self.ema_periods)},
+                "ema_period_used": {str(period): int(periods_used[p, i]) for p, period in enumerate(self.ema_periods)},
+                "window": int(filled[i]),
+                "mean": round(float(mean[i]), 2),
+                "std": round(float(std[i]), 4),
+                "min": float(low[i]),
+                "max": float(high[i]),
+            }
+        return result
+
+    def state(self) -> dict:
+        """JSON-serializable state of the used slots (used by run checkpoints)"""
+        used = len(self.tokens)
+        return {
+            "ema_periods": self.ema_periods.tolist(),
+            "window": self.window_size,
+            "frames": self.frames,
+            "tokens": list(self.tokens),
+            "count": self.count[:used].tolist(),
+            "last_ft": self.last_ft[:used].tolist(),
+            "last_price": self.last_price[:used].tolist(),
+            "previous_price": self.previous_price[:used].tolist(),
+            "ema": self.ema[:, :used].tolist(),
+            # Empty window cells are nan; they are restored from the counts
+            "prices": np.nan_to_num(self.window[:used]).tolist(),
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "TokenIndicatorBank":
+        tokens = [int(token) for token in state.get("tokens", [])]
+        bank = cls(state["ema_periods"], state["window"], capacity=max(64, len(tokens)))
+        used = len(tokens)
+        bank.tokens = tokens
+        bank.slots = {token: slot for slot, token in enumerate(tokens)}
+        bank.frames = int(state.get("frames", 0))
+        if used:
+            bank.count[:used] = state["count"]
+            bank.last_ft[:used] = state["last_ft"]
+            bank.last_price[:used] = state["last_price"]
+            bank.previous_price[:used] = state["previous_price"]
+            bank.ema[:, :used] = np.array(state["ema"], dtype=np.float64).reshape(len(bank.ema_periods), used)
+            prices = np.array(state["prices"], dtype=np.float64).reshape(used, bank.window_size)
+            empty = np.arange(bank.window_size)[None, :] >= bank.count[:used, None]
+            prices[empty] = np.nan
+            bank.window[:used] = prices
+        return bank
+
+    def stats(self) -> dict:
+        return {"tokens": len(self.tokens), "capacity": len(self.count), "frames": self.frames}